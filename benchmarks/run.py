@@ -0,0 +1,195 @@
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import openpyxl
+from openpyxl.utils import get_column_letter
+import excel_processor
+import financial_statements
+from excel_processor import create_template, process_excel_file
+from statement_model import DEFAULT_PERIODS, Statement
+from styles import register_styles
+
+# Extra line items added to every statement, per size
+SIZES = {
+    'stock': 0,
+    'medium': 200,
+    'large': 2000,
+}
+
+# Period columns of the input, e.g. two years, a year of months or two years of months
+PERIODS = (DEFAULT_PERIODS, 12, 24)
+
+# Input sheets filled with synthetic values: (sheet, item list, value columns);
+# None stands for one value column per period
+INPUT_SHEETS = [
+    ('الإيرادات والمصروفات | Income', excel_processor.INCOME_ITEMS, None),
+    ('الأصول والخصوم | Balance', excel_processor.BALANCE_ITEMS, None),
+    ('حقوق الملكية | Equity', excel_processor.EQUITY_ITEMS, 'BCDE'),
+    ('التدفقات النقدية | Cash Flow', excel_processor.CASH_FLOW_ITEMS, None),
+]
+
+def synthetic_workbook(extra_items, periods=DEFAULT_PERIODS):
+    """Bytes of a filled `periods`-period template with `extra_items` more rows per statement."""
+    buffer = io.BytesIO()
+    create_template(buffer, periods)
+    wb = openpyxl.load_workbook(buffer)
+    period_letters = [get_column_letter(column) for column in range(2, 2 + periods)]
+    for sheet_name, items, columns in INPUT_SHEETS:
+        columns = period_letters if columns is None else columns
+        sheet = wb[sheet_name]
+        for row in range(4, 4 + len(items) + extra_items):
+            if row >= 4 + len(items):
+                sheet[f'A{row}'] = f'بند إضافي {row} | Extra item {row}'
+            if sheet[f'A{row}'].value:
+                for index, column in enumerate(columns):
+                    sheet[f'{column}{row}'] = float(row * 1000 + index * 17)
+    notes = wb['الملاحظات | Notes']
+    for row in range(4, 29, 4):
+        notes[f'B{row}'] = 'نص الملاحظة | Note text ' * 20
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+def synthetic_data(data, extra_items):
+    """Parsed data with `extra_items` more line items per statement."""
+    data = dict(data)
+    extra_labels = [f'بند إضافي {i} | Extra item {i}' for i in range(extra_items)]
+    for key in ('income', 'balance', 'cash_flow'):
+        periods = len(data[key].columns)
+        extra_rows = [(label, tuple(float(i * (1000 - 100 * k)) for k in range(periods))) for i, label in enumerate(extra_labels)]
+        data[key] = Statement.from_rows(key, data[key].columns, list(data[key].rows()) + extra_rows)
+    extra_rows = [(label, (float(i), float(i), float(i), float(3 * i))) for i, label in enumerate(extra_labels)]
+    data['equity'] = Statement.from_rows('equity', data['equity'].columns, list(data['equity'].rows()) + extra_rows)
+    return data
+
+def _new_sheet():
+    wb = openpyxl.Workbook()
+    register_styles(wb)
+    return wb.active
+
+def _full_workbook(data):
+    wb = openpyxl.Workbook()
+    register_styles(wb)
+    wb.remove(wb.active)
+    for content in financial_statements.statement_contents(data):
+        financial_statements.write_sheet(wb.create_sheet(content.title), content)
+    return wb
+
+def _save(wb):
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+def stages(input_bytes, data, periods=DEFAULT_PERIODS):
+    """Benchmarked stages as (name, setup, run) triples.
+
+    `setup` builds fresh inputs outside the timed region and `run` receives
+    them; `run` may return bytes to record the output size.
+    """
+    def template():
+        buffer = io.BytesIO()
+        create_template(buffer, periods)
+        return buffer.getvalue()
+    def streaming_statements():
+        buffer = io.BytesIO()
+        financial_statements.generate_financial_statements(data, buffer, write_only=True)
+        return buffer.getvalue()
+    return [
+        ('create_template', lambda: None, lambda _: template()),
+        ('process_excel_file', lambda: io.BytesIO(input_bytes), process_excel_file),
+        ('generate_overview', _new_sheet, lambda sheet: financial_statements.generate_overview(sheet, data)),
+        ('generate_income_statement', _new_sheet, lambda sheet: financial_statements.generate_income_statement(sheet, data['income'])),
+        ('generate_balance_sheet', _new_sheet, lambda sheet: financial_statements.generate_balance_sheet(sheet, data['balance'])),
+        ('generate_equity_statement', _new_sheet, lambda sheet: financial_statements.generate_equity_statement(sheet, data['equity'])),
+        ('generate_cash_flow_statement', _new_sheet, lambda sheet: financial_statements.generate_cash_flow_statement(sheet, data['cash_flow'])),
+        ('generate_notes', _new_sheet, lambda sheet: financial_statements.generate_notes(sheet, data['notes'])),
+        ('generate_charts', _new_sheet, lambda sheet: financial_statements.generate_charts(sheet, data)),
+        ('wb.save', lambda: _full_workbook(data), _save),
+        ('generate_financial_statements[write_only]', lambda: None, lambda _: streaming_statements()),
+    ]
+
+def measure(setup, run, repeat):
+    """Wall times of `repeat` runs, then one traced run for peak memory."""
+    times = []
+    output = None
+    for _ in range(repeat):
+        argument = setup()
+        started = time.perf_counter()
+        output = run(argument)
+        times.append(time.perf_counter() - started)
+    # Tracing slows the code down, so memory is measured in a separate run
+    argument = setup()
+    tracemalloc.start()
+    run(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'wall_s': statistics.median(times),
+        'min_s': min(times),
+        'peak_kb': round(peak / 1024, 1),
+        'output_bytes': len(output) if isinstance(output, bytes) else None,
+    }
+
+def run_benchmarks(sizes, repeat, period_counts=PERIODS):
+    results = []
+    for size in sizes:
+        extra_items = SIZES[size]
+        for periods in period_counts:
+            input_bytes = synthetic_workbook(extra_items, periods)
+            data = synthetic_data(process_excel_file(io.BytesIO(input_bytes)), extra_items)
+            for stage, setup, run in stages(input_bytes, data, periods):
+                result = {'size': size, 'periods': periods, 'stage': stage, 'input_bytes': len(input_bytes)}
+                result.update(measure(setup, run, repeat))
+                results.append(result)
+                print(f"{size:<8} {periods:>3}p {stage:<44} {result['wall_s'] * 1000:9.2f} ms {result['peak_kb']:10.1f} KiB")
+    return results
+
+def compare(results, baseline, threshold):
+    """Return the stages that got slower than `threshold` (a fraction) vs baseline."""
+    # Baselines from before the period dimension only have two-period results
+    previous = {(r['size'], r.get('periods', DEFAULT_PERIODS), r['stage']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get((result['size'], result['periods'], result['stage']))
+        if old and old['wall_s'] > 0 and (result['wall_s'] - old['wall_s']) / old['wall_s'] > threshold:
+            regressions.append((result['size'], result['periods'], result['stage'], old['wall_s'], result['wall_s']))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the parse and generate hot paths. Run from the repository root: python -m benchmarks.run")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES), help="input sizes to benchmark")
+    parser.add_argument("--periods", nargs="+", type=int, default=list(PERIODS), help="period columns of the input")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per stage")
+    parser.add_argument("--output", "-o", default="benchmark_results.json", help="JSON file for the results")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown fraction reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.repeat, args.periods)
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'openpyxl': openpyxl.__version__,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for size, periods, stage, old, new in regressions:
+            print(f"REGRESSION {size} {periods}p {stage}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+# Modules a process imports before it handles its first job
+ENTRY_POINTS = ['bot', 'job_worker', 'cli', 'worker_pool', 'data_import', 'financial_statements', 'data_export']
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prints the peak RSS (KiB on Linux) once the import is done
+PROBE = "import {module}, resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+
+def import_profile(module):
+    """Import `module` in a fresh interpreter with -X importtime.
+
+    Returns the total import time in microseconds, the peak RSS in KiB and
+    the modules imported directly by `module` as (name, self_us,
+    cumulative_us), heaviest first.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module)],
+                            capture_output=True, text=True, cwd=ROOT)
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed: {result.stderr.strip().splitlines()[-1]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # -X importtime indents each import one step deeper than the module importing it
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    # An import is listed right after its own imports, so the block before it is its subtree
+    index = next(i for i, entry in enumerate(entries) if entry[0] == module)
+    _, module_depth, _, total = entries[index]
+    children = []
+    for name, depth, self_us, cumulative_us in reversed(entries[:index]):
+        if depth <= module_depth:
+            break
+        if depth == module_depth + 1:
+            children.append((name, self_us, cumulative_us))
+    children.sort(key=lambda child: child[2], reverse=True)
+    return total, int(result.stdout.strip()), children
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time breakdown of the entry points. Run from the repository root: python -m benchmarks.startup")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS, help="modules to import")
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports listed per module")
+    parser.add_argument("--output", "-o", help="JSON file for the results")
+    args = parser.parse_args(argv)
+
+    results = []
+    for module in args.modules:
+        total, rss_kb, children = import_profile(module)
+        print(f"{module:<24} {total / 1000:9.1f} ms {rss_kb / 1024:8.1f} MiB")
+        for name, self_us, cumulative_us in children[:args.top]:
+            print(f"    {name:<32} {cumulative_us / 1000:9.1f} ms  (self {self_us / 1000:.1f} ms)")
+        results.append({
+            'module': module,
+            'import_s': total / 1e6,
+            'peak_rss_kb': rss_kb,
+            'imports': [{'module': name, 'self_s': self_us / 1e6, 'cumulative_s': cumulative_us / 1e6}
+                        for name, self_us, cumulative_us in children[:args.top]],
+        })
+    if args.output:
+        report = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,49 @@
+import asyncio
+import io
 import logging
-import os
+import posixpath
+import time
+import zipfile
 from telegram import Update, ReplyKeyboardMarkup
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
-from config import TELEGRAM_TOKEN, TEMPLATE_DIR, OUTPUT_DIR
+from telegram.error import BadRequest
+from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, PersistenceInput, PicklePersistence, filters
+from config import TELEGRAM_TOKEN
 from config import WELCOME_MESSAGE, HELP_MESSAGE, TEMPLATE_MESSAGE, UPLOAD_MESSAGE, PROCESSING_MESSAGE, SUCCESS_MESSAGE, ERROR_MESSAGE
-from excel_processor import create_template, process_excel_file
-from financial_statements import generate_financial_statements
+from config import BUSY_MESSAGE, TIMEOUT_MESSAGE, PERIODS_MESSAGE, OPTIONS_MESSAGE, QUEUED_MESSAGE, STATE_FILE
+from config import ZIP_CONCURRENCY, MAX_ZIP_FILES, PROGRESS_INTERVAL, ZIP_PROGRESS_MESSAGE, ZIP_SUMMARY_MESSAGE, ZIP_EMPTY_MESSAGE, ZIP_LIMIT_MESSAGE
+from config import MAX_ZIP_ENTRY_BYTES, ZIP_SIZE_MESSAGE
+from config import CONSOLIDATE_MESSAGE, CONSOLIDATE_RECEIVED_MESSAGE, CONSOLIDATE_EMPTY_MESSAGE, CONSOLIDATE_LIMIT_MESSAGE, MAX_CONSOLIDATION_FILES
+from config import CONSOLIDATE_CLOSED_MESSAGE
+from config import METRICS_LOG, METRICS_PORT, METRICS_DUMP_INTERVAL
+from config import RESULT_CACHE_MAX_BYTES, RESULT_CACHE_DIR, RESULT_CACHE_TTL
+from config import CHART_IMAGES, CONCURRENT_UPDATES, WEBHOOK_PORT
+from result_cache import ResultCache
+from telegram_client import SendRateLimiter, build_request
+from job_queue import GENERATE_JOB, open_job_queue
+from metrics import span, record_spans, start_metrics_server, start_stats_dump
+from template_cache import get_template, TEMPLATE_FILENAME
+from excel_processor import MAX_PERIODS
+from financial_statements import SHEETS
+from statement_model import DEFAULT_PERIODS
+from worker_pool import WorkerPool, QueueFullError, run_pipeline, run_consolidation
+from outputs import OUTPUT_FILENAME, output_filename, download_file, render_chart_images, send_chart_images
+from consolidation import parse_input, is_elimination_file, entity_name
+from data_import import input_format
+from bulk import INPUT_EXTENSIONS, OUTPUT_EXTENSIONS, workbooks_from_zip, workbook_entries, oversized_entries, output_name
 
 # Enable logging
 logger = logging.getLogger(__name__)
 
+# File names of the consolidated statements and zip outputs sent back to the user
+CONSOLIDATED_FILENAME = "consolidated_financial_statements.xlsx"
+ZIP_OUTPUT_FILENAME = "financial_statements.zip"
+
+# /generate argument asking for the charts as PNG images too
+CHART_IMAGES_OPTION = "png"
+
+# Attempts per zip entry while the worker queue is full, with exponential backoff
+ZIP_BUSY_RETRIES = 5
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a message when the command /start is issued."""
     user_name = update.message.from_user.first_name  # جلب الاسم الأول للمستخدم
@@ -38,21 +72,188 @@ async def instructions_command(update: Update, context: ContextTypes.DEFAULT_TYP
 """
     await update.message.reply_text(instructions_message)
 
-async def send_template(update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def template_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send the template when /template is issued; `/template 5` sends one with five periods."""
+    periods = DEFAULT_PERIODS
+    if context.args:
+        periods = int(context.args[0]) if context.args[0].isdigit() else 0
+        if not 2 <= periods <= MAX_PERIODS:
+            await update.message.reply_text(PERIODS_MESSAGE.format(max_periods=MAX_PERIODS))
+            return
+    await send_template(update, context, periods)
+
+async def send_template(update, context: ContextTypes.DEFAULT_TYPE, periods: int = DEFAULT_PERIODS) -> None:
     """Send the Excel template to the user."""
-    template_path = os.path.join(TEMPLATE_DIR, "financial_template.xlsx")
-    if not os.path.exists(template_path):
-        create_template(template_path)
+    request = request_fields(update)
+    # Templates of other period counts are built on first use, off the event loop
+    with span('template_build', periods=periods, **request):
+        template = await asyncio.to_thread(get_template, periods)
     await update.message.reply_text(TEMPLATE_MESSAGE)
-    await update.message.reply_document(document=open(template_path, 'rb'))
+    # Reuse the already uploaded document when Telegram still has it
+    if template.file_id:
+        try:
+            with span('template_send', cached=True, **request):
+                await update.message.reply_document(document=template.file_id)
+            return
+        except BadRequest as e:
+            logger.warning(f"Cached template file_id rejected: {e}")
+            template.forget_file_id()
+    with span('template_send', cached=False, **request):
+        message = await update.message.reply_document(document=template.data, filename=TEMPLATE_FILENAME)
+    template.remember_file_id(message.document.file_id)
 
 async def generate_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Wait for Excel file upload when the command /generate is issued."""
+    """Wait for Excel file upload when the command /generate is issued.
+
+    Arguments pick the output: `/generate pdf` renders a PDF report,
+    `/generate json` exports the numbers only and `/generate income balance`
+    builds only those sheets.
+    """
+    if not await choose_output_options(update, context):
+        return
     await update.message.reply_text(UPLOAD_MESSAGE)
     context.user_data["waiting_for_excel"] = True
+    context.user_data.pop("consolidation", None)
+
+async def consolidate_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Collect the workbooks of several entities when /consolidate is issued."""
+    if not await choose_output_options(update, context):
+        return
+    await update.message.reply_text(CONSOLIDATE_MESSAGE)
+    context.user_data["consolidation"] = []
+    context.user_data["waiting_for_excel"] = False
+
+async def choose_output_options(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Remember the output format, sheets and chart images given as command arguments.
+
+    Defaults to the full xlsx workbook. Returns False after telling the user
+    the valid options when an argument is unknown.
+    """
+    output_format, sheets, chart_images = "xlsx", [], CHART_IMAGES
+    for option in ",".join(context.args or ()).lower().split(","):
+        if not option:
+            continue
+        if option == CHART_IMAGES_OPTION:
+            chart_images = True
+        elif option in OUTPUT_EXTENSIONS:
+            output_format = option
+        elif option in SHEETS:
+            sheets.append(option)
+        else:
+            await update.message.reply_text(OPTIONS_MESSAGE.format(
+                option=option, formats=", ".join(OUTPUT_EXTENSIONS), sheets=", ".join(SHEETS)))
+            return False
+    context.user_data["output_format"] = output_format
+    context.user_data["sheets"] = tuple(key for key in SHEETS if key in sheets) or None
+    context.user_data["chart_images"] = chart_images
+    return True
+
+async def collect_consolidation_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Add an uploaded workbook, or every workbook in an uploaded zip, to the consolidation.
+
+    Only the file name, Telegram file_id and number of workbooks are kept
+    in user_data, which may be pickled to STATE_FILE; the files are
+    downloaded by /done. A zip is downloaded here too, to count its
+    workbooks and check their sizes from its directory without inflating
+    them. The file is added without awaiting after the consolidation is
+    looked up, so a /done handled meanwhile can't lose it.
+    """
+    file = update.message.document
+    file_name = file.file_name
+    if not file_name.lower().endswith(INPUT_EXTENSIONS + ('.zip',)):
+        await update.message.reply_text("يرجى رفع ملف إكسل أو CSV أو JSON أو zip فقط. / Please upload only Excel, CSV, JSON or zip files.")
+        return
+    count = 1
+    if file_name.lower().endswith('.zip'):
+        try:
+            zip_bytes = await download_document(update, context, request_fields(update))
+            with zipfile.ZipFile(io.BytesIO(zip_bytes)) as archive:
+                entries = workbook_entries(archive)
+        except Exception as e:
+            logger.error(f"Error receiving consolidation file: {e}")
+            await update.message.reply_text(f"{ERROR_MESSAGE}\nError details: {str(e)}")
+            return
+        if not entries:
+            await update.message.reply_text(ZIP_EMPTY_MESSAGE)
+            return
+        if oversized_entries(entries):
+            await update.message.reply_text(ZIP_SIZE_MESSAGE.format(max_mb=MAX_ZIP_ENTRY_BYTES // (1024 * 1024)))
+            return
+        count = len(entries)
+    # /done (or another command) may have ended the consolidation during the download
+    files = context.user_data.get("consolidation")
+    if files is None:
+        await update.message.reply_text(CONSOLIDATE_CLOSED_MESSAGE)
+        return
+    received = sum(file_count for _, _, file_count in files) + count
+    if received > MAX_CONSOLIDATION_FILES:
+        await update.message.reply_text(CONSOLIDATE_LIMIT_MESSAGE.format(max_files=MAX_CONSOLIDATION_FILES))
+        return
+    files.append((file_name, file.file_id, count))
+    await update.message.reply_text(CONSOLIDATE_RECEIVED_MESSAGE.format(count=received))
+
+async def done_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Download and consolidate the collected workbooks when /done is issued."""
+    files = context.user_data.pop("consolidation", None)
+    output_format = context.user_data.get("output_format", "xlsx")
+    sheets = context.user_data.get("sheets")
+    if not files:
+        await update.message.reply_text(CONSOLIDATE_EMPTY_MESSAGE)
+        return
+    await update.message.reply_text(PROCESSING_MESSAGE)
+    request = request_fields(update)
+    pool = context.application.bot_data["worker_pool"]
+    try:
+        with span('consolidation_download', files=len(files), **request):
+            downloads = await asyncio.gather(*(download_file(context.bot, file_id, request) for _, file_id, _ in files))
+        received = []
+        for (file_name, _, _), input_bytes in zip(files, downloads):
+            if file_name.lower().endswith('.zip'):
+                received += await asyncio.to_thread(list, workbooks_from_zip(input_bytes))
+            else:
+                received.append((file_name, input_bytes))
+        eliminations = [(name, input_bytes) for name, input_bytes in received if is_elimination_file(name)]
+        entities = [(name, input_bytes) for name, input_bytes in received if not is_elimination_file(name)]
+        if not entities:
+            await update.message.reply_text(CONSOLIDATE_EMPTY_MESSAGE)
+            return
+        # Parse every workbook in its own pool job so entities are parsed in parallel, ZIP_CONCURRENCY
+        # at a time so a large consolidation never fills the worker queue by itself
+        sources = entities + eliminations
+        limiter = asyncio.Semaphore(ZIP_CONCURRENCY)
+        
+        async def parse(name, source):
+            async with limiter:
+                return await submit_retrying(pool, parse_input, source, input_format(name))
+        
+        with span('consolidation_parse', files=len(sources), **request):
+            parsed = await asyncio.gather(*(parse(name, source) for name, source in sources))
+        entity_data = [(entity_name(name), data) for (name, _), data in zip(entities, parsed)]
+        elimination_data = parsed[len(entities):]
+        with span('pipeline', queued=pool.pending, **request):
+            output_bytes, spans = await pool.submit(run_consolidation, entity_data, elimination_data, output_format, sheets)
+        record_spans(spans, **request)
+        logger.info(f"Consolidated statements generated for {len(entities)} entities: {len(output_bytes)} bytes")
+        await update.message.reply_text(SUCCESS_MESSAGE)
+        with span('reply_document', output_bytes=len(output_bytes), **request):
+            await update.message.reply_document(document=output_bytes, filename=output_filename(CONSOLIDATED_FILENAME, output_format))
+    except QueueFullError as e:
+        logger.warning(f"Rejected consolidation: {e}")
+        await update.message.reply_text(BUSY_MESSAGE)
+    except asyncio.TimeoutError:
+        logger.error("Consolidation timed out.")
+        await update.message.reply_text(TIMEOUT_MESSAGE)
+    except Exception as e:
+        logger.error(f"Error consolidating files: {e}")
+        await update.message.reply_text(f"{ERROR_MESSAGE}\nError details: {str(e)}")
 
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle Excel file uploads."""
+    """Handle uploads of input files (Excel, CSV, JSON) and zips of them."""
+    # Workbooks uploaded after /consolidate are collected until /done
+    if context.user_data.get("consolidation") is not None:
+        await collect_consolidation_file(update, context)
+        return
+    
     # Check if we're waiting for an Excel file
     if not context.user_data.get("waiting_for_excel", False):
         logger.info("Not waiting for an Excel file.")
@@ -66,48 +267,213 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     file_name = file.file_name
     logger.info(f"File received: {file_name}")
     
-    # Check if it's an Excel file
-    if not file_name.endswith(('.xlsx', '.xls')):
-        await update.message.reply_text("يرجى رفع ملف إكسل فقط. / Please upload only Excel files.")
+    # Check if it's an input file (Excel, CSV, JSON) or a zip of them
+    if not file_name.lower().endswith(INPUT_EXTENSIONS + ('.zip',)):
+        await update.message.reply_text("يرجى رفع ملف إكسل أو CSV أو JSON أو zip فقط. / Please upload only Excel, CSV, JSON or zip files.")
         logger.info("Invalid file type uploaded.")
         return
     
-    # Download the file
+    # Options of the /generate this upload answers, read before any await lets another command change them
+    output_format = context.user_data.get("output_format", "xlsx")
+    sheets = context.user_data.get("sheets")
+    chart_images = context.user_data.get("chart_images", CHART_IMAGES)
+    
+    # With a job queue, single files are processed by the job workers
+    job_queue = context.application.bot_data["job_queue"]
+    if job_queue is not None and not file_name.lower().endswith('.zip'):
+        job_id = await asyncio.to_thread(job_queue.enqueue, GENERATE_JOB, {
+            'chat_id': update.effective_chat.id,
+            'message_id': update.message.message_id,
+            'file_id': file.file_id,
+            'file_name': file_name,
+            'output_format': output_format,
+            'sheets': sheets,
+            'chart_images': chart_images,
+        })
+        logger.info(f"Job {job_id} queued for {file_name}")
+        await update.message.reply_text(QUEUED_MESSAGE)
+        return
+    
+    # Download the file into memory
     await update.message.reply_text(PROCESSING_MESSAGE)
-    new_file = await context.bot.get_file(file.file_id)
-    input_path = os.path.join(TEMPLATE_DIR, f"input_{update.message.chat_id}.xlsx")
+    request = request_fields(update)
     try:
-        await new_file.download_to_drive(input_path)
-        logger.info(f"File downloaded to: {input_path}")
+        input_bytes = await download_document(update, context, request)
     except Exception as e:
         logger.error(f"Error downloading file: {e}")
         await update.message.reply_text(f"{ERROR_MESSAGE}\nError details: {str(e)}")
         return
     
+    if file_name.lower().endswith('.zip'):
+        await handle_zip(update, context, input_bytes, request, output_format, sheets)
+        return
+    
     try:
-        # Process the Excel file
-        data = process_excel_file(input_path)
-        logger.info("Excel file processed successfully.")
+        # Answer duplicate uploads from the result cache
+        cache = context.application.bot_data["result_cache"]
+        file_format = input_format(file_name)
+        cache_key = cache.key(input_bytes, file_format, output_format, sheets)
+        filename = output_filename(OUTPUT_FILENAME, output_format)
+        pool = context.application.bot_data["worker_pool"]
+        if not await send_cached_result(update, cache, cache_key, filename, request):
+            # Parse and generate in the worker pool so the event loop stays free
+            with span('pipeline', queued=pool.pending, **request):
+                output_bytes, spans = await pool.submit(run_pipeline, input_bytes, file_format, output_format, sheets)
+            record_spans(spans, **request)
+            await cache.put(cache_key, output_bytes)
+            logger.info(f"Financial statements generated: {len(output_bytes)} bytes")
+            
+            # Send the result back to the user
+            await update.message.reply_text(SUCCESS_MESSAGE)
+            with span('reply_document', output_bytes=len(output_bytes), **request):
+                message = await update.message.reply_document(document=output_bytes, filename=filename)
+            cache.put_file_id(cache_key, message.document.file_id)
         
-        # Generate financial statements
-        output_path = os.path.join(OUTPUT_DIR, f"financial_statements_{update.message.chat_id}.xlsx")
-        generate_financial_statements(data, output_path)
-        logger.info(f"Financial statements generated at: {output_path}")
-        
-        # Send the result back to the user
-        await update.message.reply_text(SUCCESS_MESSAGE)
-        await update.message.reply_document(document=open(output_path, 'rb'))
-        
-        # Clean up
-        try:
-            os.remove(input_path)
-            os.remove(output_path)
-        except Exception as e:
-            logger.error(f"Error cleaning up files: {e}")
+        # Charts as images, for phones that can't open the workbook's charts
+        if chart_images:
+            images = await render_chart_images(pool, cache, input_bytes, file_format, request)
+            await send_chart_images(context.bot, update.effective_chat.id, images, update.message.message_id, request)
+    except QueueFullError as e:
+        logger.warning(f"Rejected upload: {e}")
+        await update.message.reply_text(BUSY_MESSAGE)
+    except asyncio.TimeoutError:
+        logger.error("Processing timed out.")
+        await update.message.reply_text(TIMEOUT_MESSAGE)
     except Exception as e:
         logger.error(f"Error processing file: {e}")
         await update.message.reply_text(f"{ERROR_MESSAGE}\nError details: {str(e)}")
 
+class ProgressMessage:
+    """A status message edited as a batch progresses, at most every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, message, total):
+        self.message = message
+        self.total = total
+        self.done = 0
+        self._last_edit = time.monotonic()
+
+    async def advance(self):
+        self.done += 1
+        now = time.monotonic()
+        if self.done < self.total and now - self._last_edit < PROGRESS_INTERVAL:
+            return
+        self._last_edit = now
+        try:
+            await self.message.edit_text(ZIP_PROGRESS_MESSAGE.format(done=self.done, total=self.total))
+        except BadRequest as e:
+            # e.g. the text didn't change since the last edit
+            logger.debug(f"Progress update skipped: {e}")
+
+async def handle_zip(update: Update, context: ContextTypes.DEFAULT_TYPE, zip_bytes: bytes, request: dict,
+                     output_format: str = "xlsx", sheets: tuple = None) -> None:
+    """Generate statements for every workbook in an uploaded zip and reply with one zip of the outputs.
+
+    Entries are only read from the archive once one of the ZIP_CONCURRENCY
+    slots is free, so a large archive is never unpacked all at once.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(zip_bytes))
+    except zipfile.BadZipFile as e:
+        await update.message.reply_text(f"{ERROR_MESSAGE}\nError details: {str(e)}")
+        return
+    pool = context.application.bot_data["worker_pool"]
+    cache = context.application.bot_data["result_cache"]
+    limiter = asyncio.Semaphore(ZIP_CONCURRENCY)
+    failures = []
+    output = io.BytesIO()
+    with archive, zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as result:
+        entries = workbook_entries(archive)
+        if not entries:
+            await update.message.reply_text(ZIP_EMPTY_MESSAGE)
+            return
+        if len(entries) > MAX_ZIP_FILES:
+            await update.message.reply_text(ZIP_LIMIT_MESSAGE.format(max_files=MAX_ZIP_FILES))
+            return
+        if oversized_entries(entries):
+            await update.message.reply_text(ZIP_SIZE_MESSAGE.format(max_mb=MAX_ZIP_ENTRY_BYTES // (1024 * 1024)))
+            return
+        progress = ProgressMessage(await update.message.reply_text(ZIP_PROGRESS_MESSAGE.format(done=0, total=len(entries))), len(entries))
+
+        async def generate_entry(info):
+            async with limiter:
+                input_bytes = await asyncio.to_thread(archive.read, info)
+                file_format = input_format(info.filename)
+                cache_key = cache.key(input_bytes, file_format, output_format, sheets)
+                output_bytes = await cache.get(cache_key)
+                if output_bytes is None:
+                    output_bytes = await submit_when_free(pool, input_bytes, (file_format, output_format, sheets), request)
+                    await cache.put(cache_key, output_bytes)
+            # xlsx, PDF and Parquet outputs are already compressed, so they are stored as is
+            compression = zipfile.ZIP_DEFLATED if output_format == "json" else zipfile.ZIP_STORED
+            result.writestr(posixpath.join(posixpath.dirname(info.filename), output_name(info.filename, output_format)),
+                            output_bytes, compress_type=compression)
+
+        async def run_entry(info):
+            try:
+                await generate_entry(info)
+            except Exception as e:
+                logger.error(f"Error processing {info.filename}: {e}")
+                failures.append((info.filename, e))
+            await progress.advance()
+
+        with span('zip_batch', files=len(entries), **request):
+            await asyncio.gather(*(run_entry(info) for info in entries))
+        if failures:
+            result.writestr("errors.txt", "\n".join(f"{name}: {error}" for name, error in failures))
+    await update.message.reply_text(ZIP_SUMMARY_MESSAGE.format(
+        succeeded=len(entries) - len(failures), failed=len(failures), total=len(entries)))
+    with span('reply_document', output_bytes=output.tell(), **request):
+        await update.message.reply_document(document=output.getvalue(), filename=ZIP_OUTPUT_FILENAME)
+
+async def submit_when_free(pool: WorkerPool, input_bytes: bytes, options: tuple, request: dict) -> bytes:
+    """Run the pipeline for one zip entry, waiting while other chats fill the worker queue.
+
+    `options` are the run_pipeline arguments after the input bytes.
+    """
+    output_bytes, spans = await submit_retrying(pool, run_pipeline, input_bytes, *options)
+    record_spans(spans, **request)
+    return output_bytes
+
+async def submit_retrying(pool: WorkerPool, fn, *args):
+    """Run `fn(*args)` on the pool, backing off while the worker queue is full, up to ZIP_BUSY_RETRIES times."""
+    for attempt in range(ZIP_BUSY_RETRIES):
+        try:
+            return await pool.submit(fn, *args)
+        except QueueFullError:
+            if attempt == ZIP_BUSY_RETRIES - 1:
+                raise
+            await asyncio.sleep(2 ** attempt)
+
+async def download_document(update: Update, context: ContextTypes.DEFAULT_TYPE, request: dict) -> bytes:
+    """Download the uploaded document into memory."""
+    return await download_file(context.bot, update.message.document.file_id, request)
+
+async def send_cached_result(update: Update, cache: ResultCache, cache_key: str, filename: str, request: dict) -> bool:
+    """Send the output already generated for an identical upload, if any."""
+    file_id = cache.get_file_id(cache_key)
+    if file_id:
+        try:
+            await update.message.reply_text(SUCCESS_MESSAGE)
+            with span('reply_document', cache='file_id', **request):
+                await update.message.reply_document(document=file_id)
+            return True
+        except BadRequest as e:
+            logger.warning(f"Cached result file_id rejected: {e}")
+            cache.forget_file_id(cache_key)
+    output_bytes = await cache.get(cache_key)
+    if output_bytes is None:
+        return False
+    if not file_id:
+        await update.message.reply_text(SUCCESS_MESSAGE)
+    with span('reply_document', cache='bytes', output_bytes=len(output_bytes), **request):
+        message = await update.message.reply_document(document=output_bytes, filename=filename)
+    cache.put_file_id(cache_key, message.document.file_id)
+    return True
+
+def request_fields(update: Update) -> dict:
+    """Fields identifying a request in the structured timing records."""
+    return {'update_id': update.update_id, 'chat_id': update.effective_chat.id}
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle text messages from custom keyboard buttons."""
     text = update.message.text
@@ -121,20 +487,68 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     elif text == "مساعدة":
         await help_command(update, context)
 
-def start_bot() -> None:
-    """Start the bot."""
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+async def shutdown_worker_pool(application: Application) -> None:
+    """Stop the worker pool and close the job queue when the bot shuts down."""
+    application.bot_data["worker_pool"].shutdown(wait=False)
+    if application.bot_data["job_queue"] is not None:
+        application.bot_data["job_queue"].close()
+
+def build_application(request=None) -> Application:
+    """The bot's application with its handlers; `request` defaults to build_request()."""
+    builder = Application.builder().token(TELEGRAM_TOKEN).post_shutdown(shutdown_worker_pool)
+    # Handle several users at once; sends are throttled to the flood limits
+    builder.concurrent_updates(CONCURRENT_UPDATES).request(request or build_request()).rate_limiter(SendRateLimiter())
+    if STATE_FILE:
+        # Only user_data is kept; bot_data holds the pool and caches
+        builder.persistence(PicklePersistence(STATE_FILE, store_data=PersistenceInput(
+            bot_data=False, chat_data=False, callback_data=False)))
+    application = builder.build()
+    
+    # Worker pool for the parse -> generate pipeline, started before the first upload
+    application.bot_data["worker_pool"] = WorkerPool()
+    application.bot_data["worker_pool"].warm_up()
+    
+    # Uploads handed over to `python main.py jobs` workers (None = process inline)
+    application.bot_data["job_queue"] = open_job_queue()
+    
+    # Outputs of earlier uploads, keyed by content hash
+    application.bot_data["result_cache"] = ResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_DIR or None, RESULT_CACHE_TTL)
+    
+    # Build the template once so /template is served from memory
+    get_template()
+    
+    # Per-stage instrumentation
+    if METRICS_LOG:
+        logging.getLogger("metrics").setLevel(logging.INFO)
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    if METRICS_DUMP_INTERVAL:
+        start_stats_dump(METRICS_DUMP_INTERVAL)
     
     # Add command handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("template", template_command))
+    application.add_handler(CommandHandler("generate", generate_command))
+    application.add_handler(CommandHandler("consolidate", consolidate_command))
+    application.add_handler(CommandHandler("done", done_command, block=False))
     
     # Add message handler for custom keyboard buttons
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     
     # Add document handler
-    application.add_handler(MessageHandler(filters.ATTACHMENT, handle_document))
+    # Non-blocking so other chats are served while a file is being processed
+    application.add_handler(MessageHandler(filters.ATTACHMENT, handle_document, block=False))
+    return application
+
+def start_bot() -> None:
+    """Start the bot."""
+    application = build_application()
     
-    # Start the Bot
-    application.run_polling()
+    # Start the Bot, on updates posted by Telegram when a webhook port is set
+    if WEBHOOK_PORT:
+        from webhook import run_webhook
+        run_webhook(application)
+    else:
+        application.run_polling()
     logger.info("Bot started")
@@ -0,0 +1,40 @@
+import io
+import os
+import zipfile
+from config import MAX_ZIP_ENTRY_BYTES
+
+# Extensions of the input files picked up from directories and zip archives:
+# filled templates, and CSV / JSON / JSON Lines exports (see data_import)
+INPUT_EXTENSIONS = ('.xlsx', '.csv', '.json', '.jsonl')
+
+# Output formats and the extension of their files: the styled workbook, or
+# the numbers only as one JSON document or a zip of Parquet tables (see data_export)
+OUTPUT_EXTENSIONS = {'xlsx': '.xlsx', 'pdf': '.pdf', 'json': '.json', 'parquet': '.zip'}
+
+def output_name(input_name, output_format='xlsx'):
+    """File name of the statements generated for `input_name`."""
+    stem, _ = os.path.splitext(os.path.basename(input_name))
+    return f"{stem}_financial_statements{OUTPUT_EXTENSIONS[output_format]}"
+
+def is_workbook_name(name):
+    """Whether a file name is an input file (not a lock file or hidden file)."""
+    name = os.path.basename(name)
+    return not name.startswith(('~$', '.')) and name.lower().endswith(INPUT_EXTENSIONS)
+
+def workbook_entries(archive):
+    """Entries of an open zip archive that are input files."""
+    return [info for info in archive.infolist() if not info.is_dir() and is_workbook_name(info.filename)]
+
+def oversized_entries(entries, max_bytes=MAX_ZIP_ENTRY_BYTES):
+    """Entries larger than `max_bytes` uncompressed, going by the archive's directory.
+
+    zipfile never inflates an entry past the size recorded there, so this
+    can be checked before anything is read.
+    """
+    return [info for info in entries if info.file_size > max_bytes]
+
+def workbooks_from_zip(zip_bytes):
+    """Yield (name, bytes) of every input file in a zip archive, one entry at a time."""
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as archive:
+        for info in workbook_entries(archive):
+            yield info.filename, archive.read(info)
@@ -0,0 +1,135 @@
+import io
+import json
+import math
+import re
+from functools import lru_cache
+from statement_model import LineItem, period_labels
+
+# Resolution of the rendered images; 8x4.5 inches at this DPI fits a phone screen
+CHART_DPI = 120
+CHART_SIZE = (8, 4.5)
+
+# Text that needs shaping before matplotlib can draw it
+ARABIC = re.compile('[\u0600-\u06ff]')
+
+def chart_specs(data):
+    """The revenue/expenses, balance distribution and cash flow charts of derived `data`.
+
+    Each chart is a plain dict (name, kind, title, axis labels, categories
+    and series as (label, values) pairs), so it pickles cheaply to a worker
+    and its JSON identifies the image in the result cache. These are the
+    same three charts as the native ones on the charts sheet.
+    """
+    income, balance, cash_flow = data['income'], data['balance'], data['cash_flow']
+    periods = data.get('periods') or period_labels(len(income.columns))
+    income_rows = [income.row(LineItem.INCOME_TOTAL_REVENUE), income.row(LineItem.INCOME_TOTAL_EXPENSES),
+                   income.row(LineItem.INCOME_NET_PROFIT)]
+    cash_flow_rows = [cash_flow.row(LineItem.CASH_FLOW_NET_CASH_FROM_OPERATING_ACTIVITIES),
+                      cash_flow.row(LineItem.CASH_FLOW_NET_CASH_FROM_INVESTING_ACTIVITIES),
+                      cash_flow.row(LineItem.CASH_FLOW_NET_CASH_FROM_FINANCING_ACTIVITIES)]
+    return [
+        {
+            'name': 'revenue_expenses',
+            'kind': 'bar',
+            'title': "مقارنة الإيرادات والمصروفات | Revenue vs Expenses",
+            'xlabel': "البند | Item",
+            'ylabel': "القيمة | Value",
+            'categories': ['الإيرادات | Revenue', 'المصروفات | Expenses', 'صافي الربح | Net Profit'],
+            'series': [(period, [_number(row[k]) for row in income_rows]) for k, period in enumerate(periods)],
+        },
+        {
+            'name': 'balance_distribution',
+            'kind': 'pie',
+            'title': "توزيع الأصول والخصوم وحقوق الملكية | Distribution of Assets, Liabilities and Equity",
+            'categories': ['الأصول | Assets', 'الخصوم | Liabilities', 'حقوق الملكية | Equity'],
+            'series': [('القيمة | Value', [_number(balance.get(item, 'current')) for item in (
+                LineItem.BALANCE_TOTAL_ASSETS, LineItem.BALANCE_TOTAL_LIABILITIES, LineItem.BALANCE_TOTAL_EQUITY)])],
+        },
+        {
+            'name': 'cash_flow',
+            'kind': 'bar',
+            'title': "مقارنة التدفقات النقدية | Cash Flow Comparison",
+            'xlabel': "مصدر التدفق النقدي | Cash Flow Source",
+            'ylabel': "القيمة | Value",
+            'categories': ['الأنشطة التشغيلية | Operating Activities', 'الأنشطة الاستثمارية | Investing Activities',
+                           'الأنشطة التمويلية | Financing Activities'],
+            'series': [(period, [_number(row[k]) for row in cash_flow_rows]) for k, period in enumerate(periods)],
+        },
+    ]
+
+def _number(value):
+    value = float(value)
+    return 0.0 if math.isnan(value) else value
+
+def spec_bytes(spec):
+    """Canonical JSON of a chart spec, hashed for the image cache key."""
+    return json.dumps(spec, ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+def render_chart(spec):
+    """Render one chart spec to PNG bytes.
+
+    Runs in a worker process. matplotlib is imported here, with the Agg
+    backend, so only processes that render charts pay for it; a Figure is
+    used directly instead of pyplot, which keeps no global state.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=CHART_SIZE, dpi=CHART_DPI, layout='constrained')
+    draw_chart(figure.add_subplot(), spec)
+    output = io.BytesIO()
+    figure.savefig(output, format='png')
+    return output.getvalue()
+
+def draw_chart(axes, spec):
+    """Draw one chart spec on matplotlib axes."""
+    from matplotlib.ticker import StrMethodFormatter
+    axes.set_title(display_text(spec['title']))
+    categories = [display_text(category) for category in spec['categories']]
+    if spec['kind'] == 'pie':
+        # Wedges can't be negative; a deficit is left out of the distribution
+        _, values = spec['series'][0]
+        shown = [(category, value) for category, value in zip(categories, values) if value > 0]
+        if shown:
+            labels, sizes = zip(*shown)
+            axes.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, counterclock=False)
+            axes.axis('equal')
+        else:
+            axes.text(0.5, 0.5, "No data", ha='center', va='center', transform=axes.transAxes)
+            axes.set_axis_off()
+    else:
+        width = 0.8 / max(len(spec['series']), 1)
+        for k, (label, values) in enumerate(spec['series']):
+            offsets = [i + (k - (len(spec['series']) - 1) / 2) * width for i in range(len(categories))]
+            axes.bar(offsets, values, width, label=display_text(label))
+        axes.set_xticks(range(len(categories)), categories)
+        axes.set_xlabel(display_text(spec['xlabel']))
+        axes.set_ylabel(display_text(spec['ylabel']))
+        axes.axhline(0, color='black', linewidth=0.8)
+        axes.yaxis.set_major_formatter(StrMethodFormatter('{x:,.0f}'))
+        axes.legend()
+
+def display_text(text):
+    """Text as matplotlib should draw it.
+
+    matplotlib neither joins Arabic letters nor lays them out right to
+    left, so Arabic text is reshaped and reordered with arabic-reshaper and
+    python-bidi. Without them, a bilingual "عربي | English" label is
+    reduced to its English half.
+    """
+    text = str(text)
+    if not ARABIC.search(text):
+        return text
+    shape = _arabic_shaper()
+    if shape is None:
+        return text.split(' | ')[-1]
+    return shape(text)
+
+@lru_cache(maxsize=None)
+def _arabic_shaper():
+    try:
+        import arabic_reshaper
+        from bidi.algorithm import get_display
+    except ImportError:
+        return None
+    return lambda text: get_display(arabic_reshaper.reshape(text))
@@ -0,0 +1,220 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from bulk import OUTPUT_EXTENSIONS, output_name, is_workbook_name, workbooks_from_zip
+
+def generate_file(input_path, output_path, write_only=False, output_format='xlsx', sheets=None):
+    """Generate statements for one input file and return the elapsed seconds.
+
+    The output is written to a temporary file first, so an interrupted run
+    never leaves a partial file that a resumed run would skip.
+    """
+    from data_import import load_input
+    started = time.perf_counter()
+    data = load_input(input_path)
+    partial_path = output_path + ".part"
+    try:
+        write_output(data, partial_path, write_only, output_format, sheets)
+        os.replace(partial_path, output_path)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return time.perf_counter() - started
+
+def write_output(data, output_path, write_only=False, output_format='xlsx', sheets=None):
+    """Write the styled workbook or PDF report (optionally some sheets only), or export the numbers only as JSON or Parquet."""
+    if output_format == 'xlsx':
+        from financial_statements import generate_financial_statements
+        return generate_financial_statements(data, output_path, write_only=write_only, sheets=sheets)
+    if output_format == 'pdf':
+        from pdf_report import generate_pdf_report
+        return generate_pdf_report(data, output_path, sheets)
+    from data_export import export_statements
+    return export_statements(data, output_path, output_format)
+
+def find_jobs(input_dir, output_dir, force=False, output_format='xlsx'):
+    """Return (pending, skipped) lists of (input_path, output_path) pairs."""
+    pending, skipped = [], []
+    for name in sorted(os.listdir(input_dir)):
+        # Skip Excel lock files and anything that isn't an input file
+        if not is_workbook_name(name):
+            continue
+        input_path = os.path.join(input_dir, name)
+        output_path = os.path.join(output_dir, output_name(name, output_format))
+        if not force and os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path):
+            skipped.append((input_path, output_path))
+        else:
+            pending.append((input_path, output_path))
+    return pending, skipped
+
+def run_batch(input_dir, output_dir, jobs=None, force=False, write_only=False, output_format='xlsx', sheets=None):
+    """Generate statements for every workbook in `input_dir`.
+
+    Returns the number of files that failed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pending, skipped = find_jobs(input_dir, output_dir, force, output_format)
+    for input_path, _ in skipped:
+        print(f"skip  {os.path.basename(input_path)}")
+    failures = 0
+    started = time.perf_counter()
+    from worker_pool import process_context, warm_worker
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=process_context(), initializer=warm_worker) as executor:
+        futures = {
+            executor.submit(generate_file, input_path, output_path, write_only, output_format, sheets): input_path
+            for input_path, output_path in pending
+        }
+        for future in as_completed(futures):
+            name = os.path.basename(futures[future])
+            try:
+                elapsed = future.result()
+                print(f"ok    {name}  {elapsed:.2f}s")
+            except Exception as e:
+                failures += 1
+                print(f"FAIL  {name}  {e}")
+    elapsed = time.perf_counter() - started
+    print(f"{len(pending) - failures} generated, {failures} failed, {len(skipped)} skipped in {elapsed:.2f}s")
+    return failures
+
+def run_consolidate(inputs, output_path, eliminations=(), jobs=None, write_only=False, output_format='xlsx', sheets=None):
+    """Consolidate entity workbooks (or zips of them) into one output workbook.
+
+    Inputs named like an eliminations file are treated as eliminations.
+    Returns the number of entities consolidated.
+    """
+    from consolidation import consolidate_files, is_elimination_file
+    entities, elimination_sources = [], [(path, path) for path in eliminations]
+    for path in inputs:
+        if path.lower().endswith('.zip'):
+            with open(path, 'rb') as f:
+                sources = list(workbooks_from_zip(f.read()))
+        else:
+            sources = [(path, path)]
+        for name, source in sources:
+            if is_elimination_file(name):
+                elimination_sources.append((name, source))
+            else:
+                entities.append((name, source))
+    started = time.perf_counter()
+    data = consolidate_files(entities, elimination_sources, jobs)
+    write_output(data, output_path, write_only, output_format, sheets)
+    print(f"{len(entities)} entities consolidated ({len(elimination_sources)} elimination files) into {output_path} in {time.perf_counter() - started:.2f}s")
+    return len(entities)
+
+def replay_updates(updates_path, url=None, secret=None, concurrency=1):
+    """POST recorded Telegram updates, one JSON object per line, to a webhook endpoint.
+
+    `url` defaults to the local server of WEBHOOK_PORT and WEBHOOK_PATH.
+    With TELEGRAM_OFFLINE_DIR set the bot answers them without Telegram.
+    Returns the number of updates the endpoint refused.
+    """
+    import json
+    import urllib.error
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+    from config import WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+    url = url or f"http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+    secret = WEBHOOK_SECRET if secret is None else secret
+    with open(updates_path, encoding='utf-8') as f:
+        updates = [json.loads(line) for line in f if line.strip()]
+
+    def post(update):
+        headers = {'Content-Type': 'application/json'}
+        if secret:
+            headers['X-Telegram-Bot-Api-Secret-Token'] = secret
+        request = urllib.request.Request(url, json.dumps(update, ensure_ascii=False).encode('utf-8'), headers)
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError as e:
+            status = e
+        return update.get('update_id'), status, time.perf_counter() - started
+
+    failures = 0
+    started = time.perf_counter()
+    # Updates go out in file order, `concurrency` at a time
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for update_id, status, elapsed in executor.map(post, updates):
+            if status == 200:
+                print(f"ok    {update_id}  {elapsed * 1000:.1f} ms")
+            else:
+                failures += 1
+                print(f"FAIL  {update_id}  {status}")
+    print(f"{len(updates) - failures} updates accepted, {failures} refused in {time.perf_counter() - started:.2f}s")
+    return failures
+
+def sheet_list(value):
+    """argparse type of --sheets: a comma-separated subset of the output sheets."""
+    from financial_statements import select_sheets
+    try:
+        return select_sheets([key.strip() for key in value.split(',') if key.strip()])
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate financial statements without the Telegram bot.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("batch", help="generate statements for every input file in a directory")
+    batch.add_argument("input_dir", help="directory of filled templates or CSV/JSON/JSONL exports")
+    batch.add_argument("output_dir", help="directory for the generated statements")
+    batch.add_argument("--jobs", "-j", type=int, default=None, help="number of worker processes (default: CPU count)")
+    batch.add_argument("--force", action="store_true", help="regenerate outputs that are already up to date")
+    batch.add_argument("--streaming", action="store_true", help="write outputs with the write-only (streaming) writer")
+    batch.add_argument("--format", "-f", choices=OUTPUT_EXTENSIONS, default="xlsx", help="output format: the styled workbook, a PDF report, or the numbers only as JSON or Parquet")
+    batch.add_argument("--sheets", "-s", type=sheet_list, default=None, help="comma-separated sheets to generate, e.g. income,balance (default: all)")
+
+    consolidate = subparsers.add_parser("consolidate", help="consolidate the workbooks of several entities into one output")
+    consolidate.add_argument("output_path", help="path of the consolidated statements")
+    consolidate.add_argument("inputs", nargs="+", help="entity workbooks, CSV/JSON/JSONL exports, or zips of them")
+    consolidate.add_argument("--eliminations", "-e", action="append", default=[], help="intercompany eliminations workbook or export (repeatable)")
+    consolidate.add_argument("--jobs", "-j", type=int, default=None, help="number of parsing processes (default: CPU count)")
+    consolidate.add_argument("--streaming", action="store_true", help="write the output with the write-only (streaming) writer")
+    consolidate.add_argument("--format", "-f", choices=OUTPUT_EXTENSIONS, default="xlsx", help="output format: the styled workbook, a PDF report, or the numbers only as JSON or Parquet")
+    consolidate.add_argument("--sheets", "-s", type=sheet_list, default=None, help="comma-separated sheets to generate, e.g. income,consolidation (default: all)")
+
+    template = subparsers.add_parser("template", help="write an empty input template")
+    template.add_argument("output_path", help="path of the template workbook")
+    template.add_argument("--periods", "-p", type=int, default=2, help="number of amount columns (periods), most recent first")
+
+    replay = subparsers.add_parser("replay", help="post recorded Telegram updates to the bot's webhook endpoint")
+    replay.add_argument("updates", help="JSON Lines file of Telegram updates")
+    replay.add_argument("--url", help="webhook endpoint (default: the local WEBHOOK_PORT and WEBHOOK_PATH)")
+    replay.add_argument("--secret", help="secret token to send (default: WEBHOOK_SECRET)")
+    replay.add_argument("--concurrency", "-c", type=int, default=1, help="updates posted at the same time")
+
+    args = parser.parse_args(argv)
+    if args.command == "batch":
+        failures = run_batch(args.input_dir, args.output_dir, args.jobs, args.force, args.streaming, args.format, args.sheets)
+        return 1 if failures else 0
+    if args.command == "consolidate":
+        try:
+            run_consolidate(args.inputs, args.output_path, args.eliminations, args.jobs, args.streaming, args.format, args.sheets)
+        except Exception as e:
+            print(f"FAIL  {e}")
+            return 1
+        return 0
+    if args.command == "replay":
+        return 1 if replay_updates(args.updates, args.url, args.secret, args.concurrency) else 0
+    if args.command == "template":
+        from excel_processor import create_template
+        try:
+            create_template(args.output_path, args.periods)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Template with {args.periods} periods written to {args.output_path}")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.WARNING
+    )
+    sys.exit(main())
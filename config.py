@@ -15,6 +15,94 @@ OUTPUT_DIR = "output"
 os.makedirs(TEMPLATE_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Worker pool for the parse -> generate pipeline ("process" or "thread")
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "process")
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "2"))
+MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "20"))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "120"))
+# How worker processes are started ("forkserver", "fork" or "spawn"); the fork
+# server imports the pipeline modules once, so every worker starts warm
+PROCESS_START_METHOD = os.getenv("PROCESS_START_METHOD", "forkserver")
+
+# Stream the generated workbook row by row (openpyxl write-only mode)
+STREAMING_OUTPUT = os.getenv("STREAMING_OUTPUT", "false").lower() == "true"
+
+# Send the charts as PNG images after the statements (users can also ask with /generate png)
+CHART_IMAGES = os.getenv("CHART_IMAGES", "false").lower() == "true"
+
+# Cache of generated outputs keyed by the uploaded file's content hash
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # in-memory LRU size
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "")  # on-disk tier ("" = disabled)
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))  # on-disk entry lifetime in seconds
+
+# Zip uploads: workbooks processed at the same time, most workbooks per zip and
+# seconds between progress updates
+ZIP_CONCURRENCY = int(os.getenv("ZIP_CONCURRENCY", "2"))
+MAX_ZIP_FILES = int(os.getenv("MAX_ZIP_FILES", "200"))
+MAX_ZIP_ENTRY_BYTES = int(os.getenv("MAX_ZIP_ENTRY_BYTES", str(50 * 1024 * 1024)))  # largest uncompressed file in a zip
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "3"))
+
+# Most workbooks accepted in one consolidation request
+MAX_CONSOLIDATION_FILES = int(os.getenv("MAX_CONSOLIDATION_FILES", "50"))
+
+# Background job queue: uploads are stored in this SQLite file and processed by
+# `python main.py jobs` workers, so a restart doesn't lose them ("" = process inline)
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", str(MAX_WORKERS)))  # jobs run at once per worker process
+JOB_LEASE = float(os.getenv("JOB_LEASE", "600"))  # seconds before a job of a dead worker is picked up again
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "5"))  # first retry delay in seconds, doubled per attempt
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))  # seconds finished jobs are kept
+
+# Updates handled at the same time by the bot (1 = one after another)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "16"))
+
+# Outgoing messages are throttled to Telegram's flood limits: about 30 messages
+# per second overall, one per second in a private chat and 20 per minute in a group
+RATE_LIMIT_GLOBAL = float(os.getenv("RATE_LIMIT_GLOBAL", "30"))  # messages per second across all chats
+RATE_LIMIT_CHAT = float(os.getenv("RATE_LIMIT_CHAT", "1"))  # messages per second in a private chat
+RATE_LIMIT_GROUP = float(os.getenv("RATE_LIMIT_GROUP", "20"))  # messages per minute in a group
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "3"))  # messages a chat can get at once before being throttled
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "3"))  # retries of a message refused with 429
+
+# HTTP connections to the Bot API; uploads get their own write timeout since
+# documents take much longer to send than text
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "64"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", "10"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+UPLOAD_WRITE_TIMEOUT = float(os.getenv("UPLOAD_WRITE_TIMEOUT", "120"))
+
+# Webhook mode: Telegram posts updates to a local HTTP server instead of the bot
+# polling for them (WEBHOOK_PORT 0 = long polling). WEBHOOK_URL is the public
+# base URL registered with Telegram ("" = leave the registration as it is).
+# The server listens on localhost only unless WEBHOOK_HOST says otherwise, and
+# then refuses to start without WEBHOOK_SECRET. Conversation state is kept per
+# process, so instances sharing one URL need each chat routed to one instance
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "0"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # expected in the X-Telegram-Bot-Api-Secret-Token header
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+
+# Answer Bot API calls locally instead of calling Telegram, e.g. to replay
+# recorded updates offline: file_ids name files in this directory and the
+# messages sent are appended to outbox.jsonl there, next to the stub file_ids
+# of the templates sent ("" = use Telegram)
+TELEGRAM_OFFLINE_DIR = os.getenv("TELEGRAM_OFFLINE_DIR", "")
+
+# Pickle file keeping each user's conversation state across restarts ("" = memory only);
+# one file per instance, as instances sharing it would overwrite each other's state
+STATE_FILE = os.getenv("STATE_FILE", "")
+
+# Per-stage instrumentation
+METRICS_LOG = os.getenv("METRICS_LOG", "false").lower() == "true"  # log a structured record per stage
+METRICS_MEMORY = os.getenv("METRICS_MEMORY", "false").lower() == "true"  # add RSS deltas to the records
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # serve /metrics on this port (0 = disabled)
+METRICS_DUMP_INTERVAL = int(os.getenv("METRICS_DUMP_INTERVAL", "0"))  # log stage stats every N seconds (0 = disabled)
+
 # Bot messages
 WELCOME_MESSAGE = """
 مرحباً بك في بوت القوائم المالية! 👋
@@ -23,8 +111,9 @@ WELCOME_MESSAGE = """
 استخدم الأوامر التالية:
 /start - بدء استخدام البوت
 /help - عرض المساعدة
-/template - الحصول على قالب إكسل للتعبئة
-/generate - رفع ملف إكسل لإنشاء القوائم المالية
+/template - الحصول على قالب إكسل للتعبئة (/template 5 لخمس فترات)
+/generate - رفع ملف إكسل لإنشاء القوائم المالية (/generate pdf لتقرير PDF، /generate json للأرقام فقط، /generate income لقائمة الدخل فقط)
+/consolidate - توحيد القوائم المالية لعدة شركات
 
 Welcome to the Financial Statements Bot! 👋
 This bot helps you prepare the five financial statements automatically.
@@ -32,22 +121,27 @@ This bot helps you prepare the five financial statements automatically.
 Use the following commands:
 /start - Start using the bot
 /help - Display help
-/template - Get Excel template to fill
-/generate - Upload Excel file to generate financial statements
+/template - Get Excel template to fill (/template 5 for five periods)
+/generate - Upload Excel file to generate financial statements (/generate pdf for a PDF report, /generate json for the numbers only, /generate income for the income statement only)
+/consolidate - Consolidate the statements of several companies
 """
 
 HELP_MESSAGE = """
 كيفية استخدام البوت:
-1. استخدم الأمر /template للحصول على قالب إكسل
+1. استخدم الأمر /template للحصول على قالب إكسل (أو /template 5 لقالب بخمس فترات)
 2. قم بتعبئة البيانات المالية في القالب
-3. استخدم الأمر /generate وقم برفع ملف الإكسل المعبأ
+3. استخدم الأمر /generate وقم برفع ملف الإكسل المعبأ (أو ملف zip يحتوي عدة ملفات)
 4. انتظر حتى يتم إنشاء القوائم المالية وتحميلها
+يمكن أيضاً رفع ملف CSV أو JSON أو JSONL بالأعمدة statement و item و column و value
+استخدم /generate png لاستلام الرسوم البيانية كصور أيضاً
 
 How to use the bot:
-1. Use /template command to get the Excel template
+1. Use /template command to get the Excel template (or /template 5 for a five-period template)
 2. Fill in the financial data in the template
-3. Use /generate command and upload the filled Excel file
+3. Use /generate command and upload the filled Excel file (or a zip of several files)
 4. Wait until the financial statements are generated and downloaded
+CSV, JSON or JSONL exports with statement, item, column and value columns can be uploaded too
+Use /generate png to receive the charts as images as well
 """
 
 TEMPLATE_MESSAGE = "يرجى استخدام هذا القالب لتعبئة البيانات المالية. / Please use this template to fill in the financial data."
@@ -55,3 +149,23 @@ UPLOAD_MESSAGE = "يرجى رفع ملف الإكسل المعبأ. / Please upl
 PROCESSING_MESSAGE = "جاري معالجة البيانات... / Processing data..."
 SUCCESS_MESSAGE = "تم إنشاء القوائم المالية بنجاح! / Financial statements have been successfully generated!"
 ERROR_MESSAGE = "حدث خطأ أثناء معالجة البيانات. يرجى التأكد من صحة البيانات المدخلة. / An error occurred while processing data. Please make sure the entered data is correct."
+BUSY_MESSAGE = "البوت مشغول حالياً بمعالجة ملفات أخرى. يرجى المحاولة بعد قليل. / The bot is busy processing other files. Please try again shortly."
+OPTIONS_MESSAGE = "خيار غير معروف: {option}. الصيغ المتاحة: {formats}. الأوراق المتاحة: {sheets}. png لصور الرسوم البيانية. / Unknown option: {option}. Formats: {formats}. Sheets: {sheets}. png for chart images."
+CHARTS_CAPTION = "الرسوم البيانية المالية / Financial charts"
+PERIODS_MESSAGE = "يجب أن يكون عدد الفترات بين 2 و {max_periods}. / The number of periods must be between 2 and {max_periods}."
+CONSOLIDATE_MESSAGE = """
+يرجى رفع ملفات الإكسل المعبأة لكل شركة (أو ملف zip يحتويها). ملف الاستبعادات بين الشركات يجب أن يبدأ اسمه بـ eliminations. أرسل /done عند الانتهاء.
+
+Please upload the filled Excel file of each company (or a zip containing them). The intercompany eliminations file must be named starting with "eliminations". Send /done when finished.
+"""
+CONSOLIDATE_RECEIVED_MESSAGE = "تم استلام {count} ملف. / {count} file(s) received."
+CONSOLIDATE_EMPTY_MESSAGE = "لم يتم رفع أي ملف للتوحيد. استخدم /consolidate للبدء. / No files were uploaded for consolidation. Use /consolidate to start."
+CONSOLIDATE_CLOSED_MESSAGE = "وصل الملف بعد انتهاء التوحيد ولم يتم تضمينه. استخدم /consolidate للبدء من جديد. / The file arrived after the consolidation ended and was not included. Use /consolidate to start again."
+CONSOLIDATE_LIMIT_MESSAGE = "تم الوصول إلى الحد الأقصى لعدد الملفات ({max_files}). / The maximum number of files ({max_files}) has been reached."
+ZIP_PROGRESS_MESSAGE = "جاري المعالجة: {done} من {total}... / Processing: {done} of {total}..."
+ZIP_SUMMARY_MESSAGE = "تم إنشاء {succeeded} من {total} ملف، وفشل {failed}. / {succeeded} of {total} files generated, {failed} failed."
+ZIP_EMPTY_MESSAGE = "لا يحتوي ملف zip على ملفات إكسل أو CSV أو JSON. / The zip file contains no Excel, CSV or JSON files."
+ZIP_LIMIT_MESSAGE = "يحتوي ملف zip على أكثر من {max_files} ملف. / The zip file contains more than {max_files} files."
+ZIP_SIZE_MESSAGE = "يحتوي ملف zip على ملف أكبر من {max_mb} ميغابايت بعد فك الضغط. / The zip file contains a file larger than {max_mb} MB uncompressed."
+QUEUED_MESSAGE = "تم استلام الملف، وسيتم إرسال القوائم المالية فور جاهزيتها. / File received; the financial statements will be sent as soon as they are ready."
+TIMEOUT_MESSAGE = "استغرقت معالجة الملف وقتاً أطول من المسموح. / Processing the file took longer than allowed."
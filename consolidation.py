@@ -0,0 +1,104 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from data_import import input_format, load_input
+from statement_engine import derive_statements
+from statement_model import PERIOD_STATEMENTS, STATEMENT_ITEMS, Statement
+
+# Statements summed across entities
+CONSOLIDATED_STATEMENTS = PERIOD_STATEMENTS + ('equity',)
+
+# Input workbooks whose name starts with one of these hold the intercompany
+# eliminations; their amounts are subtracted from the sum of the entities
+ELIMINATION_PREFIXES = ('eliminations', 'elimination', 'استبعادات')
+
+def is_elimination_file(file_name):
+    """Whether an input file holds the intercompany eliminations."""
+    return os.path.basename(file_name).lower().startswith(ELIMINATION_PREFIXES)
+
+def entity_name(file_name):
+    """Entity name shown in the output: the file name without its extension."""
+    return os.path.splitext(os.path.basename(file_name))[0]
+
+def parse_input(source, file_format='.xlsx'):
+    """Parse one entity input (a path or bytes) and derive its totals."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return derive_statements(load_input(source, file_format)).data
+
+def parse_entities(inputs, max_workers=None):
+    """Parse entity inputs in parallel, one process per input.
+
+    `inputs` is a list of (name, source) pairs, where the source is a path
+    or bytes and the name gives its format. Returns the parsed data in the
+    same order.
+    """
+    sources = [source for _, source in inputs]
+    formats = [input_format(name) for name, _ in inputs]
+    if len(inputs) == 1:
+        return [parse_input(sources[0], formats[0])]
+    from worker_pool import process_context, warm_worker
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=process_context(), initializer=warm_worker) as executor:
+        return list(executor.map(parse_input, sources, formats))
+
+def combine_statements(statements, signs):
+    """Add statements row by row, matching rows by label.
+
+    Rows follow the template order, then rows the template doesn't know about
+    in the order they were first seen. `signs` holds +1 or -1 per statement.
+    """
+    name, columns = statements[0].name, statements[0].columns
+    seen = {label for statement in statements for label in statement.labels}
+    labels = [label for label in STATEMENT_ITEMS[name] if label in seen]
+    known = set(labels)
+    for statement in statements:
+        for label in statement.labels:
+            if label not in known:
+                known.add(label)
+                labels.append(label)
+    index = {label: i for i, label in enumerate(labels)}
+    values = np.zeros((len(labels), len(columns)))
+    for statement, sign in zip(statements, signs):
+        if statement.columns != columns:
+            raise ValueError(f"All entities must have the same periods ({len(columns)} expected, got {len(statement.columns)})")
+        values[[index[label] for label in statement.labels]] += sign * statement.values
+    return Statement(name, columns, labels, values)
+
+def consolidate(entities, eliminations=()):
+    """Consolidate parsed entities into one set of statements.
+
+    `entities` is a list of (name, data) pairs as returned by parse_input;
+    `eliminations` is a list of parsed data whose amounts are subtracted.
+    The result has the same shape as process_excel_file's output, plus the
+    'entities' and summed 'eliminations' (None without any) it was built
+    from, for the per-entity sheet.
+    """
+    if not entities:
+        raise ValueError("No entity inputs to consolidate")
+    parts = [data for _, data in entities] + list(eliminations)
+    signs = [1] * len(entities) + [-1] * len(eliminations)
+    consolidated = {
+        'periods': entities[0][1].get('periods'),
+        'entities': entities,
+        'eliminations': None,
+    }
+    for statement in CONSOLIDATED_STATEMENTS:
+        consolidated[statement] = combine_statements([data[statement] for data in parts], signs)
+    if eliminations:
+        consolidated['eliminations'] = {
+            statement: combine_statements([data[statement] for data in eliminations], [1] * len(eliminations))
+            for statement in CONSOLIDATED_STATEMENTS
+        }
+    # Notes are kept per entity
+    consolidated['notes'] = {}
+    for key in entities[0][1]['notes']:
+        texts = [f"{name}: {data['notes'][key]}" for name, data in entities if data['notes'].get(key)]
+        consolidated['notes'][key] = "\n".join(texts)
+    return consolidated
+
+def consolidate_files(inputs, eliminations=(), max_workers=None):
+    """Parse (name, source) inputs and eliminations in parallel and consolidate them."""
+    parsed = parse_entities(list(inputs) + list(eliminations), max_workers)
+    entities = [(entity_name(name), data) for (name, _), data in zip(inputs, parsed)]
+    return consolidate(entities, parsed[len(inputs):])
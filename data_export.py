@@ -0,0 +1,84 @@
+import io
+import json
+import zipfile
+import numpy as np
+import pandas as pd
+from statement_engine import derive_statements, key_metrics, STATEMENTS
+from statement_model import LineItem, period_labels
+
+# Output formats holding the numbers only, without styling or charts
+EXPORT_FORMATS = ('json', 'parquet')
+
+def export_tables(data):
+    """The derived statements, overview metrics, reconciliation and notes as DataFrames.
+
+    Every table is in long format, one row per value, so the JSON and
+    Parquet outputs share the same schema:
+    statements (statement, item, code, column, period, value),
+    metrics (metric, column, period, value; the change of the latest period
+    is in column 'change_percent'), reconciliation (statement, item, column,
+    entered, derived, difference) and notes (note, text).
+    """
+    derived = derive_statements(data)
+    data = derived.data
+    columns = data['income'].columns
+    periods = dict(zip(columns, data.get('periods') or period_labels(len(columns))))
+    # Statements
+    frames = []
+    for name, _, _ in STATEMENTS:
+        statement = data[name]
+        rows, width = statement.values.shape
+        codes = [LineItem(code).name if code else '' for code in statement.codes.tolist()]
+        frames.append(pd.DataFrame({
+            'statement': name,
+            'item': np.repeat(np.array(statement.labels, dtype=object), width),
+            'code': np.repeat(np.array(codes, dtype=object), width),
+            'column': np.tile(np.array(statement.columns, dtype=object), rows),
+            'value': statement.values.ravel(),
+        }))
+    statements = pd.concat(frames, ignore_index=True)
+    statements.insert(4, 'period', statements['column'].map(periods))
+    # Overview metrics, one column per period plus the change
+    labels, values, changes = key_metrics(data)
+    metrics = pd.DataFrame(values, columns=list(columns))
+    metrics.insert(0, 'metric', labels)
+    metrics = metrics.melt(id_vars='metric', var_name='column', value_name='value')
+    metrics = pd.concat([metrics, pd.DataFrame({'metric': labels, 'column': 'change_percent', 'value': changes})],
+                        ignore_index=True)
+    metrics.insert(2, 'period', metrics['column'].map(periods))
+    reconciliation = pd.DataFrame(derived.reconciliation,
+                                  columns=['statement', 'item', 'column', 'entered', 'derived', 'difference'])
+    notes = pd.DataFrame(list((data.get('notes') or {}).items()), columns=['note', 'text'])
+    return {'statements': statements, 'metrics': metrics, 'reconciliation': reconciliation, 'notes': notes}
+
+def export_bytes(data, output_format):
+    """Serialize the statements to JSON or to a zip of Parquet tables, one per export table."""
+    tables = export_tables(data)
+    if output_format == 'json':
+        # pandas writes the records (missing periods become null); only the outer object is assembled here
+        parts = [f'"periods": {json.dumps(list(data.get("periods") or ()), ensure_ascii=False)}']
+        parts += [f'"{name}": {table.to_json(orient="records", force_ascii=False, double_precision=15)}'
+                  for name, table in tables.items()]
+        return ('{' + ', '.join(parts) + '}').encode('utf-8')
+    if output_format == 'parquet':
+        try:
+            import pyarrow
+        except ImportError:
+            raise ValueError("Parquet output needs pyarrow (pip install pyarrow)")
+        output = io.BytesIO()
+        # Parquet files are already compressed, so they are stored as is
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+            for name, table in tables.items():
+                archive.writestr(f"{name}.parquet", table.to_parquet(index=False))
+        return output.getvalue()
+    raise ValueError(f"Unknown output format: {output_format}")
+
+def export_statements(data, output_path, output_format):
+    """Write the statements to `output_path` (a path or a binary file-like object) in an export format."""
+    output_bytes = export_bytes(data, output_format)
+    if hasattr(output_path, 'write'):
+        output_path.write(output_bytes)
+    else:
+        with open(output_path, 'wb') as f:
+            f.write(output_bytes)
+    return output_path
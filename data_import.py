@@ -0,0 +1,222 @@
+import csv
+import io
+import json
+import os
+import re
+from datetime import datetime
+from bulk import INPUT_EXTENSIONS
+from excel_processor import MAX_PERIODS, NOTE_KEYS, process_excel_file
+from statement_model import EQUITY_COLUMNS, PERIOD_STATEMENTS, Statement
+from statement_model import find_label, period_columns, period_labels, statement_columns
+
+# Columns of a CSV input, one record per value
+CSV_FIELDS = ('statement', 'item', 'column', 'value')
+
+# Period labels whose order can be told: 2024, FY2024, 2024-03, 2024/03/31, 2024 Q1
+YEAR_LABEL = re.compile(r'^(?:FY\s*)?(\d{4})(?:[-/.](\d{1,2}))?(?:[-/.](\d{1,2}))?$', re.IGNORECASE)
+QUARTER_LABEL = re.compile(r'^(?:(\d{4})\s*-?\s*Q([1-4])|Q([1-4])\s*-?\s*(\d{4}))$', re.IGNORECASE)
+# Month names, e.g. Mar 2024, March 2024, 03/2024
+MONTH_FORMATS = ('%b %Y', '%B %Y', '%b-%Y', '%B-%Y', '%m/%Y')
+
+def input_format(file_name):
+    """Format of an input file from its name, e.g. '.csv'."""
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension not in INPUT_EXTENSIONS:
+        raise ValueError(f"Unsupported input format: {extension or file_name}")
+    return extension
+
+def load_input(source, file_format=None):
+    """Parse an input file in any supported format.
+
+    `source` is a path or a binary file-like object; `file_format` defaults
+    to the extension of the path.
+    """
+    file_format = file_format or input_format(source)
+    if file_format == '.xlsx':
+        return process_excel_file(source)
+    if file_format == '.csv':
+        return process_csv_file(source)
+    return process_json_file(source, lines=file_format == '.jsonl')
+
+def process_csv_file(file_path):
+    """Parse a CSV export with one statement,item,column,value record per line.
+
+    `item` is a template label or a LineItem name (e.g. INCOME_TOTAL_REVENUE).
+    `column` is a column key (current, previous, previous_2, ... or an equity
+    component) or a period label such as 2024, FY2024, 2024-03 or Q1 2024;
+    period labels are ordered most recent first by date, whatever order the
+    file lists them in, and labels whose order can't be told (e.g. Budget
+    and Actual) need column keys instead. Notes use statement 'notes' and
+    item note1..note7, and records with statement 'periods' name the period
+    columns. The file is read one record at a time.
+    """
+    try:
+        with _text_stream(file_path) as stream:
+            reader = csv.reader(stream)
+            header = [field.strip().lower() for field in next(reader, [])]
+            missing = [field for field in CSV_FIELDS if field not in header]
+            if missing:
+                raise ValueError(f"Missing CSV columns: {', '.join(missing)}")
+            positions = [header.index(field) for field in CSV_FIELDS]
+            collector = InputCollector()
+            for line_number, row in enumerate(reader, start=2):
+                if not any(row):
+                    continue
+                row = row + [''] * (len(header) - len(row))
+                collector.add(*(row[position] for position in positions), where=f"line {line_number}")
+            return collector.data()
+    except Exception as e:
+        raise Exception(f"Error processing CSV file: {str(e)}")
+
+def process_json_file(file_path, lines=False):
+    """Parse a JSON document or a JSON Lines stream of records.
+
+    A document mirrors the parsed data: {"periods": [...], "income": {item:
+    {column: value} or [values]}, ..., "notes": {"note1": text}}. With
+    lines=True every line is one {"statement", "item", "column", "value"}
+    record, as in process_csv_file, and the stream is read line by line.
+    """
+    try:
+        collector = InputCollector()
+        with _text_stream(file_path) as stream:
+            if lines:
+                for line_number, line in enumerate(stream, start=1):
+                    if line.strip():
+                        record = json.loads(line)
+                        collector.add(*(record.get(field) for field in CSV_FIELDS), where=f"line {line_number}")
+            else:
+                _collect_document(collector, json.load(stream))
+        return collector.data()
+    except Exception as e:
+        raise Exception(f"Error processing JSON file: {str(e)}")
+
+def _text_stream(file_path):
+    if isinstance(file_path, (str, os.PathLike)):
+        return open(file_path, encoding='utf-8-sig', newline='')
+    return io.TextIOWrapper(file_path, encoding='utf-8-sig', newline='')
+
+def _collect_document(collector, document):
+    for column, label in zip(period_columns(MAX_PERIODS), document.get('periods') or []):
+        collector.add('periods', None, column, label)
+    for key, text in (document.get('notes') or {}).items():
+        collector.add('notes', key, None, text)
+    for statement in (*PERIOD_STATEMENTS, 'equity'):
+        for item, values in (document.get(statement) or {}).items():
+            if isinstance(values, list):
+                values = dict(zip(statement_columns(statement, MAX_PERIODS), values))
+            for column, value in values.items():
+                collector.add(statement, item, column, value)
+
+class InputCollector:
+    """Collects statement,item,column,value records into the parsed data shape."""
+
+    def __init__(self):
+        self.items = {statement: {} for statement in (*PERIOD_STATEMENTS, 'equity')}
+        self.notes = {}
+        self.labels = {}
+        # Periods given by label rather than column key, ordered in data()
+        self._labelled = set()
+        self._period_index = {column: j for j, column in enumerate(period_columns(MAX_PERIODS))}
+
+    def add(self, statement, item, column, value, where=None):
+        """Add one record; blank values are ignored."""
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return
+        statement = str(statement or '').strip().lower().replace(' ', '_').replace('-', '_')
+        try:
+            if statement == 'notes':
+                self.notes[str(item).strip()] = str(value)
+            elif statement == 'periods':
+                self.labels[self._period(column)] = str(value).strip()
+            elif statement in self.items:
+                label = resolve_item(statement, str(item).strip())
+                j = self._period(column) if statement in PERIOD_STATEMENTS else _equity_column(column)
+                self.items[statement].setdefault(label, {})[j] = value
+            else:
+                raise ValueError(f"Unknown statement {statement!r}")
+        except ValueError as e:
+            raise ValueError(f"{e} ({where})" if where else str(e))
+
+    def _period(self, column):
+        column = str(column).strip()
+        key = column.lower()
+        if key in self._period_index:
+            return self._period_index[key]
+        # A period label such as 2024; data() orders these periods by date
+        for j, label in self.labels.items():
+            if label == column:
+                return j
+        j = len(self.labels)
+        while j in self.labels:
+            j += 1
+        if j >= MAX_PERIODS:
+            raise ValueError(f"More than {MAX_PERIODS} periods")
+        self.labels[j] = column
+        self._labelled.add(j)
+        return j
+
+    def _order_periods(self):
+        """Renumber the periods given by label so the most recent comes first.
+
+        Exports often list periods oldest first, so their order in the file
+        says nothing; labels that aren't dates can't be ordered and are refused.
+        """
+        slots = sorted(self._labelled)
+        if len(slots) < 2:
+            return
+        keys = {j: period_sort_key(self.labels[j]) for j in slots}
+        unordered = [self.labels[j] for j in slots if keys[j] is None]
+        if unordered:
+            raise ValueError(f"Can't tell the order of the periods {', '.join(unordered)}; use the columns "
+                             f"current, previous, previous_2, ... and name them with 'periods' records")
+        mapping = dict(zip(sorted(slots, key=keys.get, reverse=True), slots))
+        self.labels = {mapping.get(j, j): label for j, label in self.labels.items()}
+        for statement in PERIOD_STATEMENTS:
+            for label, row in self.items[statement].items():
+                self.items[statement][label] = {mapping.get(j, j): value for j, value in row.items()}
+        self._labelled = set(slots)
+
+    def data(self):
+        """The collected records as process_excel_file would return them."""
+        self._order_periods()
+        used = [j for statement in PERIOD_STATEMENTS for row in self.items[statement].values() for j in row]
+        periods = max(used + list(self.labels) + [1]) + 1
+        labels = period_labels(periods)
+        for j, label in self.labels.items():
+            if j < periods:
+                labels[j] = label
+        data = {'periods': labels}
+        for statement, items in self.items.items():
+            columns = statement_columns(statement, periods)
+            rows = [(label, [row.get(j, 0) for j in range(len(columns))]) for label, row in items.items()]
+            data[statement] = Statement.from_rows(statement, columns, rows)
+        data['notes'] = {key: self.notes.get(key, "") for key in NOTE_KEYS}
+        return data
+
+def period_sort_key(label):
+    """(year, month, day) of a date-like period label, or None when its place in time can't be told."""
+    label = str(label).strip()
+    match = YEAR_LABEL.match(label)
+    if match:
+        return tuple(int(part or 0) for part in match.groups())
+    match = QUARTER_LABEL.match(label)
+    if match:
+        year, quarter = (match.group(1), match.group(2)) if match.group(1) else (match.group(4), match.group(3))
+        return (int(year), int(quarter) * 3, 0)
+    for date_format in MONTH_FORMATS:
+        try:
+            date = datetime.strptime(label, date_format)
+        except ValueError:
+            continue
+        return (date.year, date.month, 0)
+    return None
+
+def resolve_item(statement, item):
+    """Template label of an item given as a label, half a label or a LineItem name; other items are kept as is."""
+    return find_label(statement, item) or item
+
+def _equity_column(column):
+    column = str(column).strip().lower()
+    if column not in EQUITY_COLUMNS:
+        raise ValueError(f"Unknown equity column {column!r}, expected one of {', '.join(EQUITY_COLUMNS)}")
+    return EQUITY_COLUMNS.index(column)
@@ -1,11 +1,63 @@
 import os
+import re
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from styles import register_styles, SUBTITLE, INPUT_HEADER, BOLD
 from openpyxl.utils import get_column_letter
+from statement_model import INCOME_ITEMS, BALANCE_ITEMS, EQUITY_ITEMS, CASH_FLOW_ITEMS, DEFAULT_PERIODS, EQUITY_COLUMNS, Statement
+from statement_model import CODES, find_label, period_columns
 
-def create_template(output_path):
-    """Create an Excel template for financial data input."""
+# Bump when the template layout changes in a way the item lists don't capture
+TEMPLATE_VERSION = 3
+
+# Most period columns a template can have (e.g. 5 years or 12 months fit)
+MAX_PERIODS = 24
+
+# First row of the line items in the statement sheets, below the header row
+FIRST_ITEM_ROW = 4
+
+# Hidden column holding the LineItem name of every template row, past the last
+# possible amount column, so rows are found even if their label is edited
+ITEM_CODE_COLUMN = 2 + MAX_PERIODS
+
+# Header of an amount column, e.g. 'المبلغ (السنة الحالية) | Amount (Current Year)'
+AMOUNT_HEADER = re.compile(r'^المبلغ \((.+)\) \| Amount \((.+)\)$')
+
+# Sign convention, repeated in row 2 of the equity and cash flow sheets
+SIGN_NOTE = ('أدخل جميع المبالغ بأرقام موجبة؛ تُطرح المصروفات والتوزيعات والتدفقات الخارجة تلقائياً، وتُدخل التغيرات والتعديلات بإشارتها. | '
+             'Enter all amounts as positive numbers; expenses, dividends and cash outflows are subtracted automatically, '
+             'while changes and adjustments are entered with their sign.')
+
+# Notes sections (cell, title)
+NOTES_SECTIONS = [
+    ('A3', 'ملاحظة 1: معلومات عامة | Note 1: General Information'),
+    ('A7', 'ملاحظة 2: أسس الإعداد | Note 2: Basis of Preparation'),
+    ('A11', 'ملاحظة 3: السياسات المحاسبية الهامة | Note 3: Significant Accounting Policies'),
+    ('A15', 'ملاحظة 4: الأحكام والتقديرات المحاسبية الهامة | Note 4: Significant Accounting Judgments and Estimates'),
+    ('A19', 'ملاحظة 5: إدارة المخاطر المالية | Note 5: Financial Risk Management'),
+    ('A23', 'ملاحظة 6: معلومات إضافية حول بنود القوائم المالية | Note 6: Additional Information on Financial Statement Items'),
+    ('A27', 'ملاحظة 7: أحداث لاحقة | Note 7: Subsequent Events')
+]
+
+# Keys of the notes, in NOTES_SECTIONS order
+NOTE_KEYS = [f'note{i}' for i in range(1, len(NOTES_SECTIONS) + 1)]
+
+def period_headers(periods=DEFAULT_PERIODS):
+    """Amount column headers of a template with `periods` periods, most recent first."""
+    if periods == DEFAULT_PERIODS:
+        return ['المبلغ (السنة الحالية) | Amount (Current Year)', 'المبلغ (السنة السابقة) | Amount (Previous Year)']
+    return ['المبلغ (الفترة الحالية) | Amount (Current Period)'] + [
+        f'المبلغ (الفترة السابقة {k}) | Amount (Prior Period {k})' for k in range(1, periods)]
+
+def create_template(output_path, periods=DEFAULT_PERIODS):
+    """Create an Excel template for financial data input.
+
+    The income, balance and cash flow sheets get one amount column per
+    period, most recent first.
+    """
+    if not 2 <= periods <= MAX_PERIODS:
+        raise ValueError(f"Periods must be between 2 and {MAX_PERIODS}")
     wb = openpyxl.Workbook()
+    register_styles(wb)
     
     # Create sheets for different financial components
     sheets = {
@@ -27,7 +79,7 @@ def create_template(output_path):
     # Set up Instructions sheet
     instructions = sheets['تعليمات | Instructions']
     instructions['A1'] = 'تعليمات استخدام القالب | Template Instructions'
-    instructions['A1'].font = Font(bold=True, size=14)
+    instructions['A1'].style = SUBTITLE
     instructions['A3'] = 'مرحباً بكم في قالب القوائم المالية! | Welcome to the Financial Statements Template!'
     instructions['A5'] = '1. قم بتعبئة البيانات المالية في كل ورقة من أوراق هذا الملف.'
     instructions['A6'] = '1. Fill in the financial data in each sheet of this file.'
@@ -37,6 +89,12 @@ def create_template(output_path):
     instructions['A12'] = '3. Complete all sheets to get complete and accurate financial statements.'
     instructions['A14'] = '4. بعد الانتهاء، احفظ الملف وقم برفعه باستخدام أمر /generate في البوت.'
     instructions['A15'] = '4. When finished, save the file and upload it using the /generate command in the bot.'
+    instructions['A17'] = '5. يمكنك إدراج الصفوف أو حذفها أو إعادة ترتيبها، فالبنود تُقرأ من أسمائها.'
+    instructions['A18'] = '5. You may insert, delete or reorder rows; items are read by their names.'
+    instructions['A20'] = '6. أدخل جميع المبالغ بأرقام موجبة، بما فيها المصروفات والتوزيعات والتدفقات النقدية الخارجة مثل شراء الممتلكات وسداد القروض؛ فهي تُطرح تلقائياً. التغيرات في رأس المال العامل والتعديلات الأخرى تُدخل بإشارتها حسب أثرها على النقد.'
+    instructions['A21'] = '6. Enter all amounts as positive numbers, including expenses, dividends and cash outflows such as purchases of property and loan repayments; they are subtracted automatically. Changes in working capital and other adjustments are entered with their sign, as their effect on cash.'
+    instructions['A23'] = '7. تُحسب الإجماليات من بنودها، وأي إجمالي مدخل لا يطابقها يظهر في قسم المطابقة في التقرير العام.'
+    instructions['A24'] = '7. Totals are calculated from their line items; any entered total that differs is listed in the reconciliation section of the Overview.'
     
     # Format cells to appropriate width
     for col in range(1, 10):
@@ -44,11 +102,11 @@ def create_template(output_path):
     
     # Set up Income Statement sheet
     income = sheets['الإيرادات والمصروفات | Income']
-    setup_income_sheet(income)
+    setup_income_sheet(income, periods)
     
     # Set up Balance Sheet
     balance = sheets['الأصول والخصوم | Balance']
-    setup_balance_sheet(balance)
+    setup_balance_sheet(balance, periods)
     
     # Set up Equity Statement
     equity = sheets['حقوق الملكية | Equity']
@@ -56,7 +114,7 @@ def create_template(output_path):
     
     # Set up Cash Flow Statement
     cash_flow = sheets['التدفقات النقدية | Cash Flow']
-    setup_cash_flow_sheet(cash_flow)
+    setup_cash_flow_sheet(cash_flow, periods)
     
     # Set up Notes
     notes = sheets['الملاحظات | Notes']
@@ -66,125 +124,67 @@ def create_template(output_path):
     wb.save(output_path)
     return output_path
 
-def setup_income_sheet(sheet):
+def setup_period_headers(sheet, periods):
+    """Write one amount header per period in row 3, starting at column B."""
+    for column, header in enumerate(period_headers(periods), start=2):
+        sheet.cell(row=3, column=column, value=header)
+        sheet.column_dimensions[get_column_letter(column)].width = 25
+
+def setup_item_codes(sheet, statement, items):
+    """Write the LineItem name of every item row into the hidden item-code column."""
+    codes = CODES[statement]
+    for i, item in enumerate(items, start=FIRST_ITEM_ROW):
+        if item:
+            sheet.cell(row=i, column=ITEM_CODE_COLUMN, value=codes[item].name)
+    sheet.column_dimensions[get_column_letter(ITEM_CODE_COLUMN)].hidden = True
+
+def setup_income_sheet(sheet, periods=DEFAULT_PERIODS):
     # Set up header
     sheet['A1'] = 'قائمة الدخل | Income Statement'
-    sheet['A1'].font = Font(bold=True, size=14)
+    sheet['A1'].style = SUBTITLE
     sheet['A3'] = 'البند | Item'
-    sheet['B3'] = 'المبلغ (السنة الحالية) | Amount (Current Year)'
-    sheet['C3'] = 'المبلغ (السنة السابقة) | Amount (Previous Year)'
+    setup_period_headers(sheet, periods)
     
     # Format header row
     for cell in sheet['3:3']:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
-        cell.alignment = Alignment(horizontal='center')
+        cell.style = INPUT_HEADER
     
     # Set up income items
-    income_items = [
-        'الإيرادات | Revenues',
-        'إيرادات المبيعات | Sales Revenue',
-        'إيرادات الخدمات | Services Revenue',
-        'إيرادات أخرى | Other Revenue',
-        'إجمالي الإيرادات | Total Revenue',
-        '',
-        'المصروفات | Expenses',
-        'تكلفة البضاعة المباعة | Cost of Goods Sold',
-        'مصروفات الرواتب | Salary Expenses',
-        'مصروفات الإيجار | Rent Expenses',
-        'مصروفات المرافق | Utility Expenses',
-        'مصروفات التسويق | Marketing Expenses',
-        'الاستهلاك والإطفاء | Depreciation & Amortization',
-        'مصروفات أخرى | Other Expenses',
-        'إجمالي المصروفات | Total Expenses',
-        '',
-        'الربح قبل الضرائب | Profit Before Tax',
-        'ضريبة الدخل | Income Tax',
-        'صافي الربح | Net Profit'
-    ]
-    
-    for i, item in enumerate(income_items, start=4):
+    for i, item in enumerate(INCOME_ITEMS, start=FIRST_ITEM_ROW):
         sheet[f'A{i}'] = item
         if item.startswith('إجمالي') or item.startswith('صافي') or item.startswith('الربح'):
-            sheet[f'A{i}'].font = Font(bold=True)
+            sheet[f'A{i}'].style = BOLD
+    setup_item_codes(sheet, 'income', INCOME_ITEMS)
     
     # Format columns width
     sheet.column_dimensions['A'].width = 35
-    sheet.column_dimensions['B'].width = 25
-    sheet.column_dimensions['C'].width = 25
 
-def setup_balance_sheet(sheet):
+def setup_balance_sheet(sheet, periods=DEFAULT_PERIODS):
     # Set up header
     sheet['A1'] = 'قائمة المركز المالي | Balance Sheet'
-    sheet['A1'].font = Font(bold=True, size=14)
+    sheet['A1'].style = SUBTITLE
     sheet['A3'] = 'البند | Item'
-    sheet['B3'] = 'المبلغ (السنة الحالية) | Amount (Current Year)'
-    sheet['C3'] = 'المبلغ (السنة السابقة) | Amount (Previous Year)'
+    setup_period_headers(sheet, periods)
     
     # Format header row
     for cell in sheet['3:3']:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
-        cell.alignment = Alignment(horizontal='center')
-    
-    # Set up assets
-    assets = [
-        'الأصول | Assets',
-        'الأصول المتداولة | Current Assets',
-        'النقدية وما في حكمها | Cash and Cash Equivalents',
-        'الذمم المدينة | Accounts Receivable',
-        'المخزون | Inventory',
-        'أصول متداولة أخرى | Other Current Assets',
-        'إجمالي الأصول المتداولة | Total Current Assets',
-        '',
-        'الأصول غير المتداولة | Non-Current Assets',
-        'الممتلكات والمعدات | Property and Equipment',
-        'الأصول غير الملموسة | Intangible Assets',
-        'استثمارات طويلة الأجل | Long-term Investments',
-        'أصول غير متداولة أخرى | Other Non-Current Assets',
-        'إجمالي الأصول غير المتداولة | Total Non-Current Assets',
-        '',
-        'إجمالي الأصول | Total Assets',
-        '',
-        'الخصوم وحقوق الملكية | Liabilities and Equity',
-        'الخصوم المتداولة | Current Liabilities',
-        'الذمم الدائنة | Accounts Payable',
-        'القروض قصيرة الأجل | Short-term Loans',
-        'الإيرادات المؤجلة | Deferred Revenue',
-        'خصوم متداولة أخرى | Other Current Liabilities',
-        'إجمالي الخصوم المتداولة | Total Current Liabilities',
-        '',
-        'الخصوم غير المتداولة | Non-Current Liabilities',
-        'القروض طويلة الأجل | Long-term Loans',
-        'مخصص مكافأة نهاية الخدمة | End of Service Benefits',
-        'خصوم غير متداولة أخرى | Other Non-Current Liabilities',
-        'إجمالي الخصوم غير المتداولة | Total Non-Current Liabilities',
-        '',
-        'إجمالي الخصوم | Total Liabilities',
-        '',
-        'حقوق الملكية | Equity',
-        'رأس المال | Capital',
-        'الاحتياطيات | Reserves',
-        'الأرباح المحتجزة | Retained Earnings',
-        'إجمالي حقوق الملكية | Total Equity',
-        '',
-        'إجمالي الخصوم وحقوق الملكية | Total Liabilities and Equity'
-    ]
-    
-    for i, item in enumerate(assets, start=4):
+        cell.style = INPUT_HEADER
+    
+    # Set up assets, liabilities and equity items
+    for i, item in enumerate(BALANCE_ITEMS, start=FIRST_ITEM_ROW):
         sheet[f'A{i}'] = item
         if item.startswith('إجمالي') or item == 'الأصول | Assets' or item == 'الخصوم وحقوق الملكية | Liabilities and Equity' or item == 'الخصوم المتداولة | Current Liabilities' or item == 'الخصوم غير المتداولة | Non-Current Liabilities' or item == 'حقوق الملكية | Equity':
-            sheet[f'A{i}'].font = Font(bold=True)
+            sheet[f'A{i}'].style = BOLD
+    setup_item_codes(sheet, 'balance', BALANCE_ITEMS)
     
     # Format columns width
     sheet.column_dimensions['A'].width = 35
-    sheet.column_dimensions['B'].width = 25
-    sheet.column_dimensions['C'].width = 25
 
 def setup_equity_sheet(sheet):
     # Set up header
     sheet['A1'] = 'قائمة التغيرات في حقوق الملكية | Statement of Changes in Equity'
-    sheet['A1'].font = Font(bold=True, size=14)
+    sheet['A1'].style = SUBTITLE
+    sheet['A2'] = SIGN_NOTE
     sheet['A3'] = 'البند | Item'
     sheet['B3'] = 'رأس المال | Capital'
     sheet['C3'] = 'الاحتياطيات | Reserves'
@@ -193,25 +193,14 @@ def setup_equity_sheet(sheet):
     
     # Format header row
     for cell in sheet['3:3']:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
-        cell.alignment = Alignment(horizontal='center')
+        cell.style = INPUT_HEADER
     
     # Set up equity items
-    equity_items = [
-        'الرصيد في بداية السنة | Balance at beginning of year',
-        'صافي الربح للسنة | Net profit for the year',
-        'توزيعات الأرباح | Dividends',
-        'زيادة رأس المال | Capital increase',
-        'المحول للاحتياطيات | Transferred to reserves',
-        'تغييرات أخرى | Other changes',
-        'الرصيد في نهاية السنة | Balance at end of year'
-    ]
-    
-    for i, item in enumerate(equity_items, start=4):
+    for i, item in enumerate(EQUITY_ITEMS, start=FIRST_ITEM_ROW):
         sheet[f'A{i}'] = item
         if item.startswith('الرصيد في'):
-            sheet[f'A{i}'].font = Font(bold=True)
+            sheet[f'A{i}'].style = BOLD
+    setup_item_codes(sheet, 'equity', EQUITY_ITEMS)
     
     # Format columns width
     sheet.column_dimensions['A'].width = 35
@@ -220,80 +209,37 @@ def setup_equity_sheet(sheet):
     sheet.column_dimensions['D'].width = 20
     sheet.column_dimensions['E'].width = 20
 
-def setup_cash_flow_sheet(sheet):
+def setup_cash_flow_sheet(sheet, periods=DEFAULT_PERIODS):
     # Set up header
     sheet['A1'] = 'قائمة التدفقات النقدية | Cash Flow Statement'
-    sheet['A1'].font = Font(bold=True, size=14)
+    sheet['A1'].style = SUBTITLE
+    sheet['A2'] = SIGN_NOTE
     sheet['A3'] = 'البند | Item'
-    sheet['B3'] = 'المبلغ (السنة الحالية) | Amount (Current Year)'
-    sheet['C3'] = 'المبلغ (السنة السابقة) | Amount (Previous Year)'
+    setup_period_headers(sheet, periods)
     
     # Format header row
     for cell in sheet['3:3']:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
-        cell.alignment = Alignment(horizontal='center')
+        cell.style = INPUT_HEADER
     
     # Set up cash flow items
-    cash_flow_items = [
-        'التدفقات النقدية من الأنشطة التشغيلية | Cash flows from operating activities',
-        'صافي الربح | Net profit',
-        'تعديلات لـ: | Adjustments for:',
-        'الاستهلاك والإطفاء | Depreciation and amortization',
-        'التغير في الذمم المدينة | Change in accounts receivable',
-        'التغير في المخزون | Change in inventory',
-        'التغير في الذمم الدائنة | Change in accounts payable',
-        'تعديلات أخرى | Other adjustments',
-        'صافي النقد من الأنشطة التشغيلية | Net cash from operating activities',
-        '',
-        'التدفقات النقدية من الأنشطة الاستثمارية | Cash flows from investing activities',
-        'شراء ممتلكات ومعدات | Purchase of property and equipment',
-        'بيع ممتلكات ومعدات | Sale of property and equipment',
-        'استثمارات جديدة | New investments',
-        'بيع استثمارات | Sale of investments',
-        'صافي النقد من الأنشطة الاستثمارية | Net cash from investing activities',
-        '',
-        'التدفقات النقدية من الأنشطة التمويلية | Cash flows from financing activities',
-        'توزيعات أرباح مدفوعة | Dividends paid',
-        'قروض جديدة | New loans',
-        'سداد قروض | Loan repayments',
-        'زيادة رأس المال | Capital increase',
-        'صافي النقد من الأنشطة التمويلية | Net cash from financing activities',
-        '',
-        'صافي التغير في النقد وما في حكمه | Net change in cash and cash equivalents',
-        'النقد وما في حكمه في بداية السنة | Cash and cash equivalents at beginning of year',
-        'النقد وما في حكمه في نهاية السنة | Cash and cash equivalents at end of year'
-    ]
-    
-    for i, item in enumerate(cash_flow_items, start=4):
+    for i, item in enumerate(CASH_FLOW_ITEMS, start=FIRST_ITEM_ROW):
         sheet[f'A{i}'] = item
         if item.startswith('صافي النقد') or item.startswith('التدفقات النقدية') or item == 'النقد وما في حكمه في نهاية السنة | Cash and cash equivalents at end of year':
-            sheet[f'A{i}'].font = Font(bold=True)
+            sheet[f'A{i}'].style = BOLD
+    setup_item_codes(sheet, 'cash_flow', CASH_FLOW_ITEMS)
     
     # Format columns width
     sheet.column_dimensions['A'].width = 45
-    sheet.column_dimensions['B'].width = 25
-    sheet.column_dimensions['C'].width = 25
 
 def setup_notes_sheet(sheet):
     # Set up header
     sheet['A1'] = 'الملاحظات على القوائم المالية | Notes to Financial Statements'
-    sheet['A1'].font = Font(bold=True, size=14)
+    sheet['A1'].style = SUBTITLE
     
     # Set up sections
-    notes_sections = [
-        ('A3', 'ملاحظة 1: معلومات عامة | Note 1: General Information'),
-        ('A7', 'ملاحظة 2: أسس الإعداد | Note 2: Basis of Preparation'),
-        ('A11', 'ملاحظة 3: السياسات المحاسبية الهامة | Note 3: Significant Accounting Policies'),
-        ('A15', 'ملاحظة 4: الأحكام والتقديرات المحاسبية الهامة | Note 4: Significant Accounting Judgments and Estimates'),
-        ('A19', 'ملاحظة 5: إدارة المخاطر المالية | Note 5: Financial Risk Management'),
-        ('A23', 'ملاحظة 6: معلومات إضافية حول بنود القوائم المالية | Note 6: Additional Information on Financial Statement Items'),
-        ('A27', 'ملاحظة 7: أحداث لاحقة | Note 7: Subsequent Events')
-    ]
-    
-    for cell_ref, title in notes_sections:
+    for cell_ref, title in NOTES_SECTIONS:
         sheet[cell_ref] = title
-        sheet[cell_ref].font = Font(bold=True)
+        sheet[cell_ref].style = BOLD
     
     # Format columns width
     sheet.column_dimensions['A'].width = 50
@@ -308,106 +254,159 @@ def setup_notes_sheet(sheet):
     sheet['A24'] = 'قدم تفاصيل إضافية عن البنود الهامة في القوائم المالية. | Provide additional details about important items in the financial statements.'
     sheet['A28'] = 'اذكر أي أحداث هامة وقعت بعد تاريخ التقرير. | Mention any significant events that occurred after the reporting date.'
 
-def process_excel_file(file_path):
-    """Process the Excel file and extract financial data."""
+def process_excel_file(file_path, read_only=True):
+    """Process the Excel file and extract financial data.
+
+    `file_path` may be a path or a binary file-like object. The workbook
+    is opened in read-only mode by default, so only the five input sheets
+    are parsed and each sheet is streamed in a single pass. Pass
+    read_only=False to load the whole workbook into memory.
+
+    Each statement is returned as a statement_model.Statement; notes are a
+    dict of note key to text and 'periods' lists the display label of each
+    period column, most recent first.
+    """
     try:
-        wb = openpyxl.load_workbook(file_path)
-        
-        # Extract data from each sheet
-        data = {
-            'income': extract_income_data(wb['الإيرادات والمصروفات | Income']),
-            'balance': extract_balance_data(wb['الأصول والخصوم | Balance']),
-            'equity': extract_equity_data(wb['حقوق الملكية | Equity']),
-            'cash_flow': extract_cash_flow_data(wb['التدفقات النقدية | Cash Flow']),
-            'notes': extract_notes_data(wb['الملاحظات | Notes'])
-        }
+        wb = openpyxl.load_workbook(file_path, read_only=read_only, data_only=True)
+        try:
+            # The amount headers of the income sheet define the periods of every statement
+            headers = extract_period_headers(wb['الإيرادات والمصروفات | Income'])
+            periods = len(headers)
+            # Extract data from each sheet
+            data = {
+                'periods': [period_label(header) for header in headers],
+                'income': extract_income_data(wb['الإيرادات والمصروفات | Income'], periods),
+                'balance': extract_balance_data(wb['الأصول والخصوم | Balance'], periods),
+                'equity': extract_equity_data(wb['حقوق الملكية | Equity']),
+                'cash_flow': extract_cash_flow_data(wb['التدفقات النقدية | Cash Flow'], periods),
+                'notes': extract_notes_data(wb['الملاحظات | Notes'])
+            }
+        finally:
+            # Read-only workbooks keep the underlying file open until closed
+            wb.close()
         
         return data
     except Exception as e:
         raise Exception(f"Error processing Excel file: {str(e)}")
 
-def extract_income_data(sheet):
+def read_rows(sheet, min_row, max_row, max_col):
+    """Read the values of a block of rows in a single pass.
+
+    Each row is returned as a tuple padded to `max_col` values, so short rows
+    in read-only sheets unpack the same way as in fully loaded ones.
+    """
+    for values in sheet.iter_rows(min_row=min_row, max_row=max_row, max_col=max_col, values_only=True):
+        yield tuple(values) + (None,) * (max_col - len(values))
+
+def extract_period_headers(sheet):
+    """Amount headers in row 3, from column B up to the first empty one."""
+    headers = []
+    for row in read_rows(sheet, 3, 3, 1 + MAX_PERIODS):
+        for header in row[1:]:
+            if header is None or not str(header).strip():
+                break
+            headers.append(str(header).strip())
+    if len(headers) < 2:
+        raise ValueError("At least two amount columns are required in row 3 of the income sheet")
+    return headers
+
+def period_label(header):
+    """Display label of an amount header; headers the user renamed (e.g. '2024') are kept as is."""
+    match = AMOUNT_HEADER.match(header)
+    if match:
+        return f"{match.group(1)} | {match.group(2)}"
+    return header
+
+def index_rows(sheet, statement, columns):
+    """Values of every labelled row of a statement sheet, read in one pass.
+
+    A row is identified by the LineItem name in its hidden item-code column,
+    or else by its label in column A (the bilingual label, either half of
+    it, or a LineItem name), so inserted, deleted and reordered rows are all
+    read. Returns {label: values} in sheet order with `columns` values per
+    row; rows the template doesn't know keep their own label, and a repeated
+    label keeps its last row.
+    """
+    index = {}
+    for row in read_rows(sheet, FIRST_ITEM_ROW, None, ITEM_CODE_COLUMN):
+        item_name, code = row[0], row[-1]
+        label = find_label(statement, code) if code else None
+        if label is None and item_name is not None and str(item_name).strip():
+            label = find_label(statement, item_name) or str(item_name).strip()
+        if label:
+            index[label] = row[1:1 + columns]
+    return index
+
+def extract_income_data(sheet, periods=DEFAULT_PERIODS):
     """Extract data from income statement sheet."""
-    data = {}
+    rows = []
     
     # Extract revenue and expense items
-    for row in range(4, 23):  # Adjust range based on your template
-        item_name = sheet[f'A{row}'].value
-        if item_name and sheet[f'B{row}'].value is not None:
-            current_year = sheet[f'B{row}'].value
-            previous_year = sheet[f'C{row}'].value if sheet[f'C{row}'].value is not None else 0
-            data[item_name] = {'current': current_year, 'previous': previous_year}
+    for item_name, (current_year, *previous_years) in index_rows(sheet, 'income', periods).items():
+        if current_year is not None:
+            previous_years = [value if value is not None else 0 for value in previous_years]
+            rows.append((item_name, (current_year, *previous_years)))
     
-    return data
+    return Statement.from_rows('income', period_columns(periods), rows)
 
-def extract_balance_data(sheet):
+def extract_balance_data(sheet, periods=DEFAULT_PERIODS):
     """Extract data from balance sheet."""
-    data = {}
+    rows = []
     
     # Extract assets, liabilities, and equity items
-    for row in range(4, 45):  # Adjust range based on your template
-        item_name = sheet[f'A{row}'].value
-        if item_name and sheet[f'B{row}'].value is not None:
-            current_year = sheet[f'B{row}'].value
-            previous_year = sheet[f'C{row}'].value if sheet[f'C{row}'].value is not None else 0
-            data[item_name] = {'current': current_year, 'previous': previous_year}
+    for item_name, (current_year, *previous_years) in index_rows(sheet, 'balance', periods).items():
+        if current_year is not None:
+            previous_years = [value if value is not None else 0 for value in previous_years]
+            rows.append((item_name, (current_year, *previous_years)))
     
-    return data
+    return Statement.from_rows('balance', period_columns(periods), rows)
 
 def extract_equity_data(sheet):
     """Extract data from equity statement sheet."""
-    data = {}
+    rows = []
     
     # Extract equity data
-    for row in range(4, 11):  # Adjust range based on your template
-        item_name = sheet[f'A{row}'].value
-        if item_name:
-            capital = sheet[f'B{row}'].value if sheet[f'B{row}'].value is not None else 0
-            reserves = sheet[f'C{row}'].value if sheet[f'C{row}'].value is not None else 0
-            retained = sheet[f'D{row}'].value if sheet[f'D{row}'].value is not None else 0
-            total = sheet[f'E{row}'].value if sheet[f'E{row}'].value is not None else 0
-            
-            data[item_name] = {
-                'capital': capital,
-                'reserves': reserves,
-                'retained': retained,
-                'total': total
-            }
+    for item_name, values in index_rows(sheet, 'equity', len(EQUITY_COLUMNS)).items():
+        # Template rows are kept even when blank; other rows only with an amount
+        if item_name in CODES['equity'] or any(value is not None for value in values):
+            rows.append((item_name, [value if value is not None else 0 for value in values]))
     
-    return data
+    return Statement.from_rows('equity', EQUITY_COLUMNS, rows)
 
-def extract_cash_flow_data(sheet):
+def extract_cash_flow_data(sheet, periods=DEFAULT_PERIODS):
     """Extract data from cash flow statement sheet."""
-    data = {}
+    rows = []
     
     # Extract cash flow items
-    for row in range(4, 31):  # Adjust range based on your template
-        item_name = sheet[f'A{row}'].value
-        if item_name and sheet[f'B{row}'].value is not None:
-            current_year = sheet[f'B{row}'].value
-            previous_year = sheet[f'C{row}'].value if sheet[f'C{row}'].value is not None else 0
-            data[item_name] = {'current': current_year, 'previous': previous_year}
+    for item_name, (current_year, *previous_years) in index_rows(sheet, 'cash_flow', periods).items():
+        if current_year is not None:
+            previous_years = [value if value is not None else 0 for value in previous_years]
+            rows.append((item_name, (current_year, *previous_years)))
     
-    return data
+    return Statement.from_rows('cash_flow', period_columns(periods), rows)
 
 def extract_notes_data(sheet):
-    """Extract notes data."""
+    """Extract notes data.
+
+    Each note is in column B of the row below its section title, wherever
+    the title has moved to; a note whose title is missing is read from its
+    template row.
+    """
     notes = {}
-    
-    note_rows = [
-        (4, 'note1'),  # General Information
-        (8, 'note2'),  # Basis of Preparation
-        (12, 'note3'),  # Significant Accounting Policies
-        (16, 'note4'),  # Judgments and Estimates
-        (20, 'note5'),  # Financial Risk Management
-        (24, 'note6'),  # Additional Information
-        (28, 'note7')   # Subsequent Events
-    ]
-    
-    for row, note_key in note_rows:
-        if sheet[f'B{row}'].value:
-            notes[note_key] = sheet[f'B{row}'].value
-        else:
-            notes[note_key] = ""
+    titles = {title: key for (_, title), key in zip(NOTES_SECTIONS, NOTE_KEYS)}
+    template_rows = {int(cell[1:]) + 1: key for (cell, _), key in zip(NOTES_SECTIONS, NOTE_KEYS)}
+    
+    # Read columns A and B once, following the titles
+    found, fallback = {}, {}
+    note_key = None
+    for row, (label, value) in enumerate(read_rows(sheet, 1, None, 2), start=1):
+        if note_key is not None:
+            found[note_key] = value
+        if row in template_rows:
+            fallback[template_rows[row]] = value
+        note_key = titles.get(str(label).strip()) if label is not None else None
+    for note_key in NOTE_KEYS:
+        value = found[note_key] if note_key in found else fallback.get(note_key)
+        notes[note_key] = value if value else ""
     
     return notes
@@ -1,129 +1,204 @@
 import os
+import math
+from functools import partial
 import openpyxl
-import pandas as pd
-import matplotlib.pyplot as plt
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from styles import register_styles, TITLE, SUBTITLE, HEADER, BOLD, TOTAL, POSITIVE, NEGATIVE
+from openpyxl.cell import WriteOnlyCell
+from statement_engine import derive_statements, key_metrics, STATEMENTS
+from statement_model import LineItem, period_labels
 from openpyxl.utils import get_column_letter
 from openpyxl.chart import BarChart, Reference, PieChart, LineChart, Series
 from openpyxl.chart.label import DataLabelList
 
-def generate_financial_statements(data, output_path):
-    """Generate financial statements based on the provided data."""
-    wb = openpyxl.Workbook()
-    # Create sheets for different financial statements
-    sheets = {
-        'تقرير عام | Overview': wb.active,
-        'قائمة الدخل | Income Statement': wb.create_sheet(),
-        'قائمة المركز المالي | Balance Sheet': wb.create_sheet(),
-        'قائمة التغيرات في حقوق الملكية | Equity': wb.create_sheet(),
-        'قائمة التدفقات النقدية | Cash Flow': wb.create_sheet(),
-        'الملاحظات | Notes': wb.create_sheet(),
-        'الرسوم البيانية | Charts': wb.create_sheet()
-    }
-    # Rename the default sheet
-    sheets['تقرير عام | Overview'].title = 'تقرير عام | Overview'
-    # Generate each statement
-    generate_overview(sheets['تقرير عام | Overview'], data)
-    generate_income_statement(sheets['قائمة الدخل | Income Statement'], data['income'])
-    generate_balance_sheet(sheets['قائمة المركز المالي | Balance Sheet'], data['balance'])
-    generate_equity_statement(sheets['قائمة التغيرات في حقوق الملكية | Equity'], data['equity'])
-    generate_cash_flow_statement(sheets['قائمة التدفقات النقدية | Cash Flow'], data['cash_flow'])
-    generate_notes(sheets['الملاحظات | Notes'], data['notes'])
-    generate_charts(sheets['الرسوم البيانية | Charts'], data)
+# Headers of the value columns, used where a column is named in a row
+COLUMN_LABELS = {
+    'current': 'السنة الحالية | Current Year',
+    'previous': 'السنة السابقة | Previous Year',
+    'capital': 'رأس المال | Capital',
+    'reserves': 'الاحتياطيات | Reserves',
+    'retained': 'الأرباح المحتجزة | Retained Earnings',
+    'total': 'الإجمالي | Total',
+}
+
+class SheetContent:
+    """Title, column widths, rows and charts of one output sheet.
+
+    Rows are produced lazily, starting at row 1. Each row is a list of cells
+    where a cell is a plain value or a (value, style) tuple; an empty list is
+    a blank row. Charts are (anchor, make_chart) pairs, where make_chart
+    builds the chart for the worksheet the rows were written to.
+    """
+
+    def __init__(self, title, widths, rows, charts=()):
+        self.title = title
+        self.widths = widths
+        self.rows = rows
+        self.charts = charts
+
+# Keys of the output sheets, in workbook order
+SHEETS = ('overview', 'income', 'balance', 'equity', 'cash_flow', 'notes', 'charts', 'consolidation')
+
+# Sheets built from the parsed data alone, without deriving the totals
+UNDERIVED_SHEETS = {'notes'}
+
+def generate_financial_statements(data, output_path, write_only=False, sheets=None):
+    """Generate financial statements based on the provided data.
+
+    `output_path` may be a path or a writable binary file-like object. With
+    write_only=True the workbook is streamed row by row, so memory stays flat
+    however many line items there are. `sheets` limits the output to some of
+    SHEETS (all of them by default); only those sheets are built.
+    """
+    wb = build_workbook(data, write_only, sheets)
     # Save the workbook
     wb.save(output_path)
     return output_path
 
-def generate_overview(sheet, data):
+def build_workbook(data, write_only=False, sheets=None):
+    """Build the statements workbook without saving it."""
+    wb = openpyxl.Workbook(write_only=write_only)
+    register_styles(wb)
+    if not write_only:
+        # Sheets are created with their titles below
+        wb.remove(wb.active)
+    # Generate each statement
+    for content in statement_contents(data, sheets):
+        sheet = wb.create_sheet(content.title)
+        if write_only:
+            append_sheet(sheet, content)
+        else:
+            write_sheet(sheet, content)
+    return wb
+
+def select_sheets(sheets=None):
+    """Validate a subset of SHEETS and return it in workbook order (every sheet for None)."""
+    if sheets is None:
+        return SHEETS
+    unknown = [key for key in sheets if key not in SHEETS]
+    if unknown:
+        raise ValueError(f"Unknown sheets: {', '.join(unknown)} (expected some of {', '.join(SHEETS)})")
+    if not sheets:
+        raise ValueError("No sheets selected")
+    return tuple(key for key in SHEETS if key in sheets)
+
+def statement_contents(data, sheets=None):
+    """Content of the selected output sheets, in workbook order.
+
+    Totals are derived from the line items once and shared by every sheet,
+    unless only sheets that don't need them are selected.
+    """
+    sheets = select_sheets(sheets)
+    if not set(sheets) <= UNDERIVED_SHEETS:
+        derived = derive_statements(data)
+        data = derived.data
+    periods = _periods(data)
+    builders = {
+        'overview': lambda: overview_content(data, derived.reconciliation),
+        'income': lambda: income_statement_content(data['income'], periods),
+        'balance': lambda: balance_sheet_content(data['balance'], periods),
+        'equity': lambda: equity_statement_content(data['equity'], derived.differences('equity')),
+        'cash_flow': lambda: cash_flow_statement_content(data['cash_flow'], derived.differences('cash_flow'), periods),
+        'notes': lambda: notes_content(data['notes']),
+        'charts': lambda: charts_content(data),
+        'consolidation': lambda: consolidation_content(data) if data.get('entities') else None,
+    }
+    contents = [content for content in (builders[key]() for key in sheets) if content is not None]
+    if not contents:
+        raise ValueError(f"None of the selected sheets apply to this input: {', '.join(sheets)}")
+    return contents
+
+def _periods(data):
+    """Display labels of the period columns, most recent first."""
+    return data.get('periods') or period_labels(len(data['income'].columns))
+
+def _period_widths(first_width, columns):
+    """Column widths of a sheet with a wide label column and `columns` value columns."""
+    widths = {'A': first_width}
+    for column in range(2, 2 + columns):
+        widths[get_column_letter(column)] = 20
+    return widths
+
+def write_sheet(sheet, content):
+    """Write sheet content into a regular (random-access) worksheet."""
+    for column, width in content.widths.items():
+        sheet.column_dimensions[column].width = width
+    for row_index, row in enumerate(content.rows, start=1):
+        for column_index, cell in enumerate(row, start=1):
+            value, style = cell if isinstance(cell, tuple) else (cell, None)
+            if value is None:
+                continue
+            target = sheet.cell(row=row_index, column=column_index, value=value)
+            if style:
+                target.style = style
+    for anchor, make_chart in content.charts:
+        sheet.add_chart(make_chart(sheet), anchor)
+
+def append_sheet(sheet, content):
+    """Stream sheet content into a write-only worksheet, one row at a time."""
+    # Column widths must be set before the first row is written
+    for column, width in content.widths.items():
+        sheet.column_dimensions[column].width = width
+    for row in content.rows:
+        cells = []
+        for cell in row:
+            value, style = cell if isinstance(cell, tuple) else (cell, None)
+            if style and value is not None:
+                cell = WriteOnlyCell(sheet, value=value)
+                cell.style = style
+                cells.append(cell)
+            else:
+                cells.append(value)
+        sheet.append(cells)
+    for anchor, make_chart in content.charts:
+        sheet.add_chart(make_chart(sheet), anchor)
+
+def generate_overview(sheet, data, reconciliation=()):
     """Generate an overview sheet with key financial metrics."""
+    write_sheet(sheet, overview_content(data, reconciliation))
+
+def overview_content(data, reconciliation=()):
+    """Content of the overview sheet."""
+    # Format cells; the reconciliation table needs at least five columns
+    widths = _period_widths(40, max(len(_periods(data)) + 1, 4))
+    return SheetContent('تقرير عام | Overview', widths, _overview_rows(data, reconciliation))
+
+def _overview_rows(data, reconciliation):
     # Set up header
-    sheet['A1'] = 'التقرير المالي الشامل | Comprehensive Financial Report'
-    sheet['A1'].font = Font(bold=True, size=16)
-    sheet['A3'] = 'المؤشرات المالية الرئيسية | Key Financial Indicators'
-    sheet['A3'].font = Font(bold=True, size=14)
-    # Format cells
-    sheet.column_dimensions['A'].width = 40
-    sheet.column_dimensions['B'].width = 20
-    sheet.column_dimensions['C'].width = 20
-    sheet.column_dimensions['D'].width = 20
+    yield [('التقرير المالي الشامل | Comprehensive Financial Report', TITLE)]
+    yield []
+    yield [('المؤشرات المالية الرئيسية | Key Financial Indicators', SUBTITLE)]
+    yield []
     # Set up key metrics header
-    sheet['A5'] = 'المؤشر | Indicator'
-    sheet['B5'] = 'السنة الحالية | Current Year'
-    sheet['C5'] = 'السنة السابقة | Previous Year'
-    sheet['D5'] = 'التغيير٪ | Change%'
-    for cell in sheet['5:5']:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.alignment = Alignment(horizontal='center')
+    periods = _periods(data)
+    yield [(label, HEADER) for label in ('المؤشر | Indicator', *periods, 'التغيير٪ | Change%')]
     # Extract key metrics from data
     try:
-        # Revenue
-        total_revenue_current = data['income'].get('إجمالي الإيرادات | Total Revenue', {}).get('current', 0)
-        total_revenue_previous = data['income'].get('إجمالي الإيرادات | Total Revenue', {}).get('previous', 0)
-        # Net profit
-        net_profit_current = data['income'].get('صافي الربح | Net Profit', {}).get('current', 0)
-        net_profit_previous = data['income'].get('صافي الربح | Net Profit', {}).get('previous', 0)
-        # Total assets
-        total_assets_current = data['balance'].get('إجمالي الأصول | Total Assets', {}).get('current', 0)
-        total_assets_previous = data['balance'].get('إجمالي الأصول | Total Assets', {}).get('previous', 0)
-        # Total liabilities
-        total_liabilities_current = data['balance'].get('إجمالي الخصوم | Total Liabilities', {}).get('current', 0)
-        total_liabilities_previous = data['balance'].get('إجمالي الخصوم | Total Liabilities', {}).get('previous', 0)
-        # Total equity
-        total_equity_current = data['balance'].get('إجمالي حقوق الملكية | Total Equity', {}).get('current', 0)
-        total_equity_previous = data['balance'].get('إجمالي حقوق الملكية | Total Equity', {}).get('previous', 0)
-        # Cash at end of year
-        cash_end_current = data['cash_flow'].get('النقد وما في حكمه في نهاية السنة | Cash and cash equivalents at end of year', {}).get('current', 0)
-        cash_end_previous = data['cash_flow'].get('النقد وما في حكمه في نهاية السنة | Cash and cash equivalents at end of year', {}).get('previous', 0)
-        # Calculate ratios
-        profitability_current = (net_profit_current / total_revenue_current * 100) if total_revenue_current else 0
-        profitability_previous = (net_profit_previous / total_revenue_previous * 100) if total_revenue_previous else 0
-        liquidity_current = (total_assets_current / total_liabilities_current) if total_liabilities_current else 0
-        liquidity_previous = (total_assets_previous / total_liabilities_previous) if total_liabilities_previous else 0
-        debt_equity_current = (total_liabilities_current / total_equity_current) if total_equity_current else 0
-        debt_equity_previous = (total_liabilities_previous / total_equity_previous) if total_equity_previous else 0
-        # Calculate percentage changes
-        def calculate_change(current, previous):
-            if previous:
-                return ((current - previous) / previous) * 100
-            return 0
-        revenue_change = calculate_change(total_revenue_current, total_revenue_previous)
-        profit_change = calculate_change(net_profit_current, net_profit_previous)
-        assets_change = calculate_change(total_assets_current, total_assets_previous)
-        liabilities_change = calculate_change(total_liabilities_current, total_liabilities_previous)
-        equity_change = calculate_change(total_equity_current, total_equity_previous)
-        cash_change = calculate_change(cash_end_current, cash_end_previous)
-        profitability_change = calculate_change(profitability_current, profitability_previous)
-        liquidity_change = calculate_change(liquidity_current, liquidity_previous)
-        debt_equity_change = calculate_change(debt_equity_current, debt_equity_previous)
-        # Add metrics to sheet
-        metrics = [
-            ('إجمالي الإيرادات | Total Revenue', total_revenue_current, total_revenue_previous, revenue_change),
-            ('صافي الربح | Net Profit', net_profit_current, net_profit_previous, profit_change),
-            ('إجمالي الأصول | Total Assets', total_assets_current, total_assets_previous, assets_change),
-            ('إجمالي الخصوم | Total Liabilities', total_liabilities_current, total_liabilities_previous, liabilities_change),
-            ('إجمالي حقوق الملكية | Total Equity', total_equity_current, total_equity_previous, equity_change),
-            ('النقد في نهاية السنة | Cash at End of Year', cash_end_current, cash_end_previous, cash_change),
-            ('معدل الربحية٪ | Profitability Ratio %', profitability_current, profitability_previous, profitability_change),
-            ('نسبة السيولة | Liquidity Ratio', liquidity_current, liquidity_previous, liquidity_change),
-            ('نسبة الدين إلى حقوق الملكية | Debt to Equity', debt_equity_current, debt_equity_previous, debt_equity_change)
-        ]
-        for i, (metric, current, previous, change) in enumerate(metrics, start=6):
-            sheet[f'A{i}'] = metric
-            sheet[f'B{i}'] = current
-            sheet[f'C{i}'] = previous
-            sheet[f'D{i}'] = f"{change:.2f}%"
-            # Color code changes
-            if change > 0 and i < 9:  # For ratios, the meaning of positive/negative can be different
-                sheet[f'D{i}'].fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-            elif change < 0 and i < 9:
-                sheet[f'D{i}'].fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+        labels, values, changes = key_metrics(data)
+        metrics = list(zip(labels, values.tolist(), changes.tolist()))
+        net_profit_current, net_profit_previous = float(values[1, 0]), float(values[1, 1])
+        liquidity_current, debt_equity_current = float(values[7, 0]), float(values[8, 0])
+        metrics_error = None
     except Exception as e:
-        sheet['A15'] = f"خطأ في حساب المؤشرات: {str(e)}"
+        metrics = []
+        metrics_error = e
+    # Add metrics to sheet
+    for i, (metric, values, change) in enumerate(metrics, start=6):
+        # Color code changes
+        style = None
+        if change > 0 and i < 9:  # For ratios, the meaning of positive/negative can be different
+            style = POSITIVE
+        elif change < 0 and i < 9:
+            style = NEGATIVE
+        yield [metric, *values, (f"{change:.2f}%", style)]
+    if metrics_error is not None:
+        for _ in range(9):
+            yield []
+        yield [f"خطأ في حساب المؤشرات: {str(metrics_error)}"]
+    else:
+        yield []
     # Add a financial summary section
-    sheet['A16'] = 'ملخص الأداء المالي | Financial Performance Summary'
-    sheet['A16'].font = Font(bold=True, size=14)
+    yield [('ملخص الأداء المالي | Financial Performance Summary', SUBTITLE)]
+    yield []
     try:
         if net_profit_current > net_profit_previous:
             performance = "تحسن الأداء المالي مقارنة بالعام السابق. | Financial performance improved compared to previous year."
@@ -131,7 +206,6 @@ def generate_overview(sheet, data):
             performance = "انخفاض الأداء المالي مقارنة بالعام السابق. | Financial performance declined compared to previous year."
         else:
             performance = "استقرار الأداء المالي مقارنة بالعام السابق. | Financial performance stable compared to previous year."
-        sheet['A18'] = performance
         # Add liquidity assessment
         if liquidity_current >= 2:
             liquidity_assessment = "وضع السيولة ممتاز. | Excellent liquidity position."
@@ -139,7 +213,6 @@ def generate_overview(sheet, data):
             liquidity_assessment = "وضع السيولة جيد. | Good liquidity position."
         else:
             liquidity_assessment = "وضع السيولة يحتاج إلى تحسين. | Liquidity position needs improvement."
-        sheet['A19'] = liquidity_assessment
         # Add debt assessment
         if debt_equity_current <= 0.5:
             debt_assessment = "نسبة الدين منخفضة، مما يشير إلى مخاطر مالية منخفضة. | Low debt ratio indicating low financial risk."
@@ -147,391 +220,348 @@ def generate_overview(sheet, data):
             debt_assessment = "نسبة الدين معتدلة. | Moderate debt ratio."
         else:
             debt_assessment = "نسبة الدين مرتفعة، مما قد يشير إلى مخاطر مالية. | High debt ratio which may indicate financial risk."
-        sheet['A20'] = debt_assessment
     except Exception as e:
-        sheet['A18'] = f"خطأ في تحليل الأداء: {str(e)}"
+        yield [f"خطأ في تحليل الأداء: {str(e)}"]
+    else:
+        yield [performance]
+        yield [liquidity_assessment]
+        yield [debt_assessment]
+    # Entered totals that disagree with the totals derived from their line items
+    yield []
+    yield [('مطابقة الإجماليات | Totals Reconciliation', SUBTITLE)]
+    yield []
+    if not reconciliation:
+        yield [('جميع الإجماليات مطابقة لبنودها ✓ | All totals agree with their line items ✓', POSITIVE)]
+        return
+    yield [('تنبيه: بعض الإجماليات المدخلة لا تساوي مجموع بنودها، وتم استخدام الإجماليات المحسوبة. تأكد من إدخال المصروفات والتوزيعات بأرقام موجبة. | '
+            'Warning: some entered totals differ from the sum of their line items, and the derived totals are used. '
+            'Make sure expenses and dividends are entered as positive numbers.', NEGATIVE)]
+    yield []
+    yield [(label, HEADER) for label in ('البند | Item', 'العمود | Column', 'المدخل | Entered', 'المحسوب | Derived', 'الفرق | Difference')]
+    column_labels = dict(COLUMN_LABELS, **dict(zip(data['income'].columns, periods)))
+    for difference in reconciliation:
+        yield [difference['item'], column_labels.get(difference['column'], difference['column']),
+               difference['entered'], difference['derived'], (difference['difference'], NEGATIVE)]
+
+def _comparison_header(periods):
+    """Header row of a statement with one column per period plus change columns."""
+    return [(label, HEADER) for label in ('البند | Item', *periods, 'التغيير | Change', 'التغيير٪ | Change%')]
+
+def _comparison_rows(statement, is_highlighted, total_style):
+    """Rows of a multi-period statement with the change and change% of the latest period."""
+    # Calculate change and percentage change for every row and period at once
+    changes, change_percents = statement.changes()
+    for item, values, change, change_percent in zip(
+            statement.labels, statement.values.tolist(), changes[:, 0].tolist(), change_percents[:, 0].tolist()):
+        cells = [item, *values, change, "N/A" if math.isnan(change_percent) else f"{change_percent:.2f}%"]
+        # Format totals and section headers
+        if is_highlighted(item):
+            style = total_style(item)
+            cells = [(value, style) for value in cells]
+        yield cells
 
-def generate_income_statement(sheet, income_data):
+def _check_row(label, passed_text, failed_text, difference):
+    """Validation row shown under a statement."""
+    if abs(difference) < 0.01:  # Allow for floating point imprecision
+        return [(label, BOLD), (passed_text, POSITIVE)]
+    return [(label, BOLD), (f'{failed_text} (فرق | Difference: {difference})', NEGATIVE)]
+
+def _derived_minus_entered(differences, item, column):
+    """Difference between the derived and the entered value of a total (0 when they agree)."""
+    matches = [d for d in differences if d['item'] == item]
+    # Prefer the given column, but report a mismatch in any column
+    matches.sort(key=lambda d: d['column'] != column)
+    return -matches[0]['difference'] if matches else 0
+
+def generate_income_statement(sheet, income_data, periods=None):
     """Generate income statement."""
-    # Set up header
-    sheet['A1'] = 'قائمة الدخل | Income Statement'
-    sheet['A1'].font = Font(bold=True, size=16)
-    sheet['A3'] = 'البند | Item'
-    sheet['B3'] = 'السنة الحالية | Current Year'
-    sheet['C3'] = 'السنة السابقة | Previous Year'
-    sheet['D3'] = 'التغيير | Change'
-    sheet['E3'] = 'التغيير٪ | Change%'
-    # Format header row
-    for cell in sheet['3:3']:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.alignment = Alignment(horizontal='center')
+    write_sheet(sheet, income_statement_content(income_data, periods))
+
+def income_statement_content(income_data, periods=None):
+    """Content of the income statement sheet."""
     # Set column widths
-    sheet.column_dimensions['A'].width = 40
-    sheet.column_dimensions['B'].width = 20
-    sheet.column_dimensions['C'].width = 20
-    sheet.column_dimensions['D'].width = 20
-    sheet.column_dimensions['E'].width = 20
-    # Add income items
-    row = 4
-    for item, values in income_data.items():
-        sheet[f'A{row}'] = item
-        sheet[f'B{row}'] = values.get('current', 0)
-        sheet[f'C{row}'] = values.get('previous', 0)
-        # Calculate change
-        current = values.get('current', 0)
-        previous = values.get('previous', 0)
-        change = current - previous
-        sheet[f'D{row}'] = change
-        # Calculate percentage change
-        if previous != 0:
-            change_percent = (change / previous) * 100
-            sheet[f'E{row}'] = f"{change_percent:.2f}%"
-        else:
-            sheet[f'E{row}'] = "N/A"
-        # Format totals and net profit
-        if "إجمالي" in item or "صافي" in item or "الربح" in item:
-            sheet[f'A{row}'].font = Font(bold=True)
-            sheet[f'B{row}'].font = Font(bold=True)
-            sheet[f'C{row}'].font = Font(bold=True)
-            sheet[f'D{row}'].font = Font(bold=True)
-            sheet[f'E{row}'].font = Font(bold=True)
-            # Add background color
-            for col in ['A', 'B', 'C', 'D', 'E']:
-                sheet[f'{col}{row}'].fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
-        row += 1
-
-def generate_balance_sheet(sheet, balance_data):
-    """Generate balance sheet."""
+    periods = periods or period_labels(len(income_data.columns))
+    widths = _period_widths(40, len(periods) + 2)
+    return SheetContent('قائمة الدخل | Income Statement', widths, _income_statement_rows(income_data, periods))
+
+def _income_statement_rows(income_data, periods):
     # Set up header
-    sheet['A1'] = 'قائمة المركز المالي | Balance Sheet'
-    sheet['A1'].font = Font(bold=True, size=16)
-    sheet['A3'] = 'البند | Item'
-    sheet['B3'] = 'السنة الحالية | Current Year'
-    sheet['C3'] = 'السنة السابقة | Previous Year'
-    sheet['D3'] = 'التغيير | Change'
-    sheet['E3'] = 'التغيير٪ | Change%'
-    # Format header row
-    for cell in sheet['3:3']:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.alignment = Alignment(horizontal='center')
+    yield [('قائمة الدخل | Income Statement', TITLE)]
+    yield []
+    yield _comparison_header(periods)
+    # Add income items; totals and net profit are highlighted
+    yield from _comparison_rows(
+        income_data,
+        lambda item: "إجمالي" in item or "صافي" in item or "الربح" in item,
+        lambda item: TOTAL,
+    )
+
+def generate_balance_sheet(sheet, balance_data, periods=None):
+    """Generate balance sheet."""
+    write_sheet(sheet, balance_sheet_content(balance_data, periods))
+
+def balance_sheet_content(balance_data, periods=None):
+    """Content of the balance sheet."""
     # Set column widths
-    sheet.column_dimensions['A'].width = 40
-    sheet.column_dimensions['B'].width = 20
-    sheet.column_dimensions['C'].width = 20
-    sheet.column_dimensions['D'].width = 20
-    sheet.column_dimensions['E'].width = 20
-    # Add balance sheet items
-    row = 4
-    for item, values in balance_data.items():
-        sheet[f'A{row}'] = item
-        sheet[f'B{row}'] = values.get('current', 0)
-        sheet[f'C{row}'] = values.get('previous', 0)
-        # Calculate change
-        current = values.get('current', 0)
-        previous = values.get('previous', 0)
-        change = current - previous
-        sheet[f'D{row}'] = change
-        # Calculate percentage change
-        if previous != 0:
-            change_percent = (change / previous) * 100
-            sheet[f'E{row}'] = f"{change_percent:.2f}%"
-        else:
-            sheet[f'E{row}'] = "N/A"
-        # Format section headers and totals
-        if "إجمالي" in item or "الأصول" in item or "الخصوم وحقوق الملكية" in item or "الخصوم المتداولة" in item or "الخصوم غير المتداولة" in item or "حقوق الملكية" in item:
-            sheet[f'A{row}'].font = Font(bold=True)
-            sheet[f'B{row}'].font = Font(bold=True)
-            sheet[f'C{row}'].font = Font(bold=True)
-            sheet[f'D{row}'].font = Font(bold=True)
-            sheet[f'E{row}'].font = Font(bold=True)
-            # Add background color for totals
-            if "إجمالي" in item:
-                for col in ['A', 'B', 'C', 'D', 'E']:
-                    sheet[f'{col}{row}'].fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
-        row += 1
+    periods = periods or period_labels(len(balance_data.columns))
+    widths = _period_widths(40, len(periods) + 2)
+    return SheetContent('المركز المالي | Balance Sheet', widths, _balance_sheet_rows(balance_data, periods))
+
+def _balance_sheet_rows(balance_data, periods):
+    # Set up header
+    yield [('قائمة المركز المالي | Balance Sheet', TITLE)]
+    yield []
+    yield _comparison_header(periods)
+    # Add balance sheet items; section headers are bold and totals also get a background color
+    yield from _comparison_rows(
+        balance_data,
+        lambda item: "إجمالي" in item or "الأصول" in item or "الخصوم وحقوق الملكية" in item or "الخصوم المتداولة" in item or "الخصوم غير المتداولة" in item or "حقوق الملكية" in item,
+        lambda item: TOTAL if "إجمالي" in item else BOLD,
+    )
     # Validate balance sheet (Assets = Liabilities + Equity)
     try:
-        assets = balance_data.get('إجمالي الأصول | Total Assets', {}).get('current', 0)
-        liab_equity = balance_data.get('إجمالي الخصوم وحقوق الملكية | Total Liabilities and Equity', {}).get('current', 0)
-        sheet[f'A{row+2}'] = 'التحقق من توازن قائمة المركز المالي | Balance Sheet Check'
-        sheet[f'A{row+2}'].font = Font(bold=True)
-        if abs(assets - liab_equity) < 0.01:  # Allow for floating point imprecision
-            sheet[f'B{row+2}'] = 'متوازن ✓ | Balanced ✓'
-            sheet[f'B{row+2}'].fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-        else:
-            sheet[f'B{row+2}'] = f'غير متوازن ✗ | Not Balanced ✗ (فرق | Difference: {assets - liab_equity})'
-            sheet[f'B{row+2}'].fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+        assets = balance_data.get(LineItem.BALANCE_TOTAL_ASSETS, 'current')
+        liab_equity = balance_data.get(LineItem.BALANCE_TOTAL_LIABILITIES_AND_EQUITY, 'current')
+        check = _check_row('التحقق من توازن قائمة المركز المالي | Balance Sheet Check', 'متوازن ✓ | Balanced ✓', 'غير متوازن ✗ | Not Balanced ✗', assets - liab_equity)
     except:
-        pass
+        return
+    yield []
+    yield []
+    yield check
 
-def generate_equity_statement(sheet, equity_data):
+def generate_equity_statement(sheet, equity_data, differences=()):
     """Generate statement of changes in equity."""
-    # Set up header
-    sheet['A1'] = 'قائمة التغيرات في حقوق الملكية | Statement of Changes in Equity'
-    sheet['A1'].font = Font(bold=True, size=16)
-    sheet['A3'] = 'البند | Item'
-    sheet['B3'] = 'رأس المال | Capital'
-    sheet['C3'] = 'الاحتياطيات | Reserves'
-    sheet['D3'] = 'الأرباح المحتجزة | Retained Earnings'
-    sheet['E3'] = 'الإجمالي | Total'
-    # Format header row
-    for cell in sheet['3:3']:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.alignment = Alignment(horizontal='center')
+    write_sheet(sheet, equity_statement_content(equity_data, differences))
+
+def equity_statement_content(equity_data, differences=()):
+    """Content of the statement of changes in equity."""
     # Set column widths
-    sheet.column_dimensions['A'].width = 40
-    sheet.column_dimensions['B'].width = 20
-    sheet.column_dimensions['C'].width = 20
-    sheet.column_dimensions['D'].width = 20
-    sheet.column_dimensions['E'].width = 20
+    widths = {'A': 40, 'B': 20, 'C': 20, 'D': 20, 'E': 20}
+    return SheetContent('حقوق الملكية | Equity', widths, _equity_statement_rows(equity_data, differences))
+
+def _equity_statement_rows(equity_data, differences):
+    # Set up header
+    yield [('قائمة التغيرات في حقوق الملكية | Statement of Changes in Equity', TITLE)]
+    yield []
+    yield [(label, HEADER) for label in ('البند | Item', 'رأس المال | Capital', 'الاحتياطيات | Reserves', 'الأرباح المحتجزة | Retained Earnings', 'الإجمالي | Total')]
     # Add equity items
-    row = 4
-    for item, values in equity_data.items():
-        sheet[f'A{row}'] = item
-        sheet[f'B{row}'] = values.get('capital', 0)
-        sheet[f'C{row}'] = values.get('reserves', 0)
-        sheet[f'D{row}'] = values.get('retained', 0)
-        sheet[f'E{row}'] = values.get('total', 0)
+    for item, values in equity_data.rows():
+        cells = [item, *values]
         # Format beginning and ending balances
         if "الرصيد في" in item:
-            sheet[f'A{row}'].font = Font(bold=True)
-            sheet[f'B{row}'].font = Font(bold=True)
-            sheet[f'C{row}'].font = Font(bold=True)
-            sheet[f'D{row}'].font = Font(bold=True)
-            sheet[f'E{row}'].font = Font(bold=True)
-            # Add background color
-            for col in ['A', 'B', 'C', 'D', 'E']:
-                sheet[f'{col}{row}'].fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
-        row += 1
-    # Validate totals
-    try:
-        start_balance = equity_data.get('الرصيد في بداية السنة | Balance at beginning of year', {}).get('total', 0)
-        net_profit = equity_data.get('صافي الربح للسنة | Net profit for the year', {}).get('total', 0)
-        dividends = equity_data.get('توزيعات الأرباح | Dividends', {}).get('total', 0)
-        capital_increase = equity_data.get('زيادة رأس المال | Capital increase', {}).get('total', 0)
-        other_changes = equity_data.get('تغييرات أخرى | Other changes', {}).get('total', 0)
-        end_balance = equity_data.get('الرصيد في نهاية السنة | Balance at end of year', {}).get('total', 0)
-        expected_end = start_balance + net_profit - dividends + capital_increase + other_changes
-        sheet[f'A{row+2}'] = 'التحقق من صحة الحسابات | Validation Check'
-        sheet[f'A{row+2}'].font = Font(bold=True)
-        if abs(expected_end - end_balance) < 0.01:  # Allow for floating point imprecision
-            sheet[f'B{row+2}'] = 'صحيح ✓ | Correct ✓'
-            sheet[f'B{row+2}'].fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-        else:
-            sheet[f'B{row+2}'] = f'غير صحيح ✗ | Incorrect ✗ (فرق | Difference: {expected_end - end_balance})'
-            sheet[f'B{row+2}'].fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-    except:
-        pass
+            cells = [(value, TOTAL) for value in cells]
+        yield cells
+    # Validate the entered end balance against the one derived from the movements
+    yield []
+    yield []
+    yield _check_row('التحقق من صحة الحسابات | Validation Check', 'صحيح ✓ | Correct ✓', 'غير صحيح ✗ | Incorrect ✗',
+                     _derived_minus_entered(differences, 'الرصيد في نهاية السنة | Balance at end of year', 'total'))
 
-def generate_cash_flow_statement(sheet, cash_flow_data):
+def generate_cash_flow_statement(sheet, cash_flow_data, differences=(), periods=None):
     """Generate cash flow statement."""
-    # Set up header
-    sheet['A1'] = 'قائمة التدفقات النقدية | Cash Flow Statement'
-    sheet['A1'].font = Font(bold=True, size=16)
-    sheet['A3'] = 'البند | Item'
-    sheet['B3'] = 'السنة الحالية | Current Year'
-    sheet['C3'] = 'السنة السابقة | Previous Year'
-    sheet['D3'] = 'التغيير | Change'
-    sheet['E3'] = 'التغيير٪ | Change%'
-    # Format header row
-    for cell in sheet['3:3']:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.alignment = Alignment(horizontal='center')
+    write_sheet(sheet, cash_flow_statement_content(cash_flow_data, differences, periods))
+
+def cash_flow_statement_content(cash_flow_data, differences=(), periods=None):
+    """Content of the cash flow statement sheet."""
     # Set column widths
-    sheet.column_dimensions['A'].width = 50
-    sheet.column_dimensions['B'].width = 20
-    sheet.column_dimensions['C'].width = 20
-    sheet.column_dimensions['D'].width = 20
-    sheet.column_dimensions['E'].width = 20
-    # Add cash flow items
-    row = 4
-    for item, values in cash_flow_data.items():
-        sheet[f'A{row}'] = item
-        sheet[f'B{row}'] = values.get('current', 0)
-        sheet[f'C{row}'] = values.get('previous', 0)
-        # Calculate change
-        current = values.get('current', 0)
-        previous = values.get('previous', 0)
-        change = current - previous
-        sheet[f'D{row}'] = change
-        # Calculate percentage change
-        if previous != 0:
-            change_percent = (change / previous) * 100
-            sheet[f'E{row}'] = f"{change_percent:.2f}%"
-        else:
-            sheet[f'E{row}'] = "N/A"
-        # Format section headers and net cash
-        if "التدفقات النقدية من" in item or "صافي النقد" in item or "النقد وما في حكمه" in item:
-            sheet[f'A{row}'].font = Font(bold=True)
-            sheet[f'B{row}'].font = Font(bold=True)
-            sheet[f'C{row}'].font = Font(bold=True)
-            sheet[f'D{row}'].font = Font(bold=True)
-            sheet[f'E{row}'].font = Font(bold=True)
-            # Add background color for net cash and cash at year-end
-            if "صافي النقد" in item or "النقد وما في حكمه في نهاية السنة" in item:
-                for col in ['A', 'B', 'C', 'D', 'E']:
-                    sheet[f'{col}{row}'].fill = PatternFill(start_color="DDEBF7", end_color="DDEBF7", fill_type="solid")
-        row += 1
-    # Validate cash flow (cash at beginning + net change = cash at end)
-    try:
-        beg_cash = cash_flow_data.get('النقد وما في حكمه في بداية السنة | Cash and cash equivalents at beginning of year', {}).get('current', 0)
-        net_change = cash_flow_data.get('صافي التغير في النقد وما في حكمه | Net change in cash and cash equivalents', {}).get('current', 0)
-        end_cash = cash_flow_data.get('النقد وما في حكمه في نهاية السنة | Cash and cash equivalents at end of year', {}).get('current', 0)
-        expected_end = beg_cash + net_change
-        sheet[f'A{row+2}'] = 'التحقق من صحة حسابات التدفقات النقدية | Cash Flow Validation'
-        sheet[f'A{row+2}'].font = Font(bold=True)
-        if abs(expected_end - end_cash) < 0.01:  # Allow for floating point imprecision
-            sheet[f'B{row+2}'] = 'صحيح ✓ | Correct ✓'
-            sheet[f'B{row+2}'].fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-        else:
-            sheet[f'B{row+2}'] = f'غير صحيح ✗ | Incorrect ✗ (فرق | Difference: {expected_end - end_cash})'
-            sheet[f'B{row+2}'].fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-    except:
-        pass
+    periods = periods or period_labels(len(cash_flow_data.columns))
+    widths = _period_widths(50, len(periods) + 2)
+    return SheetContent('التدفقات النقدية | Cash Flow', widths, _cash_flow_statement_rows(cash_flow_data, differences, periods))
+
+def _cash_flow_statement_rows(cash_flow_data, differences, periods):
+    # Set up header
+    yield [('قائمة التدفقات النقدية | Cash Flow Statement', TITLE)]
+    yield []
+    yield _comparison_header(periods)
+    # Add cash flow items; net cash and cash at year-end also get a background color
+    yield from _comparison_rows(
+        cash_flow_data,
+        lambda item: "التدفقات النقدية من" in item or "صافي النقد" in item or "النقد وما في حكمه" in item,
+        lambda item: TOTAL if "صافي النقد" in item or "النقد وما في حكمه في نهاية السنة" in item else BOLD,
+    )
+    # Validate the entered cash at end (cash at beginning + net change = cash at end)
+    yield []
+    yield []
+    yield _check_row('التحقق من صحة حسابات التدفقات النقدية | Cash Flow Validation', 'صحيح ✓ | Correct ✓', 'غير صحيح ✗ | Incorrect ✗',
+                     _derived_minus_entered(differences, 'النقد وما في حكمه في نهاية السنة | Cash and cash equivalents at end of year', 'current'))
 
 def generate_notes(sheet, notes_data):
     """Generate notes to financial statements."""
-    # Set up header
-    sheet['A1'] = 'الملاحظات على القوائم المالية | Notes to Financial Statements'
-    sheet['A1'].font = Font(bold=True, size=16)
+    write_sheet(sheet, notes_content(notes_data))
+
+def notes_content(notes_data):
+    """Content of the notes sheet."""
     # Set column widths
-    sheet.column_dimensions['A'].width = 30
-    sheet.column_dimensions['B'].width = 70
-    # Add notes
+    widths = {'A': 30, 'B': 70}
+    return SheetContent('الملاحظات | Notes', widths, _notes_rows(notes_data))
+
+def _notes_rows(notes_data):
+    # Set up header
+    yield [('الملاحظات على القوائم المالية | Notes to Financial Statements', TITLE)]
+    yield []
+    # Add notes, each followed by its content and two blank rows
     notes = [
-        (3, 'ملاحظة 1: معلومات عامة | Note 1: General Information', 'note1'),
-        (7, 'ملاحظة 2: أسس الإعداد | Note 2: Basis of Preparation', 'note2'),
-        (11, 'ملاحظة 3: السياسات المحاسبية الهامة | Note 3: Significant Accounting Policies', 'note3'),
-        (15, 'ملاحظة 4: الأحكام والتقديرات المحاسبية الهامة | Note 4: Significant Accounting Judgments and Estimates', 'note4'),
-        (19, 'ملاحظة 5: إدارة المخاطر المالية | Note 5: Financial Risk Management', 'note5'),
-        (23, 'ملاحظة 6: معلومات إضافية حول بنود القوائم المالية | Note 6: Additional Information on Financial Statement Items', 'note6'),
-        (27, 'ملاحظة 7: أحداث لاحقة | Note 7: Subsequent Events', 'note7')
+        ('ملاحظة 1: معلومات عامة | Note 1: General Information', 'note1'),
+        ('ملاحظة 2: أسس الإعداد | Note 2: Basis of Preparation', 'note2'),
+        ('ملاحظة 3: السياسات المحاسبية الهامة | Note 3: Significant Accounting Policies', 'note3'),
+        ('ملاحظة 4: الأحكام والتقديرات المحاسبية الهامة | Note 4: Significant Accounting Judgments and Estimates', 'note4'),
+        ('ملاحظة 5: إدارة المخاطر المالية | Note 5: Financial Risk Management', 'note5'),
+        ('ملاحظة 6: معلومات إضافية حول بنود القوائم المالية | Note 6: Additional Information on Financial Statement Items', 'note6'),
+        ('ملاحظة 7: أحداث لاحقة | Note 7: Subsequent Events', 'note7')
     ]
-    for row, title, note_key in notes:
-        sheet[f'A{row}'] = title
-        sheet[f'A{row}'].font = Font(bold=True)
+    for i, (title, note_key) in enumerate(notes):
+        if i:
+            yield []
+            yield []
+        yield [(title, BOLD)]
         # Add note content
         if note_key in notes_data and notes_data[note_key]:
-            sheet[f'B{row+1}'] = notes_data[note_key]
+            yield [None, notes_data[note_key]]
         else:
-            sheet[f'B{row+1}'] = "لم يتم تقديم معلومات. | No information provided."
+            yield [None, "لم يتم تقديم معلومات. | No information provided."]
 
 def generate_charts(sheet, data):
     """Generate financial charts."""
-    # Set up header
-    sheet['A1'] = 'الرسوم البيانية المالية | Financial Charts'
-    sheet['A1'].font = Font(bold=True, size=16)
+    write_sheet(sheet, charts_content(data))
+
+def charts_content(data):
+    """Content of the charts sheet: helper tables and three native charts."""
     try:
-        # Extract data for charts
+        # Extract data for charts, one value per period
         income_data = data['income']
         balance_data = data['balance']
         cash_flow_data = data['cash_flow']
-        # Create revenue vs expenses chart
-        revenue_current = income_data.get('إجمالي الإيرادات | Total Revenue', {}).get('current', 0)
-        revenue_previous = income_data.get('إجمالي الإيرادات | Total Revenue', {}).get('previous', 0)
-        expenses_current = income_data.get('إجمالي المصروفات | Total Expenses', {}).get('current', 0)
-        expenses_previous = income_data.get('إجمالي المصروفات | Total Expenses', {}).get('previous', 0)
-        net_profit_current = income_data.get('صافي الربح | Net Profit', {}).get('current', 0)
-        net_profit_previous = income_data.get('صافي الربح | Net Profit', {}).get('previous', 0)
-        # Add data for chart 1
-        sheet['A3'] = 'مقارنة الإيرادات والمصروفات | Revenue vs Expenses Comparison'
-        sheet['A3'].font = Font(bold=True)
-        sheet['A5'] = 'البند | Item'
-        sheet['B5'] = 'السنة الحالية | Current Year'
-        sheet['C5'] = 'السنة السابقة | Previous Year'
-        sheet['A6'] = 'الإيرادات | Revenue'
-        sheet['B6'] = revenue_current
-        sheet['C6'] = revenue_previous
-        sheet['A7'] = 'المصروفات | Expenses'
-        sheet['B7'] = expenses_current
-        sheet['C7'] = expenses_previous
-        sheet['A8'] = 'صافي الربح | Net Profit'
-        sheet['B8'] = net_profit_current
-        sheet['C8'] = net_profit_previous
-        # Create chart 1
-        chart1 = BarChart()
-        chart1.title = "مقارنة الإيرادات والمصروفات | Revenue vs Expenses"
-        chart1.style = 10
-        chart1.x_axis.title = "البند | Item"
-        chart1.y_axis.title = "القيمة | Value"
-        data1 = Reference(sheet, min_col=2, min_row=5, max_row=8, max_col=3)
-        cats1 = Reference(sheet, min_col=1, min_row=6, max_row=8)
-        chart1.add_data(data1, titles_from_data=True)
-        chart1.set_categories(cats1)
-        chart1.shape = 4
-        sheet.add_chart(chart1, "E3")
+        periods = _periods(data)
+        revenue = income_data.row(LineItem.INCOME_TOTAL_REVENUE).tolist()
+        expenses = income_data.row(LineItem.INCOME_TOTAL_EXPENSES).tolist()
+        net_profit = income_data.row(LineItem.INCOME_NET_PROFIT).tolist()
+        assets_current = balance_data.get(LineItem.BALANCE_TOTAL_ASSETS, 'current')
+        liabilities_current = balance_data.get(LineItem.BALANCE_TOTAL_LIABILITIES, 'current')
+        equity_current = balance_data.get(LineItem.BALANCE_TOTAL_EQUITY, 'current')
+        operating = cash_flow_data.row(LineItem.CASH_FLOW_NET_CASH_FROM_OPERATING_ACTIVITIES).tolist()
+        investing = cash_flow_data.row(LineItem.CASH_FLOW_NET_CASH_FROM_INVESTING_ACTIVITIES).tolist()
+        financing = cash_flow_data.row(LineItem.CASH_FLOW_NET_CASH_FROM_FINANCING_ACTIVITIES).tolist()
+    except Exception as e:
+        rows = [[('الرسوم البيانية المالية | Financial Charts', TITLE)]] + [[]] * 28 + [[f"خطأ في إنشاء الرسوم البيانية: {str(e)}"]]
+        return SheetContent('الرسوم البيانية | Charts', {}, iter(rows))
+    rows = [
+        # Set up header
+        [('الرسوم البيانية المالية | Financial Charts', TITLE)],
+        [],
+        # Add data for chart 1 - Revenue vs Expenses
+        [('مقارنة الإيرادات والمصروفات | Revenue vs Expenses Comparison', BOLD)],
+        [],
+        ['البند | Item', *periods],
+        ['الإيرادات | Revenue', *revenue],
+        ['المصروفات | Expenses', *expenses],
+        ['صافي الربح | Net Profit', *net_profit],
+        [], [], [],
         # Add data for chart 2 - Assets, Liabilities and Equity
-        sheet['A12'] = 'مقارنة الأصول والخصوم وحقوق الملكية | Assets, Liabilities and Equity Comparison'
-        sheet['A12'].font = Font(bold=True)
-        assets_current = balance_data.get('إجمالي الأصول | Total Assets', {}).get('current', 0)
-        liabilities_current = balance_data.get('إجمالي الخصوم | Total Liabilities', {}).get('current', 0)
-        equity_current = balance_data.get('إجمالي حقوق الملكية | Total Equity', {}).get('current', 0)
-        sheet['A14'] = 'البند | Item'
-        sheet['B14'] = 'القيمة | Value'
-        sheet['A15'] = 'الأصول | Assets'
-        sheet['B15'] = assets_current
-        sheet['A16'] = 'الخصوم | Liabilities'
-        sheet['B16'] = liabilities_current
-        sheet['A17'] = 'حقوق الملكية | Equity'
-        sheet['B17'] = equity_current
-
-        # Create chart 2 - Assets, Liabilities and Equity
-        # Create chart 2 - Assets, Liabilities and Equity
-        chart2 = PieChart()
-        chart2.title = "توزيع الأصول والخصوم وحقوق الملكية | Distribution of Assets, Liabilities and Equity"
-        chart2.style = 10
-
-        # Add data and categories
-        data2 = Reference(sheet, min_col=2, min_row=14, max_row=17)
-        cats2 = Reference(sheet, min_col=1, min_row=15, max_row=17)
-        chart2.add_data(data2, titles_from_data=True)
-        chart2.set_categories(cats2)
-
-        # Fix the dataLabels issue
-        chart2.dataLabels = DataLabelList()
-        chart2.dataLabels.showVal = True  # Show values on the chart
-
-        sheet.add_chart(chart2, "E12")
-
+        [('مقارنة الأصول والخصوم وحقوق الملكية | Assets, Liabilities and Equity Comparison', BOLD)],
+        [],
+        ['البند | Item', 'القيمة | Value'],
+        ['الأصول | Assets', assets_current],
+        ['الخصوم | Liabilities', liabilities_current],
+        ['حقوق الملكية | Equity', equity_current],
+        [], [], [],
         # Add data for chart 3 - Cash Flow Comparison
-        sheet['A21'] = 'مقارنة التدفقات النقدية | Cash Flow Comparison'
-        sheet['A21'].font = Font(bold=True)
-        operating_current = cash_flow_data.get('صافي النقد من الأنشطة التشغيلية | Net cash from operating activities', {}).get('current', 0)
-        investing_current = cash_flow_data.get('صافي النقد من الأنشطة الاستثمارية | Net cash from investing activities', {}).get('current', 0)
-        financing_current = cash_flow_data.get('صافي النقد من الأنشطة التمويلية | Net cash from financing activities', {}).get('current', 0)
-        operating_previous = cash_flow_data.get('صافي النقد من الأنشطة التشغيلية | Net cash from operating activities', {}).get('previous', 0)
-        investing_previous = cash_flow_data.get('صافي النقد من الأنشطة الاستثمارية | Net cash from investing activities', {}).get('previous', 0)
-        financing_previous = cash_flow_data.get('صافي النقد من الأنشطة التمويلية | Net cash from financing activities', {}).get('previous', 0)
-        sheet['A23'] = 'مصدر التدفق النقدي | Cash Flow Source'
-        sheet['B23'] = 'السنة الحالية | Current Year'
-        sheet['C23'] = 'السنة السابقة | Previous Year'
-        sheet['A24'] = 'الأنشطة التشغيلية | Operating Activities'
-        sheet['B24'] = operating_current
-        sheet['C24'] = operating_previous
-        sheet['A25'] = 'الأنشطة الاستثمارية | Investing Activities'
-        sheet['B25'] = investing_current
-        sheet['C25'] = investing_previous
-        sheet['A26'] = 'الأنشطة التمويلية | Financing Activities'
-        sheet['B26'] = financing_current
-        sheet['C26'] = financing_previous
-        # Create chart 3
-        chart3 = BarChart()
-        chart3.title = "مقارنة التدفقات النقدية | Cash Flow Comparison"
-        chart3.style = 10
-        chart3.x_axis.title = "مصدر التدفق النقدي | Cash Flow Source"
-        chart3.y_axis.title = "القيمة | Value"
-        data3 = Reference(sheet, min_col=2, min_row=23, max_row=26, max_col=3)
-        cats3 = Reference(sheet, min_col=1, min_row=24, max_row=26)
-        chart3.add_data(data3, titles_from_data=True)
-        chart3.set_categories(cats3)
-        sheet.add_chart(chart3, "E21")
-    except Exception as e:
-        sheet['A30'] = f"خطأ في إنشاء الرسوم البيانية: {str(e)}"
+        [('مقارنة التدفقات النقدية | Cash Flow Comparison', BOLD)],
+        [],
+        ['مصدر التدفق النقدي | Cash Flow Source', *periods],
+        ['الأنشطة التشغيلية | Operating Activities', *operating],
+        ['الأنشطة الاستثمارية | Investing Activities', *investing],
+        ['الأنشطة التمويلية | Financing Activities', *financing],
+    ]
+    # The bar charts have one series per period; charts sit right of the widest table
+    column = get_column_letter(len(periods) + 3)
+    charts = [
+        (f"{column}3", partial(_revenue_expenses_chart, periods=len(periods))),
+        (f"{column}12", _balance_distribution_chart),
+        (f"{column}21", partial(_cash_flow_chart, periods=len(periods))),
+    ]
+    return SheetContent('الرسوم البيانية | Charts', {}, iter(rows), charts)
+
+def _revenue_expenses_chart(sheet, periods=2):
+    chart1 = BarChart()
+    chart1.title = "مقارنة الإيرادات والمصروفات | Revenue vs Expenses"
+    chart1.style = 10
+    chart1.x_axis.title = "البند | Item"
+    chart1.y_axis.title = "القيمة | Value"
+    data1 = Reference(sheet, min_col=2, min_row=5, max_row=8, max_col=1 + periods)
+    cats1 = Reference(sheet, min_col=1, min_row=6, max_row=8)
+    chart1.add_data(data1, titles_from_data=True)
+    chart1.set_categories(cats1)
+    chart1.shape = 4
+    return chart1
+
+def _balance_distribution_chart(sheet):
+    chart2 = PieChart()
+    chart2.title = "توزيع الأصول والخصوم وحقوق الملكية | Distribution of Assets, Liabilities and Equity"
+    chart2.style = 10
+
+    # Add data and categories
+    data2 = Reference(sheet, min_col=2, min_row=14, max_row=17)
+    cats2 = Reference(sheet, min_col=1, min_row=15, max_row=17)
+    chart2.add_data(data2, titles_from_data=True)
+    chart2.set_categories(cats2)
+
+    # Fix the dataLabels issue
+    chart2.dataLabels = DataLabelList()
+    chart2.dataLabels.showVal = True  # Show values on the chart
+    return chart2
+
+def _cash_flow_chart(sheet, periods=2):
+    chart3 = BarChart()
+    chart3.title = "مقارنة التدفقات النقدية | Cash Flow Comparison"
+    chart3.style = 10
+    chart3.x_axis.title = "مصدر التدفق النقدي | Cash Flow Source"
+    chart3.y_axis.title = "القيمة | Value"
+    data3 = Reference(sheet, min_col=2, min_row=23, max_row=26, max_col=1 + periods)
+    cats3 = Reference(sheet, min_col=1, min_row=24, max_row=26)
+    chart3.add_data(data3, titles_from_data=True)
+    chart3.set_categories(cats3)
+    return chart3
+
+def generate_consolidation(sheet, data):
+    """Generate the per-entity breakdown of consolidated statements."""
+    write_sheet(sheet, consolidation_content(data))
+
+def consolidation_content(data):
+    """Content of the consolidation sheet: each entity's latest period side by side."""
+    columns = len(data['entities']) + (2 if data.get('eliminations') is not None else 1)
+    widths = _period_widths(40, columns)
+    return SheetContent('التوحيد | Consolidation', widths, _consolidation_rows(data))
+
+def _consolidation_rows(data):
+    # Set up header
+    yield [('القوائم الموحدة حسب الكيان | Consolidation by Entity', TITLE)]
+    yield []
+    eliminations = data.get('eliminations')
+    names = [name for name, _ in data['entities']]
+    header = ['البند | Item', *names]
+    if eliminations is not None:
+        header.append('الاستبعادات | Eliminations')
+    header.append('الموحد | Consolidated')
+    sections = [
+        ('income', 'قائمة الدخل | Income Statement', 'current'),
+        ('balance', 'قائمة المركز المالي | Balance Sheet', 'current'),
+        ('cash_flow', 'قائمة التدفقات النقدية | Cash Flow Statement', 'current'),
+        ('equity', 'قائمة التغيرات في حقوق الملكية | Statement of Changes in Equity', 'total'),
+    ]
+    totals = {statement: statement_totals for statement, _, statement_totals in STATEMENTS}
+    period = _periods(data)[0]
+    for statement, title, column in sections:
+        consolidated = data[statement]
+        subtitle = f"{title} - {period}" if column == 'current' else title
+        yield [(subtitle, SUBTITLE)]
+        yield [(label, HEADER) for label in header]
+        parts = [entity[statement] for _, entity in data['entities']]
+        if eliminations is not None:
+            parts.append(eliminations[statement])
+        # One column per entity (and eliminations), aligned on the consolidated rows
+        for item, value in zip(consolidated.labels, consolidated.column(column).tolist()):
+            cells = [item, *(part.get(item, column) for part in parts), value]
+            if item in totals[statement]:
+                cells = [(cell, TOTAL) for cell in cells]
+            yield cells
+        yield []
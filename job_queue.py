@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config import JOB_QUEUE_PATH, JOB_LEASE, JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY
+
+logger = logging.getLogger(__name__)
+
+# Kind of the jobs enqueued by the bot for a single uploaded file
+GENERATE_JOB = "generate"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+"""
+
+class Job:
+    """A claimed job: its id, kind, payload dict and the number of attempts so far (this one included)."""
+
+    def __init__(self, job_id, kind, payload, attempts):
+        self.id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+
+class JobQueue:
+    """Durable job queue in a SQLite file, shared by the bot and any number of worker processes.
+
+    Jobs go from 'queued' to 'running' when a worker claims them and hold a
+    lease for `lease` seconds; a job whose worker died is claimed again once
+    its lease expires, so a restart never loses work (a job may run twice).
+    Failed attempts are retried with exponential backoff from `retry_delay`
+    seconds until `max_attempts`, after which the job is 'failed'. A worker
+    renews the lease of a job for as long as it runs it with extend(), and
+    jobs whose lease ran out on their last attempt are failed by expire().
+    Only the latest claim of a job can renew, finish or requeue it.
+
+    The methods block on SQLite, so async callers run them with
+    asyncio.to_thread; the connection is shared by those threads under a lock.
+    """
+
+    def __init__(self, path, lease=600, max_attempts=5, retry_delay=5):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: a claim is a single UPDATE, so two workers never get the same job
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def enqueue(self, kind, payload, delay=0):
+        """Add a job and return its id."""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO jobs (kind, payload, available_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload, ensure_ascii=False), now + delay, now, now))
+            return cursor.lastrowid
+
+    def claim(self, worker):
+        """Lease the oldest ready job to `worker`, or return None when there is none."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                """UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, worker = ?, updated_at = ?
+                   WHERE id = (SELECT id FROM jobs
+                               WHERE (status = 'queued' AND available_at <= ?)
+                                  OR (status = 'running' AND lease_until < ? AND attempts < ?)
+                               ORDER BY available_at, id LIMIT 1)
+                   RETURNING id, kind, payload, attempts""",
+                (now + self.lease, worker, now, now, now, self.max_attempts)).fetchone()
+        if row is None:
+            return None
+        job_id, kind, payload, attempts = row
+        return Job(job_id, kind, json.loads(payload), attempts)
+
+    def expire(self):
+        """Fail the jobs whose workers kept dying and return them, so their users can be told.
+
+        Each expired job is returned to one caller only.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                """UPDATE jobs SET status = 'failed', lease_until = NULL, updated_at = ?,
+                                   error = 'lease expired (after ' || attempts || ' attempts)'
+                   WHERE status = 'running' AND lease_until < ? AND attempts >= ?
+                   RETURNING id, kind, payload, attempts""",
+                (now, now, self.max_attempts)).fetchall()
+        for job_id, kind, _, attempts in rows:
+            logger.error(f"Job {job_id} ({kind}) failed: lease expired (after {attempts} attempts)")
+        return [Job(job_id, kind, json.loads(payload), attempts) for job_id, kind, payload, attempts in rows]
+
+    def extend(self, job):
+        """Renew the lease of a running job; False when it was claimed again or finished meanwhile."""
+        now = time.time()
+        with self._lock:
+            # The attempt count tells this claim apart from a later one of the same job
+            cursor = self._db.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (now + self.lease, now, job.id, job.attempts))
+            return cursor.rowcount == 1
+
+    def complete(self, job):
+        """Mark a claimed job as done; False when it was claimed again meanwhile and is left as it is."""
+        return self._finish(job, 'done', None)
+
+    def fail(self, job, error):
+        """Mark a claimed job as failed for good; False when it was claimed again meanwhile and is left as it is."""
+        if not self._finish(job, 'failed', str(error)):
+            return False
+        logger.error(f"Job {job.id} ({job.kind}) failed: {error}")
+        return True
+
+    def retry(self, job, error, delay=None):
+        """Requeue a claimed job after a transient error, or fail it when it has no attempts left.
+
+        Returns False when this call failed the job for good, so its user is
+        still to be told; True when it was requeued, or left to the worker
+        that claimed it again meanwhile.
+        """
+        if job.attempts >= self.max_attempts:
+            return not self.fail(job, f"{error} (after {job.attempts} attempts)")
+        if delay is None:
+            delay = self.retry_delay * 2 ** (job.attempts - 1)
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                """UPDATE jobs SET status = 'queued', available_at = ?, lease_until = NULL, error = ?, updated_at = ?
+                   WHERE id = ? AND status = 'running' AND attempts = ?""",
+                (now + delay, str(error), now, job.id, job.attempts))
+        if cursor.rowcount == 1:
+            logger.warning(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed, retrying in {delay:.0f}s: {error}")
+        else:
+            logger.warning(f"Job {job.id} was claimed again meanwhile; not requeued")
+        return True
+
+    def counts(self):
+        """Number of jobs in each status."""
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def purge(self, older_than):
+        """Delete finished jobs last updated more than `older_than` seconds ago."""
+        cutoff = time.time() - older_than
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (cutoff,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _finish(self, job, status, error):
+        with self._lock:
+            # As in extend(), a later claim of the same job has a higher attempt count
+            cursor = self._db.execute(
+                """UPDATE jobs SET status = ?, lease_until = NULL, error = ?, updated_at = ?
+                   WHERE id = ? AND status = 'running' AND attempts = ?""",
+                (status, error, time.time(), job.id, job.attempts))
+        if cursor.rowcount != 1:
+            logger.warning(f"Job {job.id} was claimed again meanwhile; not marked {status}")
+            return False
+        return True
+
+def open_job_queue():
+    """The job queue configured by JOB_QUEUE_PATH, or None when uploads are processed inline."""
+    if not JOB_QUEUE_PATH:
+        return None
+    return JobQueue(JOB_QUEUE_PATH, JOB_LEASE, JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY)
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+from telegram import Bot
+from telegram.ext import ExtBot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from config import TELEGRAM_TOKEN, ERROR_MESSAGE, SUCCESS_MESSAGE, TIMEOUT_MESSAGE
+from config import JOB_CONCURRENCY, JOB_POLL_INTERVAL, JOB_RETENTION
+from config import RESULT_CACHE_MAX_BYTES, RESULT_CACHE_DIR, RESULT_CACHE_TTL
+from job_queue import JobQueue, GENERATE_JOB, open_job_queue
+from metrics import span, record_spans
+from result_cache import ResultCache
+from worker_pool import WorkerPool, QueueFullError, run_pipeline
+from telegram_client import SendRateLimiter, build_request
+from data_import import input_format
+from outputs import OUTPUT_FILENAME, output_filename, download_file, render_chart_images, send_chart_images
+
+logger = logging.getLogger(__name__)
+
+async def run_generate_job(bot: Bot, pool: WorkerPool, cache: ResultCache, payload: dict) -> None:
+    """Download an uploaded file, generate its statements and send them to the chat."""
+    request = {'job': payload['job'], 'chat_id': payload['chat_id']}
+    input_bytes = await download_file(bot, payload['file_id'], request)
+    file_format = input_format(payload['file_name'])
+    output_format = payload['output_format']
+    sheets = tuple(payload['sheets']) if payload['sheets'] else None
+    cache_key = cache.key(input_bytes, file_format, output_format, sheets)
+    output_bytes = await cache.get(cache_key)
+    if output_bytes is None:
+        with span('pipeline', queued=pool.pending, **request):
+            output_bytes, spans = await pool.submit(run_pipeline, input_bytes, file_format, output_format, sheets)
+        record_spans(spans, **request)
+        await cache.put(cache_key, output_bytes)
+    # One message, so a retried send never repeats half of the reply
+    with span('reply_document', output_bytes=len(output_bytes), **request):
+        await bot.send_document(payload['chat_id'], document=output_bytes,
+                                filename=output_filename(OUTPUT_FILENAME, output_format), caption=SUCCESS_MESSAGE,
+                                reply_to_message_id=payload['message_id'], allow_sending_without_reply=True)
+    if payload.get('chart_images'):
+        # The statements are already sent, so a failure here must not retry the job
+        try:
+            images = await render_chart_images(pool, cache, input_bytes, file_format, request)
+            await send_chart_images(bot, payload['chat_id'], images, payload['message_id'], request)
+        except Exception as e:
+            logger.error(f"Error sending the charts of job {payload['job']}: {e}")
+
+# Handler of each job kind
+JOB_HANDLERS = {
+    GENERATE_JOB: run_generate_job,
+}
+
+async def process_job(queue: JobQueue, job, bot: Bot, pool: WorkerPool, cache: ResultCache) -> None:
+    """Run one claimed job, retrying transient Telegram and queue errors and reporting the others to the user.
+
+    The queue is only touched through asyncio.to_thread, since SQLite blocks.
+    A job claimed again meanwhile is left to the worker that has it, which
+    tells the user if it fails.
+    """
+    payload = dict(job.payload, job=job.id)
+    try:
+        heartbeat = asyncio.create_task(keep_leased(queue, job))
+        try:
+            await JOB_HANDLERS[job.kind](bot, pool, cache, payload)
+        finally:
+            heartbeat.cancel()
+    except RetryAfter as e:
+        if not await asyncio.to_thread(queue.retry, job, e, delay=e.retry_after):
+            await notify_failure(bot, payload, f"{ERROR_MESSAGE}\nError details: {str(e)}")
+    except (BadRequest, Forbidden) as e:
+        # The file or chat is gone; trying again won't help
+        await asyncio.to_thread(queue.fail, job, e)
+    except (NetworkError, QueueFullError) as e:
+        if not await asyncio.to_thread(queue.retry, job, e):
+            await notify_failure(bot, payload, f"{ERROR_MESSAGE}\nError details: {str(e)}")
+    except asyncio.TimeoutError:
+        if await asyncio.to_thread(queue.fail, job, "timed out"):
+            await notify_failure(bot, payload, TIMEOUT_MESSAGE)
+    except Exception as e:
+        if await asyncio.to_thread(queue.fail, job, e):
+            await notify_failure(bot, payload, f"{ERROR_MESSAGE}\nError details: {str(e)}")
+    else:
+        await asyncio.to_thread(queue.complete, job)
+
+async def keep_leased(queue: JobQueue, job) -> None:
+    """Renew the lease of a running job, so a job that outlasts JOB_LEASE isn't claimed and run again."""
+    while True:
+        await asyncio.sleep(queue.lease / 3)
+        if not await asyncio.to_thread(queue.extend, job):
+            logger.warning(f"Job {job.id} lost its lease; another worker may run it again")
+            return
+
+async def notify_failure(bot: Bot, payload: dict, text: str) -> None:
+    """Tell the user their job failed; a failure to do so is only logged."""
+    try:
+        await bot.send_message(payload['chat_id'], text, reply_to_message_id=payload['message_id'],
+                               allow_sending_without_reply=True)
+    except Exception as e:
+        logger.error(f"Error notifying chat {payload['chat_id']} of job {payload['job']}: {e}")
+
+async def run_job_worker(concurrency: int = JOB_CONCURRENCY) -> None:
+    """Drain the job queue until SIGINT or SIGTERM, running up to `concurrency` jobs at once.
+
+    Any number of these processes can share one queue file. Running jobs are
+    finished before exiting; a worker that is killed leaves its jobs to be
+    picked up again once their lease expires.
+    """
+    queue = open_job_queue()
+    if queue is None:
+        raise SystemExit("JOB_QUEUE_PATH is not set")
+    await asyncio.to_thread(queue.purge, JOB_RETENTION)
+    pool = WorkerPool()
+    pool.warm_up()
+    cache = ResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_DIR or None, RESULT_CACHE_TTL)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    slots = asyncio.Semaphore(concurrency)
+    running = set()
+
+    def finished(task):
+        running.discard(task)
+        slots.release()
+
+    logger.warning(f"Job worker {worker} started: {await asyncio.to_thread(queue.counts)}")
+    try:
+        async with ExtBot(TELEGRAM_TOKEN, request=build_request(), rate_limiter=SendRateLimiter()) as bot:
+            while not stop.is_set():
+                # Jobs whose workers kept dying are failed here, as no worker is left to report them
+                for expired in await asyncio.to_thread(queue.expire):
+                    await notify_failure(bot, dict(expired.payload, job=expired.id),
+                                         f"{ERROR_MESSAGE}\nError details: lease expired (after {expired.attempts} attempts)")
+                await slots.acquire()
+                job = await asyncio.to_thread(queue.claim, worker)
+                if job is None:
+                    slots.release()
+                    # Wait for the next poll, or wake up at once to stop
+                    try:
+                        await asyncio.wait_for(stop.wait(), JOB_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                task = asyncio.create_task(process_job(queue, job, bot, pool, cache))
+                running.add(task)
+                task.add_done_callback(finished)
+            if running:
+                await asyncio.gather(*running)
+    finally:
+        pool.shutdown(wait=False)
+        queue.close()
+        logger.warning(f"Job worker {worker} stopped")
+
+def start_job_worker() -> None:
+    """Start a job worker process."""
+    asyncio.run(run_job_worker())
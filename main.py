@@ -1,4 +1,5 @@
 import logging
+import sys
 from bot import start_bot
 
 if __name__ == "__main__":
@@ -11,5 +12,10 @@ if __name__ == "__main__":
     # تعطيل تسجيل الطلبات الناجحة من مكتبة httpx
     logging.getLogger("httpx").setLevel(logging.WARNING)
     
-    # Start the Telegram bot
-    start_bot()
+    # `python main.py jobs` runs a job queue worker instead of the bot
+    if sys.argv[1:] == ["jobs"]:
+        from job_worker import start_job_worker
+        start_job_worker()
+    else:
+        # Start the Telegram bot
+        start_bot()
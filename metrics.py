@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Histogram:
+    """Cumulative latency histogram for one stage."""
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        self.count += 1
+        self.sum += seconds
+        if error:
+            self.errors += 1
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+
+_histograms = {}
+_lock = threading.Lock()
+
+def _rss_kb():
+    """Current resident set size in KiB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def record(stage, seconds, error=False, **fields):
+    """Add one stage duration to its histogram and log it as a structured record."""
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+        histogram.observe(seconds, error)
+    entry = {'stage': stage, 'duration_ms': round(seconds * 1000, 2), 'status': 'error' if error else 'ok'}
+    entry.update(fields)
+    logger.info(json.dumps(entry, ensure_ascii=False), extra={'span': entry})
+
+@contextmanager
+def measure(stage, spans, memory=False):
+    """Time a block into `spans[stage]` without recording it.
+
+    Used inside workers, whose spans are sent back and recorded by the bot.
+    """
+    rss_before = _rss_kb() if memory else None
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans[stage] = {'seconds': time.perf_counter() - started}
+        if memory:
+            spans[stage]['rss_delta_kb'] = _rss_kb() - rss_before
+
+@contextmanager
+def span(stage, memory=False, **fields):
+    """Time a block, record it in the stage histogram and log it."""
+    rss_before = _rss_kb() if memory else None
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        if memory:
+            fields['rss_delta_kb'] = _rss_kb() - rss_before
+        record(stage, time.perf_counter() - started, error, **fields)
+
+def record_spans(spans, **fields):
+    """Record spans measured in a worker with `measure`."""
+    for stage, values in spans.items():
+        extra = {key: value for key, value in values.items() if key != 'seconds'}
+        record(stage, values['seconds'], **extra, **fields)
+
+def render_prometheus():
+    """Render all histograms in the Prometheus text exposition format."""
+    lines = [
+        '# HELP acc_stage_duration_seconds Duration of each request stage.',
+        '# TYPE acc_stage_duration_seconds histogram',
+    ]
+    with _lock:
+        snapshot = {stage: (list(h.bucket_counts), h.count, h.sum, h.errors) for stage, h in _histograms.items()}
+    for stage, (bucket_counts, count, total, _) in sorted(snapshot.items()):
+        for bound, bucket_count in zip(BUCKETS, bucket_counts):
+            lines.append(f'acc_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {bucket_count}')
+        lines.append(f'acc_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'acc_stage_duration_seconds_sum{{stage="{stage}"}} {total}')
+        lines.append(f'acc_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+    lines.append('# HELP acc_stage_errors_total Failed runs of each request stage.')
+    lines.append('# TYPE acc_stage_errors_total counter')
+    for stage, (_, _, _, errors) in sorted(snapshot.items()):
+        lines.append(f'acc_stage_errors_total{{stage="{stage}"}} {errors}')
+    return '\n'.join(lines) + '\n'
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """Serve /metrics on a background thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='acc-metrics', daemon=True).start()
+    logger.info(f"Metrics served on http://{host}:{port}/metrics")
+    return server
+
+def start_stats_dump(interval):
+    """Log a summary of every stage every `interval` seconds.
+
+    The summary is logged as a warning so it shows at the bot's default log
+    level, without METRICS_LOG turning on the per-stage records as well.
+    """
+    def dump():
+        while True:
+            time.sleep(interval)
+            with _lock:
+                summary = {stage: {'count': h.count, 'errors': h.errors, 'mean_ms': round(h.sum / h.count * 1000, 2) if h.count else 0}
+                           for stage, h in _histograms.items()}
+            logger.warning(json.dumps({'stats': summary}, ensure_ascii=False))
+    threading.Thread(target=dump, name='acc-stats', daemon=True).start()
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import os
+from telegram import Bot, InputMediaPhoto
+from config import CHARTS_CAPTION, METRICS_MEMORY
+from bulk import OUTPUT_EXTENSIONS
+from chart_images import render_chart, spec_bytes
+from metrics import span
+from result_cache import ResultCache
+from worker_pool import WorkerPool, run_chart_specs
+
+logger = logging.getLogger(__name__)
+
+# File name of the generated statements sent back to the user
+OUTPUT_FILENAME = "financial_statements.xlsx"
+
+def output_filename(filename: str, output_format: str) -> str:
+    """File name of an output sent back to the user, with the extension of its format."""
+    return os.path.splitext(filename)[0] + OUTPUT_EXTENSIONS[output_format]
+
+async def download_file(bot: Bot, file_id: str, request: dict) -> bytes:
+    """Download an uploaded file into memory."""
+    with span('get_file', **request):
+        new_file = await bot.get_file(file_id)
+    with span('download', memory=METRICS_MEMORY, **request):
+        input_bytes = bytes(await new_file.download_as_bytearray())
+    logger.info(f"File downloaded: {len(input_bytes)} bytes")
+    return input_bytes
+
+async def render_chart_images(pool: WorkerPool, cache: ResultCache, input_bytes: bytes, file_format: str,
+                              request: dict) -> list:
+    """PNG images of an upload's charts, each rendered in its own worker job.
+
+    Images are cached by the data they plot, so an upload whose charts did
+    not change is answered without rendering them again.
+    """
+    with span('chart_data', **request):
+        specs = await pool.submit(run_chart_specs, input_bytes, file_format)
+    keys = [cache.key(spec_bytes(spec), 'png') for spec in specs]
+    images = [await cache.get(key) for key in keys]
+    missing = [i for i, image in enumerate(images) if image is None]
+    if missing:
+        with span('chart_render', charts=len(missing), **request):
+            rendered = await asyncio.gather(*(pool.submit(render_chart, specs[i]) for i in missing))
+        for i, image in zip(missing, rendered):
+            images[i] = image
+            await cache.put(keys[i], image)
+    return images
+
+async def send_chart_images(bot: Bot, chat_id: int, images: list, reply_to_message_id: int, request: dict) -> None:
+    """Send the chart images as one album."""
+    media = [InputMediaPhoto(image, caption=CHARTS_CAPTION if i == 0 else None) for i, image in enumerate(images)]
+    with span('reply_charts', output_bytes=sum(len(image) for image in images), **request):
+        await bot.send_media_group(chat_id, media, reply_to_message_id=reply_to_message_id,
+                                   allow_sending_without_reply=True)
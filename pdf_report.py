@@ -0,0 +1,168 @@
+import io
+import math
+import textwrap
+from chart_images import chart_specs, display_text, draw_chart
+from financial_statements import SHEETS, select_sheets, statement_contents
+from statement_engine import derive_statements
+from styles import TITLE, SUBTITLE, HEADER, INPUT_HEADER, BOLD, TOTAL, POSITIVE, NEGATIVE
+from styles import HEADER_COLOR, TOTAL_COLOR, POSITIVE_COLOR, NEGATIVE_COLOR
+
+# A4 landscape, in inches
+PAGE_SIZE = (11.69, 8.27)
+MARGIN = 0.5
+LINES_PER_PAGE = 34
+FONT_SIZE = 8
+# Value columns per page; wider sheets continue on more pages that repeat the label column
+COLUMNS_PER_PAGE = 7
+# Space between a cell's border and its text, in inches
+CELL_PADDING = 0.05
+
+# Font size, weight, text color and background of each cell style
+CELL_STYLES = {
+    TITLE: {'fontsize': 13, 'fontweight': 'bold'},
+    SUBTITLE: {'fontsize': 11, 'fontweight': 'bold'},
+    HEADER: {'fontweight': 'bold', 'color': 'white', 'fill': HEADER_COLOR},
+    INPUT_HEADER: {'fontweight': 'bold', 'fill': TOTAL_COLOR},
+    BOLD: {'fontweight': 'bold'},
+    TOTAL: {'fontweight': 'bold', 'fill': TOTAL_COLOR},
+    POSITIVE: {'fill': POSITIVE_COLOR},
+    NEGATIVE: {'fill': NEGATIVE_COLOR},
+}
+
+# Sheets in the PDF by default. The charts sheet only holds helper tables for
+# the workbook's native charts; when selected, its charts are drawn instead.
+PDF_SHEETS = tuple(key for key in SHEETS if key != 'charts')
+
+def generate_pdf_report(data, output_path, sheets=None):
+    """Render the statements as a PDF report.
+
+    `output_path` may be a path or a writable binary file-like object.
+    Pages are rendered and written one at a time from the same lazy sheet
+    content as the workbook, so memory stays flat however long the report
+    is. `sheets` limits the report to some of SHEETS (PDF_SHEETS by
+    default); the charts, when selected, follow the tables.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_pdf import PdfPages
+    sheets = PDF_SHEETS if sheets is None else select_sheets(sheets)
+    tables = [key for key in sheets if key != 'charts']
+    with PdfPages(output_path, metadata={'Title': 'Financial Statements'}) as pdf:
+        number = 0
+        if tables:
+            for content in statement_contents(data, tables):
+                for page in _table_pages(content):
+                    number += 1
+                    pdf.savefig(_page(page, content.title, number))
+        if 'charts' in sheets:
+            for spec in chart_specs(derive_statements(data).data):
+                number += 1
+                figure = _page(None, spec['title'], number)
+                draw_chart(figure.add_axes([0.1, 0.12, 0.8, 0.76]), spec)
+                pdf.savefig(figure)
+    return output_path
+
+def pdf_bytes(data, sheets=None):
+    """The PDF report as bytes."""
+    output = io.BytesIO()
+    generate_pdf_report(data, output, sheets)
+    return output.getvalue()
+
+class _TablePage:
+    """Rows of one page as cells of _cell_lines, drawn in `columns` of `widths` inches."""
+
+    def __init__(self, rows, columns, widths):
+        self.rows = rows
+        self.columns = columns
+        self.widths = widths
+
+def _table_pages(content):
+    """Pages of one sheet, reading at most one page of rows at a time."""
+    # Column widths in inches, the same on every page so wrapped rows keep their height
+    units = [content.widths[letter] for letter in sorted(content.widths, key=lambda letter: (len(letter), letter))] or [100]
+    groups = [list(range(first, min(first + COLUMNS_PER_PAGE, len(units))))
+              for first in range(1, len(units), COLUMNS_PER_PAGE)] or [[]]
+    widest = max(sum(units[column] for column in group) for group in groups)
+    scale = (PAGE_SIZE[0] - 2 * MARGIN) / (units[0] + widest)
+    widths = [unit * scale for unit in units]
+    rows, used = [], 0
+    for row in content.rows:
+        cells = [_cell_lines(cell, sum(widths[column:_span_end(row, column, len(widths))]))
+                 for column, cell in enumerate(row[:len(widths)])]
+        height = max([len(lines) for lines, _, _ in cells] + [1])
+        if rows and used + height > LINES_PER_PAGE:
+            yield from (_TablePage(rows, [0, *group], widths) for group in groups)
+            rows, used = [], 0
+        rows.append(cells)
+        used += height
+    if rows:
+        yield from (_TablePage(rows, [0, *group], widths) for group in groups)
+
+def _span_end(row, column, count):
+    """End of the columns a cell's text may use: it overflows into the empty cells on its right, as in Excel."""
+    # Only up to the last column of the cell's page
+    last = 1 + (max(column - 1, 0) // COLUMNS_PER_PAGE + 1) * COLUMNS_PER_PAGE
+    end = column + 1
+    while end < min(count, last) and (end >= len(row) or _value(row[end]) is None):
+        end += 1
+    return end
+
+def _value(cell):
+    return cell[0] if isinstance(cell, tuple) else cell
+
+def _cell_lines(cell, width):
+    """Display lines, style and horizontal alignment of a cell wrapped to `width` inches of text.
+
+    An empty cell has no lines. Numbers are right aligned.
+    """
+    value, style = cell if isinstance(cell, tuple) else (cell, None)
+    if value is None:
+        return [], style, 'left'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return ([] if math.isnan(value) else [f"{value:,.2f}"]), style, 'right'
+    # Roughly the characters of an average width that fit in the cell
+    size = CELL_STYLES.get(style, {}).get('fontsize', FONT_SIZE)
+    characters = max(int((width - 2 * CELL_PADDING) * 72 / (size * 0.5)), 1)
+    lines = []
+    for paragraph in str(value).splitlines():
+        # A bilingual label that doesn't fit gets a line per language before any wrapping
+        if len(paragraph) > characters and ' | ' in paragraph:
+            parts = paragraph.split(' | ', 1)
+            lines += [line for part in parts for line in textwrap.wrap(part, characters)]
+        else:
+            lines += textwrap.wrap(paragraph, characters) or ['']
+    return [display_text(line) for line in lines[:LINES_PER_PAGE]], style, 'left'
+
+def _page(table, title, number):
+    """A page figure with the sheet title and page number, and the table rows if any."""
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Rectangle
+    width, height = PAGE_SIZE
+    figure = Figure(figsize=PAGE_SIZE)
+    figure.text(MARGIN / width, 1 - MARGIN / 2 / height, display_text(title), fontsize=FONT_SIZE, color='gray', va='center')
+    figure.text(1 - MARGIN / width, MARGIN / 2 / height, str(number), fontsize=FONT_SIZE, color='gray', ha='right', va='center')
+    if table is None:
+        return figure
+    line_height = (height - 2 * MARGIN) / LINES_PER_PAGE
+    top = height - MARGIN
+    for cells in table.rows:
+        row_height = max([len(lines) for lines, _, _ in cells] + [1]) * line_height
+        x = MARGIN
+        for column in table.columns:
+            cell_width = table.widths[column]
+            lines, style, align = cells[column] if column < len(cells) else ([], None, 'left')
+            if lines:
+                look = dict(CELL_STYLES.get(style, {}))
+                fill = look.pop('fill', None)
+                if fill:
+                    figure.add_artist(Rectangle((x / width, (top - row_height) / height), cell_width / width,
+                                                row_height / height, transform=figure.transFigure,
+                                                facecolor=f"#{fill}", edgecolor='none'))
+                text_x = x + cell_width - CELL_PADDING if align == 'right' else x + CELL_PADDING
+                size = look.pop('fontsize', FONT_SIZE)
+                for i, line in enumerate(lines):
+                    figure.text(text_x / width, (top - (i + 0.5) * line_height) / height, line, ha=align,
+                                va='center', fontsize=size, **look)
+            x += cell_width
+        top -= row_height
+    return figure
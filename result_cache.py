@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from excel_processor import TEMPLATE_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Sweep the disk tier for expired entries after this many writes
+SWEEP_EVERY = 100
+
+# Part of every key; bump it when a change to the generators changes their
+# output, so the disk tier stops serving files built by the old code
+CACHE_VERSION = 1
+
+class ResultCache:
+    """Content-addressed cache of generated outputs.
+
+    Outputs are keyed by a hash of the uploaded bytes (and any options that
+    change the output). An in-memory LRU bounded by `max_bytes` is backed
+    by an optional on-disk tier in `directory`, whose entries expire after
+    `ttl` seconds. The Telegram file_id of a sent output is cached too, so
+    a duplicate upload can be answered without sending the bytes again.
+
+    get() and put() are coroutines: the disk tier is read and written on a
+    thread so the event loop stays free.
+    """
+
+    def __init__(self, max_bytes, directory=None, ttl=7 * 24 * 3600, max_file_ids=10000):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.ttl = ttl
+        self.max_file_ids = max_file_ids
+        self._entries = OrderedDict()
+        self._size = 0
+        self._file_ids = OrderedDict()
+        self._writes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.evict_expired()
+
+    @staticmethod
+    def key(input_bytes, *options):
+        """Cache key of an upload and the options it is processed with.
+
+        Keys include CACHE_VERSION and the template version, so outputs of an
+        older release are never served after a deploy.
+        """
+        digest = hashlib.sha256(f"{CACHE_VERSION}.{TEMPLATE_VERSION}\0".encode('utf-8'))
+        digest.update(input_bytes)
+        for option in options:
+            digest.update(b'\0' + str(option).encode('utf-8'))
+        return digest.hexdigest()
+
+    async def get(self, key):
+        """Return the cached output for `key`, or None."""
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+            return data
+        if not self.directory:
+            return None
+        data = await asyncio.to_thread(self._read_disk, key)
+        if data is not None:
+            self._remember(key, data)
+        return data
+
+    async def put(self, key, data):
+        """Cache `data` as the output for `key`."""
+        self._remember(key, data)
+        if not self.directory:
+            return
+        await asyncio.to_thread(self._write_disk, key, data)
+        self._writes += 1
+        if self._writes % SWEEP_EVERY == 0:
+            await asyncio.to_thread(self.evict_expired)
+
+    def get_file_id(self, key):
+        """Return the Telegram file_id the output for `key` was sent as, or None."""
+        file_id = self._file_ids.get(key)
+        if file_id is not None:
+            self._file_ids.move_to_end(key)
+        return file_id
+
+    def put_file_id(self, key, file_id):
+        self._file_ids[key] = file_id
+        self._file_ids.move_to_end(key)
+        while len(self._file_ids) > self.max_file_ids:
+            self._file_ids.popitem(last=False)
+
+    def forget_file_id(self, key):
+        """Drop a file_id that Telegram no longer accepts."""
+        self._file_ids.pop(key, None)
+
+    def evict_expired(self):
+        """Remove expired entries from the disk tier."""
+        if not self.directory:
+            return
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _remember(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._entries[key] = data
+        self._size += len(data)
+        # Evict least recently used outputs until the cache fits
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) < time.time() - self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, data):
+        path = self._path(key)
+        partial_path = f"{path}.{os.getpid()}.part"
+        try:
+            with open(partial_path, 'wb') as f:
+                f.write(data)
+            os.replace(partial_path, path)
+        except OSError as e:
+            logger.error(f"Error writing cached result: {e}")
@@ -0,0 +1,304 @@
+import logging
+import numpy as np
+from statement_model import INCOME_ITEMS, BALANCE_ITEMS, EQUITY_ITEMS, CASH_FLOW_ITEMS, DEFAULT_PERIODS, LineItem, Statement
+from statement_model import statement_columns
+
+logger = logging.getLogger(__name__)
+
+# Differences below this are treated as rounding
+TOLERANCE = 0.01
+
+# Amounts are entered as positive numbers and each total adds or subtracts
+# them, so expenses, tax, dividends and cash outflows carry a -1 sign below.
+# Only the changes and adjustments lines are entered with their own sign.
+# Cash outflows are usually entered as negatives in older templates, so their
+# magnitude is subtracted whatever sign they were entered with (CASH_OUTFLOWS).
+
+# Totals of each statement as {total: {component: sign}}. Components may be
+# totals themselves; they are derived in dependency order.
+INCOME_TOTALS = {
+    'إجمالي الإيرادات | Total Revenue': {
+        'إيرادات المبيعات | Sales Revenue': 1,
+        'إيرادات الخدمات | Services Revenue': 1,
+        'إيرادات أخرى | Other Revenue': 1,
+    },
+    'إجمالي المصروفات | Total Expenses': {
+        'تكلفة البضاعة المباعة | Cost of Goods Sold': 1,
+        'مصروفات الرواتب | Salary Expenses': 1,
+        'مصروفات الإيجار | Rent Expenses': 1,
+        'مصروفات المرافق | Utility Expenses': 1,
+        'مصروفات التسويق | Marketing Expenses': 1,
+        'الاستهلاك والإطفاء | Depreciation & Amortization': 1,
+        'مصروفات أخرى | Other Expenses': 1,
+    },
+    'الربح قبل الضرائب | Profit Before Tax': {
+        'إجمالي الإيرادات | Total Revenue': 1,
+        'إجمالي المصروفات | Total Expenses': -1,
+    },
+    'صافي الربح | Net Profit': {
+        'الربح قبل الضرائب | Profit Before Tax': 1,
+        'ضريبة الدخل | Income Tax': -1,
+    },
+}
+
+BALANCE_TOTALS = {
+    'إجمالي الأصول المتداولة | Total Current Assets': {
+        'النقدية وما في حكمها | Cash and Cash Equivalents': 1,
+        'الذمم المدينة | Accounts Receivable': 1,
+        'المخزون | Inventory': 1,
+        'أصول متداولة أخرى | Other Current Assets': 1,
+    },
+    'إجمالي الأصول غير المتداولة | Total Non-Current Assets': {
+        'الممتلكات والمعدات | Property and Equipment': 1,
+        'الأصول غير الملموسة | Intangible Assets': 1,
+        'استثمارات طويلة الأجل | Long-term Investments': 1,
+        'أصول غير متداولة أخرى | Other Non-Current Assets': 1,
+    },
+    'إجمالي الأصول | Total Assets': {
+        'إجمالي الأصول المتداولة | Total Current Assets': 1,
+        'إجمالي الأصول غير المتداولة | Total Non-Current Assets': 1,
+    },
+    'إجمالي الخصوم المتداولة | Total Current Liabilities': {
+        'الذمم الدائنة | Accounts Payable': 1,
+        'القروض قصيرة الأجل | Short-term Loans': 1,
+        'الإيرادات المؤجلة | Deferred Revenue': 1,
+        'خصوم متداولة أخرى | Other Current Liabilities': 1,
+    },
+    'إجمالي الخصوم غير المتداولة | Total Non-Current Liabilities': {
+        'القروض طويلة الأجل | Long-term Loans': 1,
+        'مخصص مكافأة نهاية الخدمة | End of Service Benefits': 1,
+        'خصوم غير متداولة أخرى | Other Non-Current Liabilities': 1,
+    },
+    'إجمالي الخصوم | Total Liabilities': {
+        'إجمالي الخصوم المتداولة | Total Current Liabilities': 1,
+        'إجمالي الخصوم غير المتداولة | Total Non-Current Liabilities': 1,
+    },
+    'إجمالي حقوق الملكية | Total Equity': {
+        'رأس المال | Capital': 1,
+        'الاحتياطيات | Reserves': 1,
+        'الأرباح المحتجزة | Retained Earnings': 1,
+    },
+    'إجمالي الخصوم وحقوق الملكية | Total Liabilities and Equity': {
+        'إجمالي الخصوم | Total Liabilities': 1,
+        'إجمالي حقوق الملكية | Total Equity': 1,
+    },
+}
+
+# Row totals of the statement of changes in equity, applied to every column
+EQUITY_TOTALS = {
+    'الرصيد في نهاية السنة | Balance at end of year': {
+        'الرصيد في بداية السنة | Balance at beginning of year': 1,
+        'صافي الربح للسنة | Net profit for the year': 1,
+        'توزيعات الأرباح | Dividends': -1,
+        'زيادة رأس المال | Capital increase': 1,
+        'المحول للاحتياطيات | Transferred to reserves': 1,
+        'تغييرات أخرى | Other changes': 1,
+    },
+}
+
+# Column totals of the statement of changes in equity, applied to every row
+EQUITY_COLUMN_TOTALS = {
+    'total': {'capital': 1, 'reserves': 1, 'retained': 1},
+}
+
+CASH_FLOW_TOTALS = {
+    'صافي النقد من الأنشطة التشغيلية | Net cash from operating activities': {
+        'صافي الربح | Net profit': 1,
+        'الاستهلاك والإطفاء | Depreciation and amortization': 1,
+        'التغير في الذمم المدينة | Change in accounts receivable': 1,
+        'التغير في المخزون | Change in inventory': 1,
+        'التغير في الذمم الدائنة | Change in accounts payable': 1,
+        'تعديلات أخرى | Other adjustments': 1,
+    },
+    'صافي النقد من الأنشطة الاستثمارية | Net cash from investing activities': {
+        'شراء ممتلكات ومعدات | Purchase of property and equipment': -1,
+        'بيع ممتلكات ومعدات | Sale of property and equipment': 1,
+        'استثمارات جديدة | New investments': -1,
+        'بيع استثمارات | Sale of investments': 1,
+    },
+    'صافي النقد من الأنشطة التمويلية | Net cash from financing activities': {
+        'توزيعات أرباح مدفوعة | Dividends paid': -1,
+        'قروض جديدة | New loans': 1,
+        'سداد قروض | Loan repayments': -1,
+        'زيادة رأس المال | Capital increase': 1,
+    },
+    'صافي التغير في النقد وما في حكمه | Net change in cash and cash equivalents': {
+        'صافي النقد من الأنشطة التشغيلية | Net cash from operating activities': 1,
+        'صافي النقد من الأنشطة الاستثمارية | Net cash from investing activities': 1,
+        'صافي النقد من الأنشطة التمويلية | Net cash from financing activities': 1,
+    },
+    'النقد وما في حكمه في نهاية السنة | Cash and cash equivalents at end of year': {
+        'النقد وما في حكمه في بداية السنة | Cash and cash equivalents at beginning of year': 1,
+        'صافي التغير في النقد وما في حكمه | Net change in cash and cash equivalents': 1,
+    },
+}
+
+# Cash flow line items subtracted from their total, counted by their absolute value
+CASH_OUTFLOWS = frozenset(component for components in CASH_FLOW_TOTALS.values()
+                          for component, sign in components.items() if sign < 0 and component not in CASH_FLOW_TOTALS)
+
+# Statements derived by the engine: (key, template items, totals, items counted by their absolute value)
+STATEMENTS = [
+    ('income', INCOME_ITEMS, INCOME_TOTALS, frozenset()),
+    ('balance', BALANCE_ITEMS, BALANCE_TOTALS, frozenset()),
+    ('equity', EQUITY_ITEMS, EQUITY_TOTALS, frozenset()),
+    ('cash_flow', CASH_FLOW_ITEMS, CASH_FLOW_TOTALS, CASH_OUTFLOWS),
+]
+
+# Key metrics of the overview, in display order
+METRIC_LABELS = [
+    'إجمالي الإيرادات | Total Revenue',
+    'صافي الربح | Net Profit',
+    'إجمالي الأصول | Total Assets',
+    'إجمالي الخصوم | Total Liabilities',
+    'إجمالي حقوق الملكية | Total Equity',
+    'النقد في نهاية السنة | Cash at End of Year',
+    'معدل الربحية٪ | Profitability Ratio %',
+    'نسبة السيولة | Liquidity Ratio',
+    'نسبة الدين إلى حقوق الملكية | Debt to Equity'
+]
+
+class DerivedStatements:
+    """Statements with every total derived from its line items.
+
+    `data` has the same shape as the output of process_excel_file, with the
+    totals replaced by their derived values. `reconciliation` lists the
+    entered totals that disagree with the derived ones.
+    """
+
+    def __init__(self, data, reconciliation):
+        self.data = data
+        self.reconciliation = reconciliation
+
+    def differences(self, statement, item=None):
+        """Reconciliation differences of one statement (and optionally one item)."""
+        return [d for d in self.reconciliation
+                if d['statement'] == statement and (item is None or d['item'] == item)]
+
+def derive_statements(data):
+    """Derive all totals of the parsed data and reconcile them with the entered ones."""
+    derived = dict(data)
+    reconciliation = []
+    periods = len(data.get('periods') or ()) or DEFAULT_PERIODS
+    for statement, template_items, totals, magnitudes in STATEMENTS:
+        entered = data.get(statement)
+        if entered is None:
+            entered = Statement(statement, statement_columns(statement, periods))
+        column_totals = EQUITY_COLUMN_TOTALS if statement == 'equity' else {}
+        derived[statement] = _derive_statement(entered, template_items, totals, column_totals, reconciliation,
+                                               magnitudes)
+    if reconciliation:
+        logger.info(f"{len(reconciliation)} entered total(s) differ from their line items, e.g. "
+                    f"{reconciliation[0]['item']} ({reconciliation[0]['column']}): entered "
+                    f"{reconciliation[0]['entered']}, derived {reconciliation[0]['derived']}")
+    return DerivedStatements(derived, reconciliation)
+
+def _dependency_levels(totals):
+    """Group totals so each group only depends on line items and earlier groups."""
+    levels = []
+    remaining = dict(totals)
+    while remaining:
+        level = [total for total, components in remaining.items()
+                 if not any(component in remaining for component in components)]
+        if not level:
+            raise ValueError(f"Circular totals: {', '.join(remaining)}")
+        levels.append(level)
+        for total in level:
+            del remaining[total]
+    return levels
+
+def _derive_statement(entered, template_items, totals, column_totals, reconciliation, magnitudes=frozenset()):
+    name, columns = entered.name, entered.columns
+    # Template order first, then any rows the template doesn't know about
+    known = set(template_items)
+    labels = [label for label in template_items if label] + [label for label in entered.labels if label not in known]
+    index = {label: i for i, label in enumerate(labels)}
+    rows = [index[label] for label in entered.labels]
+    values = np.zeros((len(labels), len(columns)))
+    present = np.zeros((len(labels), len(columns)), dtype=bool)
+    values[rows] = entered.values
+    present[rows] = True
+    column_index = {column: j for j, column in enumerate(columns)}
+    magnitude_rows = [index[label] for label in magnitudes if label in index]
+
+    def amounts(values):
+        # Rows in `magnitudes` count with the sign of their coefficient only
+        if not magnitude_rows:
+            return values
+        amounts = values.copy()
+        amounts[magnitude_rows] = np.abs(amounts[magnitude_rows])
+        return amounts
+
+    def entered_components(present, values):
+        # Blank cells are read as 0, so only non-zero components count as entered
+        return (present & (values != 0)).astype(float)
+
+    def settle(derived, has_components, entered, entered_present, describe):
+        # Entered non-zero totals that disagree with their components are reported
+        mismatch = has_components & entered_present & (entered != 0) & (np.abs(entered - derived) >= TOLERANCE)
+        for i, j in zip(*np.nonzero(mismatch)):
+            item, column = describe(i, j)
+            reconciliation.append({
+                'statement': name, 'item': item, 'column': column,
+                'entered': float(entered[i, j]), 'derived': float(derived[i, j]),
+                'difference': float(entered[i, j] - derived[i, j]),
+            })
+        # Totals without any non-zero component keep the entered value
+        return np.where(has_components, derived, entered), entered_present | has_components
+
+    # Column totals (e.g. equity 'total' = capital + reserves + retained) for every row
+    for total, components in column_totals.items():
+        coefficients = np.zeros((len(columns), 1))
+        for component, sign in components.items():
+            coefficients[column_index[component], 0] = sign
+        j = column_index[total]
+        derived = values @ coefficients
+        has_components = (entered_components(present, values) @ np.abs(coefficients)) > 0
+        values[:, [j]], present[:, [j]] = settle(derived, has_components, values[:, [j]], present[:, [j]],
+                                                 lambda i, _: (labels[i], total))
+
+    # Row totals, one matrix product per dependency level covering all columns at once
+    for level in _dependency_levels(totals):
+        coefficients = np.zeros((len(level), len(labels)))
+        for k, total in enumerate(level):
+            for component, sign in totals[total].items():
+                coefficients[k, index[component]] = sign
+        level_rows = [index[total] for total in level]
+        derived = coefficients @ amounts(values)
+        has_components = (np.abs(coefficients) @ entered_components(present, values)) > 0
+        values[level_rows], present[level_rows] = settle(derived, has_components, values[level_rows], present[level_rows],
+                                                         lambda i, j: (level[i], columns[j]))
+
+    # Keep the entered rows and the derived totals, in template order
+    keep = present.any(axis=1)
+    return Statement(name, columns, [label for label, kept in zip(labels, keep) if kept], values[keep])
+
+def key_metrics(data):
+    """Key metrics of derived statements for every period.
+
+    Returns (labels, values, changes): `values` has one row per label in
+    METRIC_LABELS and one column per period, and `changes` is the
+    percentage change of the latest period over the one before (0 where the
+    earlier value is 0).
+    """
+    income, balance, cash_flow = data['income'], data['balance'], data['cash_flow']
+    # One row per metric, one column per period
+    totals = np.vstack([
+        income.row(LineItem.INCOME_TOTAL_REVENUE),
+        income.row(LineItem.INCOME_NET_PROFIT),
+        balance.row(LineItem.BALANCE_TOTAL_ASSETS),
+        balance.row(LineItem.BALANCE_TOTAL_LIABILITIES),
+        balance.row(LineItem.BALANCE_TOTAL_EQUITY),
+        cash_flow.row(LineItem.CASH_FLOW_CASH_AND_CASH_EQUIVALENTS_AT_END_OF_YEAR),
+    ])
+    total_revenue, net_profit, total_assets, total_liabilities, total_equity, _ = totals
+    # Calculate ratios for every period at once
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profitability = np.where(total_revenue != 0, net_profit / total_revenue * 100, 0)
+        liquidity = np.where(total_liabilities != 0, total_assets / total_liabilities, 0)
+        debt_equity = np.where(total_equity != 0, total_liabilities / total_equity, 0)
+        values = np.vstack([totals, profitability, liquidity, debt_equity])
+        # Calculate the percentage change of the latest period over the one before
+        latest, previous = values[:, 0], values[:, 1]
+        changes = np.where(previous != 0, (latest - previous) / previous * 100, 0)
+    return METRIC_LABELS, values, changes
@@ -0,0 +1,285 @@
+import re
+import sys
+from enum import IntEnum
+import numpy as np
+
+# Income statement items (template rows 4-22)
+INCOME_ITEMS = [
+    'الإيرادات | Revenues',
+    'إيرادات المبيعات | Sales Revenue',
+    'إيرادات الخدمات | Services Revenue',
+    'إيرادات أخرى | Other Revenue',
+    'إجمالي الإيرادات | Total Revenue',
+    '',
+    'المصروفات | Expenses',
+    'تكلفة البضاعة المباعة | Cost of Goods Sold',
+    'مصروفات الرواتب | Salary Expenses',
+    'مصروفات الإيجار | Rent Expenses',
+    'مصروفات المرافق | Utility Expenses',
+    'مصروفات التسويق | Marketing Expenses',
+    'الاستهلاك والإطفاء | Depreciation & Amortization',
+    'مصروفات أخرى | Other Expenses',
+    'إجمالي المصروفات | Total Expenses',
+    '',
+    'الربح قبل الضرائب | Profit Before Tax',
+    'ضريبة الدخل | Income Tax',
+    'صافي الربح | Net Profit'
+]
+
+# Balance sheet items (template rows 4-43)
+BALANCE_ITEMS = [
+    'الأصول | Assets',
+    'الأصول المتداولة | Current Assets',
+    'النقدية وما في حكمها | Cash and Cash Equivalents',
+    'الذمم المدينة | Accounts Receivable',
+    'المخزون | Inventory',
+    'أصول متداولة أخرى | Other Current Assets',
+    'إجمالي الأصول المتداولة | Total Current Assets',
+    '',
+    'الأصول غير المتداولة | Non-Current Assets',
+    'الممتلكات والمعدات | Property and Equipment',
+    'الأصول غير الملموسة | Intangible Assets',
+    'استثمارات طويلة الأجل | Long-term Investments',
+    'أصول غير متداولة أخرى | Other Non-Current Assets',
+    'إجمالي الأصول غير المتداولة | Total Non-Current Assets',
+    '',
+    'إجمالي الأصول | Total Assets',
+    '',
+    'الخصوم وحقوق الملكية | Liabilities and Equity',
+    'الخصوم المتداولة | Current Liabilities',
+    'الذمم الدائنة | Accounts Payable',
+    'القروض قصيرة الأجل | Short-term Loans',
+    'الإيرادات المؤجلة | Deferred Revenue',
+    'خصوم متداولة أخرى | Other Current Liabilities',
+    'إجمالي الخصوم المتداولة | Total Current Liabilities',
+    '',
+    'الخصوم غير المتداولة | Non-Current Liabilities',
+    'القروض طويلة الأجل | Long-term Loans',
+    'مخصص مكافأة نهاية الخدمة | End of Service Benefits',
+    'خصوم غير متداولة أخرى | Other Non-Current Liabilities',
+    'إجمالي الخصوم غير المتداولة | Total Non-Current Liabilities',
+    '',
+    'إجمالي الخصوم | Total Liabilities',
+    '',
+    'حقوق الملكية | Equity',
+    'رأس المال | Capital',
+    'الاحتياطيات | Reserves',
+    'الأرباح المحتجزة | Retained Earnings',
+    'إجمالي حقوق الملكية | Total Equity',
+    '',
+    'إجمالي الخصوم وحقوق الملكية | Total Liabilities and Equity'
+]
+
+# Equity statement items (template rows 4-10)
+EQUITY_ITEMS = [
+    'الرصيد في بداية السنة | Balance at beginning of year',
+    'صافي الربح للسنة | Net profit for the year',
+    'توزيعات الأرباح | Dividends',
+    'زيادة رأس المال | Capital increase',
+    'المحول للاحتياطيات | Transferred to reserves',
+    'تغييرات أخرى | Other changes',
+    'الرصيد في نهاية السنة | Balance at end of year'
+]
+
+# Cash flow items (template rows 4-30)
+CASH_FLOW_ITEMS = [
+    'التدفقات النقدية من الأنشطة التشغيلية | Cash flows from operating activities',
+    'صافي الربح | Net profit',
+    'تعديلات لـ: | Adjustments for:',
+    'الاستهلاك والإطفاء | Depreciation and amortization',
+    'التغير في الذمم المدينة | Change in accounts receivable',
+    'التغير في المخزون | Change in inventory',
+    'التغير في الذمم الدائنة | Change in accounts payable',
+    'تعديلات أخرى | Other adjustments',
+    'صافي النقد من الأنشطة التشغيلية | Net cash from operating activities',
+    '',
+    'التدفقات النقدية من الأنشطة الاستثمارية | Cash flows from investing activities',
+    'شراء ممتلكات ومعدات | Purchase of property and equipment',
+    'بيع ممتلكات ومعدات | Sale of property and equipment',
+    'استثمارات جديدة | New investments',
+    'بيع استثمارات | Sale of investments',
+    'صافي النقد من الأنشطة الاستثمارية | Net cash from investing activities',
+    '',
+    'التدفقات النقدية من الأنشطة التمويلية | Cash flows from financing activities',
+    'توزيعات أرباح مدفوعة | Dividends paid',
+    'قروض جديدة | New loans',
+    'سداد قروض | Loan repayments',
+    'زيادة رأس المال | Capital increase',
+    'صافي النقد من الأنشطة التمويلية | Net cash from financing activities',
+    '',
+    'صافي التغير في النقد وما في حكمه | Net change in cash and cash equivalents',
+    'النقد وما في حكمه في بداية السنة | Cash and cash equivalents at beginning of year',
+    'النقد وما في حكمه في نهاية السنة | Cash and cash equivalents at end of year'
+]
+
+
+# Periods of the standard template: current and previous year
+DEFAULT_PERIODS = 2
+
+# Statements with one value column per period; the equity statement has one
+# column per equity component instead
+PERIOD_STATEMENTS = ('income', 'balance', 'cash_flow')
+
+EQUITY_COLUMNS = ('capital', 'reserves', 'retained', 'total')
+
+def period_columns(periods=DEFAULT_PERIODS):
+    """Column keys of `periods` periods, most recent first: current, previous, previous_2, ..."""
+    return ('current', 'previous', *(f'previous_{k}' for k in range(2, periods)))[:periods]
+
+def period_labels(periods=DEFAULT_PERIODS):
+    """Default display labels of `periods` periods, most recent first."""
+    if periods == DEFAULT_PERIODS:
+        return ['السنة الحالية | Current Year', 'السنة السابقة | Previous Year']
+    return ['الفترة الحالية | Current Period'] + [f'الفترة السابقة {k} | Prior Period {k}' for k in range(1, periods)]
+
+def statement_columns(statement, periods=DEFAULT_PERIODS):
+    """Value columns of a statement, in template order."""
+    if statement in PERIOD_STATEMENTS:
+        return period_columns(periods)
+    return EQUITY_COLUMNS
+
+# Template line items of each statement
+STATEMENT_ITEMS = {
+    'income': INCOME_ITEMS,
+    'balance': BALANCE_ITEMS,
+    'equity': EQUITY_ITEMS,
+    'cash_flow': CASH_FLOW_ITEMS,
+}
+
+def _code_name(statement, label):
+    """Enum name of a line item: the statement plus the English label, e.g. INCOME_TOTAL_REVENUE."""
+    english = label.split(' | ')[-1]
+    return f"{statement}_{re.sub(r'[^0-9A-Za-z]+', '_', english).strip('_')}".upper()
+
+# Every template line item as (statement, label), in code order
+_TEMPLATE_LINE_ITEMS = [(statement, label) for statement, items in STATEMENT_ITEMS.items() for label in items if label]
+
+# One code per template line item. Codes are small ints, so rows are matched
+# without hashing or comparing the long bilingual labels; 0 is left for rows
+# the template doesn't know about.
+LineItem = IntEnum('LineItem', [(_code_name(statement, label), code)
+                                for code, (statement, label) in enumerate(_TEMPLATE_LINE_ITEMS, start=1)])
+
+# Label of each code, and code of each label per statement
+LABELS = {}
+CODES = {statement: {} for statement in STATEMENT_ITEMS}
+for code, (statement, label) in zip(LineItem, _TEMPLATE_LINE_ITEMS):
+    LABELS[code] = label
+    CODES[statement][label] = code
+
+def _spelling(text):
+    return ' '.join(str(text).split()).casefold()
+
+# Template label of every accepted spelling of an item, per statement: the
+# LineItem name, the bilingual label and either half of it, with whitespace
+# collapsed and case folded. Halves shared by two items are left out.
+SPELLINGS = {statement: {} for statement in STATEMENT_ITEMS}
+for code, (statement, label) in zip(LineItem, _TEMPLATE_LINE_ITEMS):
+    spellings = SPELLINGS[statement]
+    for text in {label, *label.split(' | ')}:
+        key = _spelling(text)
+        spellings[key] = label if spellings.get(key, label) == label else None
+    spellings[_spelling(code.name)] = label
+for spellings in SPELLINGS.values():
+    for key in [key for key, label in spellings.items() if label is None]:
+        del spellings[key]
+
+def find_label(statement, text):
+    """Template label of an item of `statement` given by any accepted spelling, or None."""
+    return SPELLINGS[statement].get(_spelling(text))
+
+def to_float(value, item, column):
+    """Convert a cell value to a float, accepting numbers typed as text."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(',', '').strip())
+    except ValueError:
+        raise ValueError(f"Non-numeric value {value!r} for {item} ({column})")
+
+class Statement:
+    """One statement as a float64 array with a row per line item and a column per period or component.
+
+    Rows keep the order they were read in. `codes` holds the LineItem code of
+    every row (0 for rows the template doesn't know about) and labels are
+    interned, so the long bilingual strings are shared rather than copied
+    per job. Rows can be looked up by LineItem or by label.
+    """
+
+    __slots__ = ('name', 'columns', 'labels', 'codes', 'values', '_rows')
+
+    def __init__(self, name, columns, labels=(), values=None):
+        self.name = name
+        self.columns = tuple(columns)
+        self.labels = [sys.intern(str(label)) for label in labels]
+        codes = CODES.get(name, {})
+        self.codes = np.array([codes.get(label, 0) for label in self.labels], dtype=np.int16)
+        if values is None:
+            values = np.zeros((len(self.labels), len(self.columns)))
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.labels), len(self.columns))
+        self._rows = {label: i for i, label in enumerate(self.labels)}
+
+    @classmethod
+    def from_rows(cls, name, columns, rows):
+        """Build a statement from (label, values) pairs; a repeated label replaces the earlier row."""
+        index = {}
+        values = []
+        for label, row in rows:
+            row = [to_float(value, label, column) for value, column in zip(row, columns)]
+            if label in index:
+                values[index[label]] = row
+            else:
+                index[label] = len(values)
+                values.append(row)
+        return cls(name, columns, index, np.array(values, dtype=np.float64).reshape(len(values), len(columns)))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, item):
+        return self.row_index(item) is not None
+
+    def row_index(self, item):
+        """Row of a LineItem or label, or None."""
+        if isinstance(item, LineItem):
+            item = LABELS[item]
+        return self._rows.get(item)
+
+    def column(self, column):
+        """Values of one column for every row (a view, not a copy)."""
+        return self.values[:, self.columns.index(column)]
+
+    def get(self, item, column, default=0.0):
+        """Value of one line item in one column."""
+        i = self.row_index(item)
+        if i is None:
+            return default
+        return float(self.values[i, self.columns.index(column)])
+
+    def row(self, item):
+        """Values of one line item in every column (zeros when the item is missing)."""
+        i = self.row_index(item)
+        if i is None:
+            return np.zeros(len(self.columns))
+        return self.values[i].copy()
+
+    def changes(self):
+        """Period-over-period change and change % of every row.
+
+        Both are (rows, columns - 1) arrays where column k compares column k
+        with the period before it (column k + 1). The change % is NaN where
+        the earlier period is 0.
+        """
+        later, earlier = self.values[:, :-1], self.values[:, 1:]
+        change = later - earlier
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_percent = np.where(earlier != 0, change / earlier * 100, np.nan)
+        return change, change_percent
+
+    def rows(self):
+        """(label, values) pairs in row order, with the values as Python floats."""
+        return zip(self.labels, self.values.tolist())
+
+    def to_dict(self):
+        """The statement as {label: {column: value}}."""
+        return {label: dict(zip(self.columns, row)) for label, row in self.rows()}
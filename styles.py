@@ -0,0 +1,45 @@
+from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+# Style names, applied to cells with `cell.style = NAME`
+TITLE = 'acc_title'                 # Sheet title
+SUBTITLE = 'acc_subtitle'           # Section title
+HEADER = 'acc_header'               # Table header in the generated statements
+INPUT_HEADER = 'acc_input_header'   # Table header in the input template
+BOLD = 'acc_bold'                   # Section headers and labels
+TOTAL = 'acc_total'                 # Totals and subtotals
+POSITIVE = 'acc_positive'           # Passed checks and increases
+NEGATIVE = 'acc_negative'           # Failed checks and decreases
+
+# Colors
+HEADER_COLOR = "4472C4"
+TOTAL_COLOR = "DDEBF7"
+POSITIVE_COLOR = "C6EFCE"
+NEGATIVE_COLOR = "FFC7CE"
+
+def _solid(color):
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+# Style definitions, allocated once and shared by every workbook
+STYLE_DEFINITIONS = {
+    TITLE: {'font': Font(bold=True, size=16)},
+    SUBTITLE: {'font': Font(bold=True, size=14)},
+    HEADER: {'font': Font(bold=True, color="FFFFFF"), 'fill': _solid(HEADER_COLOR), 'alignment': Alignment(horizontal='center')},
+    INPUT_HEADER: {'font': Font(bold=True), 'fill': _solid(TOTAL_COLOR), 'alignment': Alignment(horizontal='center')},
+    BOLD: {'font': Font(bold=True)},
+    TOTAL: {'font': Font(bold=True), 'fill': _solid(TOTAL_COLOR)},
+    POSITIVE: {'font': DEFAULT_FONT, 'fill': _solid(POSITIVE_COLOR)},
+    NEGATIVE: {'font': DEFAULT_FONT, 'fill': _solid(NEGATIVE_COLOR)},
+}
+
+def register_styles(wb):
+    """Register the named styles on a workbook.
+
+    A NamedStyle can only belong to one workbook, so the registry is applied
+    once per workbook; cells then reference the styles by name.
+    """
+    existing = set(wb.named_styles)
+    for name, attributes in STYLE_DEFINITIONS.items():
+        if name not in existing:
+            wb.add_named_style(NamedStyle(name=name, **attributes))
+    return wb
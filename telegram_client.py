@@ -0,0 +1,188 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from telegram.request import BaseRequest, HTTPXRequest
+from config import RATE_LIMIT_GLOBAL, RATE_LIMIT_CHAT, RATE_LIMIT_GROUP, RATE_LIMIT_BURST, RATE_LIMIT_RETRIES
+from config import HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_WRITE_TIMEOUT, HTTP_POOL_TIMEOUT
+from config import UPLOAD_WRITE_TIMEOUT, TELEGRAM_OFFLINE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Chats whose buckets are kept; idle ones are dropped past this
+MAX_CHAT_BUCKETS = 10000
+
+class TokenBucket:
+    """Allow `rate` events per second on average, and up to `burst` at once.
+
+    A caller that finds the bucket empty reserves the next token and sleeps
+    until it is due, so waiting callers go out in arrival order.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+    def idle(self):
+        """True when the bucket is full again, so dropping it loses nothing."""
+        return self._tokens + (time.monotonic() - self._updated) * self.rate >= self.burst
+
+class SendRateLimiter(BaseRateLimiter):
+    """Throttle the messages the bot sends to Telegram's flood limits.
+
+    Every request aimed at a chat waits for a token of that chat's bucket
+    (private chats and groups have different limits) and then of the global
+    bucket; other requests, like getUpdates and getFile, are not delayed.
+    A request refused with 429 (RetryAfter) pauses all sends for the time
+    Telegram asks and is retried up to `max_retries` times, or the number
+    passed as `rate_limit_args` to a bot method.
+
+    The limits hold per process, so the bot and each job worker count
+    their own messages.
+    """
+
+    def __init__(self, global_rate=RATE_LIMIT_GLOBAL, chat_rate=RATE_LIMIT_CHAT, group_rate=RATE_LIMIT_GROUP / 60,
+                 burst=RATE_LIMIT_BURST, max_retries=RATE_LIMIT_RETRIES):
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, max(int(global_rate), 1))
+        self._chats = {}
+        self._paused_until = 0.0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+        max_retries = self.max_retries if rate_limit_args is None else rate_limit_args
+        attempt = 0
+        while True:
+            await self._wait(chat_id)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                logger.warning(f"{endpoint} to chat {chat_id} hit the flood limit, retrying in {e.retry_after}s")
+                # Telegram throttles the whole bot, so every send waits
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+
+    async def _wait(self, chat_id):
+        while (delay := self._paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+        await self._bucket(chat_id).acquire()
+        await self._global.acquire()
+
+    def _bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle()}
+            # Groups have negative ids, channels may be given as @username
+            is_group = str(chat_id).startswith(('-', '@'))
+            bucket = self._chats[chat_id] = TokenBucket(self.group_rate if is_group else self.chat_rate, self.burst)
+        return bucket
+
+class MediaRequest(HTTPXRequest):
+    """HTTPXRequest that gives uploads `media_write_timeout` seconds instead of a fixed 20."""
+
+    def __init__(self, *args, media_write_timeout=UPLOAD_WRITE_TIMEOUT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.media_write_timeout = media_write_timeout
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        if write_timeout is BaseRequest.DEFAULT_NONE and request_data is not None and request_data.multipart_data:
+            write_timeout = self.media_write_timeout
+        return await super().do_request(url, method, request_data, read_timeout, write_timeout,
+                                        connect_timeout, pool_timeout)
+
+class OfflineRequest(BaseRequest):
+    """Answer Bot API calls locally, so the bot runs without reaching Telegram.
+
+    getMe returns a stub bot and getFile resolves a file_id to the file of
+    that name in `directory`. Sends return a stub message and are recorded
+    in `sent` and appended to outbox.jsonl in `directory`; any other call
+    succeeds. Used to replay recorded updates through the webhook.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.sent = []
+        self._message_ids = itertools.count(1)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        endpoint = url.rsplit('/', 1)[-1]
+        parameters = request_data.parameters if request_data is not None else {}
+        if endpoint == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Offline', 'username': 'offline_bot'}
+        elif endpoint == 'getFile':
+            file_id = str(parameters.get('file_id', ''))
+            path = os.path.join(os.path.abspath(self.directory), os.path.basename(file_id))
+            if not os.path.isfile(path):
+                return 400, json.dumps({'ok': False, 'error_code': 400,
+                                        'description': 'Bad Request: invalid file_id'}).encode()
+            # An absolute path is read directly, as with a local Bot API server
+            result = {'file_id': file_id, 'file_unique_id': file_id, 'file_path': path}
+        elif endpoint.startswith('send'):
+            result = await asyncio.to_thread(self._send, endpoint, parameters, request_data)
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    def _send(self, endpoint, parameters, request_data):
+        files = {name: len(content) for name, content, *_ in request_data.multipart_data.values()}
+        record = {'method': endpoint, 'chat_id': parameters.get('chat_id'),
+                  'text': parameters.get('text') or parameters.get('caption'), 'files': files}
+        self.sent.append(record)
+        with open(os.path.join(self.directory, 'outbox.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        chat = {'id': parameters.get('chat_id'), 'type': 'private'}
+        messages = [{'message_id': next(self._message_ids), 'date': int(time.time()), 'chat': chat}
+                    for _ in range(len(parameters.get('media') or [None]))]
+        if endpoint == 'sendDocument':
+            file_id = f"offline-{messages[0]['message_id']}"
+            messages[0]['document'] = {'file_id': file_id, 'file_unique_id': file_id}
+        return messages if endpoint == 'sendMediaGroup' else messages[0]
+
+def build_request():
+    """Request object for the Bot API calls: HTTP_POOL_SIZE connections and the configured timeouts.
+
+    With TELEGRAM_OFFLINE_DIR set the calls are answered locally instead (see OfflineRequest).
+    """
+    if TELEGRAM_OFFLINE_DIR:
+        return OfflineRequest(TELEGRAM_OFFLINE_DIR)
+    return MediaRequest(connection_pool_size=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                        read_timeout=HTTP_READ_TIMEOUT, write_timeout=HTTP_WRITE_TIMEOUT,
+                        pool_timeout=HTTP_POOL_TIMEOUT)
@@ -0,0 +1,81 @@
+import hashlib
+import io
+import json
+import logging
+import os
+from config import TEMPLATE_DIR, TELEGRAM_OFFLINE_DIR
+import excel_processor
+from statement_model import DEFAULT_PERIODS
+
+logger = logging.getLogger(__name__)
+
+# File name the template is sent under
+TEMPLATE_FILENAME = "financial_template.xlsx"
+
+# Telegram file_ids of already uploaded templates, keyed by template digest;
+# offline runs keep the stub file_ids they get in their own directory
+FILE_ID_STORE = os.path.join(TELEGRAM_OFFLINE_DIR or TEMPLATE_DIR, "template_file_ids.json")
+
+class TemplateArtifact:
+    """An immutable, prebuilt template workbook served from memory."""
+
+    def __init__(self, digest, data):
+        self.digest = digest
+        self.data = data
+        self.file_id = _load_file_ids().get(digest)
+
+    def remember_file_id(self, file_id):
+        """Reuse `file_id` for later sends of this template."""
+        if file_id == self.file_id:
+            return
+        self.file_id = file_id
+        file_ids = _load_file_ids()
+        file_ids[self.digest] = file_id
+        try:
+            with open(FILE_ID_STORE, 'w', encoding='utf-8') as f:
+                json.dump(file_ids, f)
+        except OSError as e:
+            logger.error(f"Error saving template file_id: {e}")
+
+    def forget_file_id(self):
+        """Drop a file_id that Telegram no longer accepts."""
+        self.file_id = None
+
+def template_digest(periods=DEFAULT_PERIODS):
+    """Content hash of the template definition."""
+    definition = {
+        'version': excel_processor.TEMPLATE_VERSION,
+        'periods': periods,
+        'income': excel_processor.INCOME_ITEMS,
+        'balance': excel_processor.BALANCE_ITEMS,
+        'equity': excel_processor.EQUITY_ITEMS,
+        'cash_flow': excel_processor.CASH_FLOW_ITEMS,
+        'notes': excel_processor.NOTES_SECTIONS,
+    }
+    encoded = json.dumps(definition, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+def build_template(periods=DEFAULT_PERIODS):
+    """Build the template workbook with `periods` amount columns in memory."""
+    buffer = io.BytesIO()
+    excel_processor.create_template(buffer, periods)
+    artifact = TemplateArtifact(template_digest(periods), buffer.getvalue())
+    logger.info(f"Template built: {artifact.digest[:12]} ({periods} periods, {len(artifact.data)} bytes)")
+    return artifact
+
+# Built templates keyed by number of periods
+_templates = {}
+
+def get_template(periods=DEFAULT_PERIODS):
+    """Return the template artifact for `periods` periods, building it on first use."""
+    template = _templates.get(periods)
+    if template is None:
+        template = _templates[periods] = build_template(periods)
+    return template
+
+def _load_file_ids():
+    try:
+        with open(FILE_ID_STORE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
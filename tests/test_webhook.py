@@ -0,0 +1,61 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+# Worker threads keep the test in one process; set before config is imported
+os.environ.setdefault("EXECUTION_MODE", "thread")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import build_application
+from cli import replay_updates
+from outputs import OUTPUT_FILENAME
+from telegram_client import OfflineRequest
+from template_cache import get_template
+from webhook import webhook_application
+
+CHAT = {'id': 42, 'type': 'private', 'first_name': 'Test'}
+USER = {'id': 42, 'is_bot': False, 'first_name': 'Test'}
+
+def recorded_update(update_id, **message):
+    return {'update_id': update_id, 'message': {'message_id': update_id, 'date': 1700000000, 'chat': CHAT,
+                                                'from': USER, **message}}
+
+def write_updates(path, updates):
+    with open(path, 'w', encoding='utf-8') as f:
+        for update in updates:
+            f.write(json.dumps(update) + '\n')
+    return str(path)
+
+async def wait_for(request, predicate, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not any(predicate(record) for record in request.sent):
+        assert time.monotonic() < deadline, f"no matching message in {request.sent}"
+        await asyncio.sleep(0.05)
+
+def test_replayed_upload_is_answered_with_statements(tmp_path):
+    # The uploaded file is looked up by its file_id in the offline directory
+    (tmp_path / 'template-file').write_bytes(get_template().data)
+    generate = write_updates(tmp_path / 'generate.jsonl', [recorded_update(
+        1, text='/generate', entities=[{'type': 'bot_command', 'offset': 0, 'length': 9}])])
+    upload = write_updates(tmp_path / 'upload.jsonl', [recorded_update(2, document={
+        'file_id': 'template-file', 'file_unique_id': 'template-file', 'file_name': 'template.xlsx'})])
+    request = OfflineRequest(str(tmp_path))
+
+    async def replay():
+        async with webhook_application(build_application(request), port=0, path='/telegram', secret='s') as server:
+            url = f"http://127.0.0.1:{server.server_port}/telegram"
+            assert await asyncio.to_thread(replay_updates, generate, url, 's') == 0
+            await wait_for(request, lambda record: record['method'] == 'sendMessage')
+            assert await asyncio.to_thread(replay_updates, upload, url, 's') == 0
+            await wait_for(request, lambda record: OUTPUT_FILENAME in record['files'])
+            # Updates without the secret are refused
+            assert await asyncio.to_thread(replay_updates, upload, url, 'wrong') == 1
+
+    asyncio.run(replay())
+    document = next(record for record in request.sent if OUTPUT_FILENAME in record['files'])
+    assert document['method'] == 'sendDocument' and document['chat_id'] == CHAT['id']
+    assert document['files'][OUTPUT_FILENAME] > 0
+    with open(tmp_path / 'outbox.jsonl', encoding='utf-8') as f:
+        assert len(f.readlines()) == len(request.sent)
@@ -0,0 +1,135 @@
+import asyncio
+import contextlib
+import hmac
+import ipaddress
+import json
+import logging
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telegram import Update
+from config import WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_URL
+
+logger = logging.getLogger(__name__)
+
+# Header Telegram sends the secret_token given to setWebhook in
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Largest update body accepted; updates only reference files, so they stay small
+MAX_BODY_BYTES = 1024 * 1024
+
+# Seconds to wait for the event loop to take an update
+QUEUE_TIMEOUT = 10
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    # Set on the subclass made by start_webhook_server
+    update_queue = None
+    bot = None
+    loop = None
+    webhook_path = WEBHOOK_PATH
+    webhook_secret = WEBHOOK_SECRET
+
+    def do_POST(self):
+        if self.path != self.webhook_path:
+            self.send_error(404)
+            return
+        if self.webhook_secret and not hmac.compare_digest(self.headers.get(SECRET_HEADER, ''), self.webhook_secret):
+            self.send_error(403)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if not 0 < length <= MAX_BODY_BYTES:
+            self.send_error(413 if length else 400)
+            return
+        try:
+            update = Update.de_json(json.loads(self.rfile.read(length)), self.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Invalid update posted to the webhook: {e}")
+            self.send_error(400)
+            return
+        # Answer once the update is queued; the application processes it in the background
+        try:
+            asyncio.run_coroutine_threadsafe(self.update_queue.put(update), self.loop).result(QUEUE_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error queueing update {update.update_id}: {e}")
+            self.send_error(503)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def start_webhook_server(update_queue, bot, loop, host=WEBHOOK_HOST, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                         secret=WEBHOOK_SECRET):
+    """Accept updates POSTed to `path` on a background thread and put them on `update_queue`.
+
+    `loop` is the event loop that owns the queue. Requests without the
+    `secret` (when set) in the X-Telegram-Bot-Api-Secret-Token header are
+    refused. Returns the server; call shutdown() on it to stop.
+    """
+    handler = type('WebhookHandler', (_WebhookHandler,), {
+        'update_queue': update_queue, 'bot': bot, 'loop': loop, 'webhook_path': path, 'webhook_secret': secret})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='acc-webhook', daemon=True).start()
+    logger.warning(f"Webhook listening on http://{host}:{server.server_port}{path}")
+    return server
+
+def run_webhook(application):
+    """Run the application on updates posted by Telegram until SIGINT or SIGTERM.
+
+    Without WEBHOOK_SECRET anyone who can reach the port could post forged
+    updates, so the server then only listens on a loopback address.
+
+    A chat's conversation state (the pending /generate options, the files
+    collected for /consolidate) lives in this process's user_data, so
+    several instances behind one URL only work if every update of a chat
+    is routed to the same instance, e.g. by hashing message.chat.id.
+    """
+    if not WEBHOOK_SECRET and (WEBHOOK_URL or not _is_loopback(WEBHOOK_HOST)):
+        raise SystemExit("WEBHOOK_SECRET must be set to serve the webhook on a public address")
+    asyncio.run(_serve(application))
+
+def _is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+async def _serve(application):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    async with webhook_application(application):
+        await stop.wait()
+
+@contextlib.asynccontextmanager
+async def webhook_application(application, host=WEBHOOK_HOST, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                              secret=WEBHOOK_SECRET):
+    """Run the application on updates posted to the webhook server for the duration of the block.
+
+    Yields the server; its server_port is the port bound when `port` is 0.
+    """
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        # Without WEBHOOK_URL the registration is left as it is, e.g. for offline replays
+        # or when a reverse proxy in front of the bot registers the URL
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(WEBHOOK_URL.rstrip('/') + path, secret_token=secret or None,
+                                              allowed_updates=Update.ALL_TYPES)
+        await application.start()
+        server = start_webhook_server(application.update_queue, application.bot, asyncio.get_running_loop(),
+                                      host, port, path, secret)
+        try:
+            yield server
+        finally:
+            await asyncio.to_thread(server.shutdown)
+            server.server_close()
+            await application.stop()
+    if application.post_shutdown:
+        await application.post_shutdown(application)
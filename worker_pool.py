@@ -0,0 +1,178 @@
+import asyncio
+import importlib
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from config import EXECUTION_MODE, MAX_WORKERS, MAX_QUEUE_SIZE, JOB_TIMEOUT, STREAMING_OUTPUT, METRICS_MEMORY
+from config import PROCESS_START_METHOD
+from metrics import measure
+
+logger = logging.getLogger(__name__)
+
+# Modules every worker needs; pandas (data_export) stays lazy as only the JSON/Parquet exports use it
+WORKER_PRELOAD = ['data_import', 'financial_statements', 'consolidation']
+
+def process_context(method=PROCESS_START_METHOD):
+    """Multiprocessing context for worker processes.
+
+    With "forkserver" the server process imports WORKER_PRELOAD once and
+    each worker is forked from it, so no worker pays the import cost again.
+    """
+    context = multiprocessing.get_context(method)
+    if method == "forkserver":
+        context.set_forkserver_preload(WORKER_PRELOAD)
+    return context
+
+def warm_worker():
+    """Process pool initializer: import the pipeline before the first job arrives."""
+    for module in WORKER_PRELOAD:
+        importlib.import_module(module)
+
+def _ready():
+    return True
+
+class QueueFullError(Exception):
+    """Raised when the pool already holds the maximum number of jobs."""
+
+def run_pipeline(input_bytes, file_format='.xlsx', output_format='xlsx', sheets=None, memory=METRICS_MEMORY):
+    """Parse the uploaded input file and generate the financial statements.
+
+    This runs inside a worker, so the imports are done here to keep the
+    function picklable for the process pool. Everything stays in memory.
+    `output_format` is 'xlsx', 'pdf' or one of data_export.EXPORT_FORMATS,
+    and `sheets` limits a workbook or report to some of
+    financial_statements.SHEETS.
+    Returns the output bytes and the parse/generate/save (or parse/export)
+    spans, which the caller records since histograms live in the bot process.
+    """
+    from data_import import load_input
+    spans = {}
+    with measure('parse', spans, memory):
+        data = load_input(io.BytesIO(input_bytes), file_format)
+    return _render(data, spans, memory, output_format, sheets), spans
+
+def run_consolidation(entities, eliminations=(), output_format='xlsx', sheets=None, memory=METRICS_MEMORY):
+    """Consolidate entities parsed with consolidation.parse_input and generate the statements.
+
+    Returns the output bytes and the consolidate/generate/save spans.
+    """
+    from consolidation import consolidate
+    spans = {}
+    with measure('consolidate', spans, memory):
+        data = consolidate(entities, eliminations)
+    return _render(data, spans, memory, output_format, sheets), spans
+
+def run_chart_specs(input_bytes, file_format='.xlsx'):
+    """Parse the uploaded input file and return its chart_images.chart_specs.
+
+    The specs are small, so the bot can hand each chart to its own worker
+    with chart_images.render_chart and render them in parallel.
+    """
+    from data_import import load_input
+    from statement_engine import derive_statements
+    from chart_images import chart_specs
+    data = load_input(io.BytesIO(input_bytes), file_format)
+    return chart_specs(derive_statements(data).data)
+
+def _render(data, spans, memory, output_format='xlsx', sheets=None):
+    """Generate and save the statements, timing each stage into `spans`.
+
+    The PDF, JSON and Parquet formats skip the workbook entirely and are
+    timed as one 'report' or 'export' stage.
+    """
+    if output_format == 'pdf':
+        from pdf_report import pdf_bytes
+        with measure('report', spans, memory):
+            return pdf_bytes(data, sheets)
+    if output_format != 'xlsx':
+        from data_export import export_bytes
+        with measure('export', spans, memory):
+            return export_bytes(data, output_format)
+    from financial_statements import build_workbook
+    with measure('generate', spans, memory):
+        wb = build_workbook(data, write_only=STREAMING_OUTPUT, sheets=sheets)
+    output = io.BytesIO()
+    with measure('save', spans, memory):
+        wb.save(output)
+    return output.getvalue()
+
+class WorkerPool:
+    """Run blocking jobs off the event loop with bounded concurrency.
+
+    At most `max_workers` jobs run at the same time, at most `max_queue_size`
+    jobs (running + waiting) are accepted, and each job gets `timeout` seconds
+    once it starts running.
+    """
+
+    def __init__(self, mode=EXECUTION_MODE, max_workers=MAX_WORKERS,
+                 max_queue_size=MAX_QUEUE_SIZE, timeout=JOB_TIMEOUT):
+        if mode == "process":
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=process_context(),
+                                                 initializer=warm_worker)
+        elif mode == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="acc-worker")
+        else:
+            raise ValueError(f"Unknown execution mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._pending = 0
+
+    @property
+    def pending(self):
+        """Number of jobs currently running or waiting for a worker.
+
+        A job that timed out still counts until its worker really finishes it.
+        """
+        return self._pending
+
+    async def submit(self, func, *args):
+        """Run `func(*args)` in the pool and return its result.
+
+        Raises QueueFullError when the queue is full and asyncio.TimeoutError
+        when the job runs longer than the configured timeout.
+        """
+        if self._pending >= self.max_queue_size:
+            raise QueueFullError(f"Worker queue is full ({self._pending} jobs)")
+        self._pending += 1
+        future = None
+        try:
+            await self._semaphore.acquire()
+            loop = asyncio.get_running_loop()
+            try:
+                future = loop.run_in_executor(self._executor, func, *args)
+            except BaseException:
+                self._semaphore.release()
+                raise
+            # The job keeps its worker slot and its place in the queue until it
+            # really finishes, even if the caller stopped waiting for it after a
+            # timeout, so runaway jobs make the pool report itself full.
+            future.add_done_callback(self._release)
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Job {getattr(func, '__name__', func)} timed out after {self.timeout}s")
+                raise
+        finally:
+            if future is None:
+                self._pending -= 1
+
+    def warm_up(self):
+        """Start all worker processes now rather than on the first jobs."""
+        if self.mode == "process":
+            for _ in range(self.max_workers):
+                self._executor.submit(_ready)
+
+    def _release(self, future):
+        self._semaphore.release()
+        self._pending -= 1
+        if not future.cancelled() and future.exception() is not None:
+            # Retrieve the exception so abandoned jobs don't log "never retrieved"
+            logger.debug(f"Worker job failed: {future.exception()}")
+
+    def shutdown(self, wait=True):
+        """Stop the underlying executor."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)